@@ -0,0 +1,340 @@
+# batch_processor.py
+# OpenAI Batch APIを用いて文単位のLLM解析をまとめて実行するモジュール
+#
+# 処理は2段階で行う。
+#  (1) 入力JSONを走査し、時間・場所表現抽出と述語抽出(第1波)、述語項構造抽出(第2波)の
+#      リクエストをBatch API形式のJSONLファイルに書き出して実行し、結果をLLM応答キャッシュに取り込む。
+#  (2) 通常のprocess_jsonを実行する。上記のステージはキャッシュから応答が得られるため、
+#      ノードやエッジはprocess_sentenceと全く同じ手順で生成される。
+
+import json
+import os
+import shutil
+import time
+import uuid
+from source.document_parsing.logger import log_to_file, log_token_usage
+from source.document_parsing.llm_cache import make_cache_key, peek_cached_response, store_response
+from source.document_parsing.llm_client import call_with_retry, get_base_url
+from source.document_parsing.llm_routing import get_route
+from source.document_parsing.json_processor import collect_sentences
+from source.document_parsing.time_and_place_extraction import build_time_and_place_messages, parse_time_and_place
+from source.document_parsing.time_and_place_rules import match_time_and_place
+from source.document_parsing.predicate_extraction import build_predicate_messages, parse_predicates, build_structure_messages
+from source.document_parsing.fused_extraction import build_fused_messages
+from source.document_parsing.structured_output import (
+    build_structured_messages, build_response_format, parse_structured_response, time_and_place_from_json, predicates_from_json
+)
+
+BATCH_MODEL = "gpt-4o"  # 応答にモデル名が含まれない場合に記録するモデル名
+BATCH_TEMPERATURE = 0.0
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_POLL_INTERVAL = 60  # バッチの状態を確認する間隔(秒)
+LOCAL_BATCH_TIMEOUT = 3600  # LocalBatchBackendで外部から結果ファイルが置かれるのを待つ最大時間(秒)
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+class OpenAIBatchBackend:
+    '''
+    OpenAI Batch APIにJSONLファイルを投入し、結果ファイルを取得するバックエンド。
+    '''
+    def __init__(self, client, poll_interval=BATCH_POLL_INTERVAL):
+        self.client = client
+        self.poll_interval = poll_interval
+
+    def submit(self, input_path: str) -> str:
+        with open(input_path, "rb") as f:
+            file_content = f.read()
+        input_file = call_with_retry(
+            self.client.files.create, stage="batch", file=(os.path.basename(input_path), file_content), purpose="batch"
+        )
+        batch = call_with_retry(
+            self.client.batches.create,
+            stage="batch",
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h"
+        )
+        return batch.id
+
+    def wait(self, batch_id: str, output_path: str):
+        while True:
+            batch = call_with_retry(self.client.batches.retrieve, batch_id, stage="batch")
+            if batch.status in BATCH_FINAL_STATUSES:
+                break
+            time.sleep(self.poll_interval)
+        if batch.status != "completed":
+            log_to_file(f"[BATCH] batch {batch_id} finished with status '{batch.status}'")
+        with open(output_path, "w", encoding="utf-8") as f:
+            if batch.output_file_id:
+                f.write(call_with_retry(self.client.files.content, batch.output_file_id, stage="batch").text)
+
+class LocalBatchBackend:
+    '''
+    ディレクトリをバッチエンドポイントとみなすファイルベースの代替バックエンド(テスト用)。
+    - endpoint_dir : 入力ファイル(<batch_id>_input.jsonl)と結果ファイル(<batch_id>_output.jsonl)を置くディレクトリ
+    - responder : 指定した場合、リクエストのbody(dict)を受け取り応答テキストを返す関数で即座に結果ファイルを作成する。
+                  指定しない場合は外部から結果ファイルが置かれるまで待機する(timeout秒を超えた場合はTimeoutError)。
+    '''
+    def __init__(self, endpoint_dir: str, responder=None, poll_interval=1, timeout=LOCAL_BATCH_TIMEOUT):
+        self.endpoint_dir = endpoint_dir
+        self.responder = responder
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        if not os.path.exists(endpoint_dir):
+            os.makedirs(endpoint_dir)
+
+    def submit(self, input_path: str) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        endpoint_input = os.path.join(self.endpoint_dir, f"{batch_id}_input.jsonl")
+        shutil.copyfile(input_path, endpoint_input)
+        if self.responder is not None:
+            self._respond(batch_id, endpoint_input)
+        return batch_id
+
+    def _respond(self, batch_id: str, endpoint_input: str):
+        output_lines = []
+        with open(endpoint_input, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                content = self.responder(request["body"])
+                output_lines.append(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "model": request["body"].get("model"),
+                            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                            "usage": {"total_tokens": 0}
+                        }
+                    },
+                    "error": None
+                }, ensure_ascii=False))
+        output_path = os.path.join(self.endpoint_dir, f"{batch_id}_output.jsonl")
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(output_lines) + "\n")
+
+    def wait(self, batch_id: str, output_path: str):
+        endpoint_output = os.path.join(self.endpoint_dir, f"{batch_id}_output.jsonl")
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        while not os.path.exists(endpoint_output):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(
+                    f"local batch {batch_id}: no result file '{endpoint_output}' after {self.timeout}s "
+                    "(the backend was created without a responder, so the file must be written externally)"
+                )
+            time.sleep(self.poll_interval)
+        shutil.copyfile(endpoint_output, output_path)
+
+def make_client_responder(client):
+    '''
+    LocalBatchBackendのresponderとして、リクエストをOpenAI互換APIのchat.completionsに1件ずつ送る関数を返す。
+    - client : 送信先のクライアント(--base-urlで指定したローカルのスタブサーバなど)
+    '''
+    def respond(body: dict) -> str:
+        response = call_with_retry(client.chat.completions.create, stage="batch", **body)
+        if response.usage is not None:
+            log_token_usage(response.usage.total_tokens)
+        return response.choices[0].message.content
+    return respond
+
+def _batch_cache_key(stage: str, messages, response_format=None):
+    '''
+    ステージのルーティング設定(モデル、最大出力トークン数)に従い、request_chat_completionと同じキャッシュキーを生成する。
+    - response_format : 構造化出力のステージの場合に指定する
+    - return : (キャッシュキー, リクエストのbody)
+    '''
+    route = get_route(stage)
+    params = {"max_tokens": route["max_tokens"]} if route["max_tokens"] else {}
+    if response_format is not None:
+        params["response_format"] = response_format
+    cache_key = make_cache_key(stage, route["model"], messages, base_url=get_base_url(route["base_url"]), temperature=BATCH_TEMPERATURE, **params)
+    body = {"model": route["model"], "messages": messages, "temperature": BATCH_TEMPERATURE, **params}
+    return cache_key, body
+
+def make_batch_request(stage: str, messages, response_format=None) -> dict:
+    '''
+    Batch API形式のリクエスト1件を生成する。custom_idには"ステージ名:キャッシュキー"を用いる。
+    '''
+    cache_key, body = _batch_cache_key(stage, messages, response_format)
+    return {
+        "custom_id": f"{stage}:{cache_key}",
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": body
+    }
+
+def write_batch_requests(requests, path: str) -> int:
+    '''
+    リクエストのリストをJSONLファイルに書き出す。キャッシュ済みのリクエストと重複したリクエストは除外する。
+    - return : 書き出したリクエスト数
+    '''
+    written_ids = set()
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            custom_id = request["custom_id"]
+            cache_key = custom_id.split(":", 1)[1]
+            if custom_id in written_ids or peek_cached_response(cache_key) is not None:
+                continue
+            written_ids.add(custom_id)
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    return len(written_ids)
+
+def ingest_batch_results(path: str) -> int:
+    '''
+    Batch APIの結果ファイルを読み込み、各応答をLLM応答キャッシュに保存する。
+    - return : 取り込んだ応答数
+    '''
+    ingested = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            stage, cache_key = result["custom_id"].split(":", 1)
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                log_to_file(f"[BATCH] request {result['custom_id']} failed: {result.get('error')}")
+                continue
+            body = response["body"]
+            content = body["choices"][0]["message"]["content"].strip()
+            total_tokens = (body.get("usage") or {}).get("total_tokens")
+            if total_tokens:
+                log_token_usage(total_tokens)
+            store_response(cache_key, stage, body.get("model") or BATCH_MODEL, content)
+            ingested += 1
+    return ingested
+
+def _stage_request_args(stage: str, messages, structured=False) -> tuple:
+    '''
+    ステージのリクエストのステージ名・メッセージ・response_formatを返す。
+    structuredがTrueの場合は、構造化出力版(stage + "_json")のパイプラインと同じメッセージに組み替える。
+    '''
+    if not structured:
+        return stage, messages, None
+    structured_stage = stage + "_json"
+    return structured_stage, build_structured_messages(structured_stage, messages), build_response_format(structured_stage)
+
+def _cached_content(stage: str, messages, structured=False):
+    cache_key, _ = _batch_cache_key(*_stage_request_args(stage, messages, structured))
+    return peek_cached_response(cache_key)
+
+def _make_stage_request(stage: str, messages, structured=False) -> dict:
+    return make_batch_request(*_stage_request_args(stage, messages, structured))
+
+def _cached_time_and_place(sentence: str, structured=False):
+    '''
+    キャッシュに保存された第1波の時間・場所表現抽出の結果を解析して返す(無い場合、構造化出力が不正な場合はNone)。
+    '''
+    content = _cached_content("time_and_place", build_time_and_place_messages(sentence), structured)
+    if content is None:
+        return None
+    if not structured:
+        return parse_time_and_place(content, sentence)
+    data, error = parse_structured_response(content, "time_and_place_json")
+    return time_and_place_from_json(sentence, data) if error is None else None
+
+def _cached_predicates(sentence: str, structured=False):
+    '''
+    キャッシュに保存された第1波の述語抽出の結果を解析して返す(無い場合、構造化出力が不正な場合はNone)。
+    '''
+    content = _cached_content("predicates", build_predicate_messages(sentence), structured)
+    if content is None:
+        return None
+    if not structured:
+        return parse_predicates(content)
+    data, error = parse_structured_response(content, "predicates_json")
+    return predicates_from_json(data) if error is None else None
+
+def build_first_wave_requests(sentences, rule_based=False, structured=False) -> list:
+    '''
+    第1波(時間・場所表現抽出、述語抽出)のリクエストを生成する。
+    - rule_based : Trueの場合、規則で時間・場所表現を抽出できる文の時間・場所表現抽出リクエストは生成しない
+    - structured : Trueの場合、構造化出力版のリクエストを生成する
+    '''
+    requests = []
+    for sentence in sentences:
+        if not (rule_based and match_time_and_place(sentence + "。") is not None):
+            requests.append(_make_stage_request("time_and_place", build_time_and_place_messages(sentence + "。"), structured))
+        requests.append(_make_stage_request("predicates", build_predicate_messages(sentence), structured))
+    return requests
+
+def build_second_wave_requests(sentences, rule_based=False, structured=False) -> list:
+    '''
+    第2波(述語項構造抽出)のリクエストを生成する。第1波の結果がキャッシュに揃っている文のみが対象となる。
+    - rule_based : Trueの場合、規則で時間・場所表現を抽出できる文はその結果を用いる
+    - structured : Trueの場合、第1波の構造化出力の結果を用いて構造化出力版のリクエストを生成する
+    '''
+    requests = []
+    for sentence in sentences:
+        time_and_place = match_time_and_place(sentence + "。") if rule_based else None
+        if time_and_place is None:
+            time_and_place = _cached_time_and_place(sentence + "。", structured)
+            if time_and_place is None:
+                continue
+        predicates = _cached_predicates(sentence, structured)
+        if predicates is None:
+            continue
+        event_predicates, entity_predicates = predicates
+        messages = build_structure_messages(
+            sentence, event_predicates, entity_predicates, time_and_place["time"], time_and_place["place"]
+        )
+        requests.append(_make_stage_request("predicate_structures", messages, structured))
+    return requests
+
+def build_fused_requests(sentences) -> list:
+    '''
+    一括抽出(時間・場所表現、述語、述語項構造)のリクエストを生成する。依存関係が無いため1つの波で完結する。
+    '''
+    return [make_batch_request("fused_extraction", build_fused_messages(sentence)) for sentence in sentences]
+
+def run_batch_wave(wave_name: str, requests, backend, work_dir: str) -> int:
+    '''
+    1つの波のリクエストをJSONLに書き出し、バックエンドで実行して結果をキャッシュに取り込む。
+    - return : 取り込んだ応答数
+    '''
+    input_path = os.path.join(work_dir, f"{wave_name}_input.jsonl")
+    output_path = os.path.join(work_dir, f"{wave_name}_output.jsonl")
+    request_count = write_batch_requests(requests, input_path)
+    log_to_file(f"[BATCH] {wave_name}: {request_count} requests written to {input_path}")
+    if request_count == 0:
+        return 0
+
+    batch_id = backend.submit(input_path)
+    log_to_file(f"[BATCH] {wave_name}: submitted as {batch_id}")
+    backend.wait(batch_id, output_path)
+    ingested = ingest_batch_results(output_path)
+    log_to_file(f"[BATCH] {wave_name}: {ingested} responses ingested")
+    return ingested
+
+def run_batch_extraction(data, backend, work_dir="batch", fused=False, rule_based=False, structured=False):
+    '''
+    入力JSON全体の文に対して、時間・場所表現、述語、述語項構造の抽出をBatch APIで実行する。
+    結果はLLM応答キャッシュに保存され、その後のprocess_jsonで利用される。
+    - data : JSON形式のデータ
+    - backend : OpenAIBatchBackendまたはLocalBatchBackend
+    - work_dir : JSONLファイルを保存するディレクトリ
+    - fused : Trueの場合、一括抽出のリクエストを1つの波で実行する
+    - rule_based : Trueの場合、規則で時間・場所表現を抽出できる文はその抽出をBatch APIで実行しない
+    - structured : Trueの場合、各抽出ステージを構造化出力版(*_json)のリクエストとして実行する(一括抽出が優先される)
+    '''
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+
+    # (1) process_jsonと同じ規則で全文書の文を収集
+    sentences = []
+    for doc_value in data.values():
+        sentences.extend(collect_sentences(doc_value))
+    sentences = list(dict.fromkeys(sentences))
+
+    # (2) 一括抽出の場合は1つの波で完結する
+    if fused:
+        run_batch_wave("wave1_fused_extraction", build_fused_requests(sentences), backend, work_dir)
+        return
+
+    # (3) 第1波 : 時間・場所表現抽出と述語抽出
+    run_batch_wave("wave1_time_place_predicates", build_first_wave_requests(sentences, rule_based, structured), backend, work_dir)
+
+    # (4) 第2波 : 第1波の結果を用いた述語項構造抽出
+    run_batch_wave("wave2_predicate_structures", build_second_wave_requests(sentences, rule_based, structured), backend, work_dir)
@@ -0,0 +1,144 @@
+# benchmark.py
+# ルーティングプロファイルごとに、各ステージのレイテンシと料金を比較するベンチマーク
+# 各プロファイルは別プロセスで実行する(ノード・エッジのグローバルな状態を共有しないため)。
+#
+# 実行例 (ローカルのスタブサーバを使う場合):
+#   OPENAI_API_KEY=dummy python -m source.document_parsing.benchmark --input test.json --profiles default,economy,local --stub \
+#       --stub-model-latency gpt-4o=lognormal:0.0,0.4 --stub-model-latency gpt-4o-mini=lognormal:-0.8,0.4 \
+#       --stub-model-latency local-model=lognormal:0.7,0.3
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from source.document_parsing import inspection_audit, llm_cache, llm_client, llm_routing, local_tokenizer, rate_limiter
+from source.document_parsing.logger import initialize_logger
+from source.document_parsing.stub_server import StubConfig, start_stub_server
+
+def run_profile(input_path: str, profile: str, routing_config=None, base_url=None, concurrency=None, rpm=None, tpm=None) -> dict:
+    '''
+    1つのルーティングプロファイルでパイプラインを実行し、ステージごとの集計を返す(ワーカープロセスで実行される)。
+    全ての呼び出しを計測するため、LLM応答キャッシュは使用しない。
+    プロファイルでルーティングされるtokenize・gpt_inspectionのステージも計測するため、トークン分割はgptで、時間関係の点検はdeferredで実行する。
+    '''
+    from source.document_parsing.json_processor import process_json
+    from source.document_parsing.llm_request import get_usage_stats
+
+    # (1) 設定
+    llm_cache.CACHE_ENABLED = False
+    rate_limiter.configure_rate_limits(rpm, tpm)
+    local_tokenizer.set_tokenizer_backend("gpt")
+    inspection_audit.set_inspection_mode("deferred")
+    initialize_logger()
+    llm_routing.load_routing(profile, routing_config)
+    if base_url:
+        llm_client.set_base_url(base_url)
+        llm_routing.redirect_base_urls(base_url)
+
+    # (2) パイプラインの実行
+    with open(input_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    started_at = time.monotonic()
+    process_json(data, os.path.splitext(os.path.basename(input_path))[0], concurrency=concurrency)
+    inspection_audit.run_inspection_audit()
+    return {"profile": profile, "wall_seconds": time.monotonic() - started_at, "stages": get_usage_stats()}
+
+def format_report(results) -> str:
+    '''
+    プロファイルごとの結果を表形式の文字列にする。最初のプロファイルを基準とした比較も付ける。
+    '''
+    lines = []
+    header = f"{'profile':<10} {'stage':<22} {'model':<14} {'calls':>5} {'mean_s':>7} {'max_s':>7} {'prompt_tok':>10} {'compl_tok':>9} {'cost_usd':>9}"
+    lines.append(header)
+    lines.append("-" * len(header))
+    totals = []
+    for result in results:
+        total_latency = 0.0
+        total_cost = 0.0
+        for stage, stats in sorted(result["stages"].items()):
+            mean_latency = stats["latency_seconds"] / stats["calls"] if stats["calls"] else 0.0
+            total_latency += stats["latency_seconds"]
+            total_cost += stats["cost_usd"]
+            lines.append(
+                f"{result['profile']:<10} {stage:<22} {stats['model']:<14} {stats['calls']:>5} {mean_latency:>7.2f} "
+                f"{stats['max_latency_seconds']:>7.2f} {stats['prompt_tokens']:>10} {stats['completion_tokens']:>9} {stats['cost_usd']:>9.4f}"
+            )
+        totals.append((result["profile"], result["wall_seconds"], total_latency, total_cost))
+        lines.append("")
+
+    lines.append(f"{'profile':<10} {'wall_s':>8} {'llm_s':>8} {'cost_usd':>9} {'llm_s_ratio':>11} {'cost_ratio':>10}")
+    base_latency, base_cost = totals[0][2], totals[0][3]
+    for profile, wall_seconds, total_latency, total_cost in totals:
+        latency_ratio = total_latency / base_latency if base_latency else 0.0
+        cost_ratio = total_cost / base_cost if base_cost else 0.0
+        lines.append(f"{profile:<10} {wall_seconds:>8.2f} {total_latency:>8.2f} {total_cost:>9.4f} {latency_ratio:>11.2f} {cost_ratio:>10.2f}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="ルーティングプロファイルごとのレイテンシ・料金の比較")
+    parser.add_argument("--input", default="test.json", help="入力されるJSON形式ファイル")
+    parser.add_argument("--profiles", default="default,economy,local", help="比較するプロファイル(カンマ区切り)")
+    parser.add_argument("--routing-config", default=None, help="各プロファイルに重ねるルーティング設定のJSONファイル")
+    parser.add_argument("--base-url", default=None, help="全ステージの接続先を変更する場合に指定する")
+    parser.add_argument("--concurrency", type=int, default=None, help="文のLLM解析の同時実行数")
+    parser.add_argument("--stub", action="store_true", help="ローカルのスタブサーバを起動し、全ステージの接続先とする")
+    parser.add_argument("--stub-latency", default="fixed:0", help="スタブサーバの既定の遅延の分布")
+    parser.add_argument("--stub-model-latency", action="append", default=[], help="スタブサーバのモデルごとの遅延の分布 (例: gpt-4o-mini=fixed:0.3)")
+    parser.add_argument("--rpm", type=int, default=None, help="1分あたりのリクエスト数の上限(省略時は制限しない。スタブサーバ使用時は無視する)")
+    parser.add_argument("--tpm", type=int, default=None, help="1分あたりのトークン数の上限(省略時は制限しない。スタブサーバ使用時は無視する)")
+    parser.add_argument("--output", default=None, help="結果をJSONで保存するファイル")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--profile", default="default", help=argparse.SUPPRESS)
+    parser.add_argument("--result-path", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # (1) ワーカー : 1つのプロファイルを実行して結果をファイルに書き出す
+    if args.worker:
+        result = run_profile(args.input, args.profile, args.routing_config, args.base_url, args.concurrency, args.rpm, args.tpm)
+        with open(args.result_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        return
+
+    # (2) 必要に応じてスタブサーバを起動
+    base_url = args.base_url
+    server = None
+    if args.stub:
+        config = StubConfig(latency=args.stub_latency, model_latency=dict(item.split("=", 1) for item in args.stub_model_latency))
+        server, base_url = start_stub_server(config)
+
+    # (3) プロファイルごとにワーカープロセスで実行
+    results = []
+    try:
+        for profile in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                result_path = os.path.join(tmp_dir, "result.json")
+                command = [sys.executable, "-m", "source.document_parsing.benchmark", "--worker",
+                           "--profile", profile, "--input", args.input, "--result-path", result_path]
+                if args.routing_config:
+                    command += ["--routing-config", args.routing_config]
+                if base_url:
+                    command += ["--base-url", base_url]
+                if args.concurrency:
+                    command += ["--concurrency", str(args.concurrency)]
+                if not args.stub:
+                    for option, value in (("--rpm", args.rpm), ("--tpm", args.tpm)):
+                        if value is not None:
+                            command += [option, str(value)]
+                subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+                with open(result_path, "r", encoding="utf-8") as f:
+                    results.append(json.load(f))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    # (4) 結果の出力
+    print(format_report(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# checkpoint.py
+# 長時間の処理を途中から再開するためのチェックポイントを保存・復元するモジュール
+# チェックポイントはJSON Lines形式で、1行目に入力名とルートカテゴリノードのインデックスを持つヘッダを書き、
+# 文書の処理が終わるたびに、その文書で追加されたノード・エッジ、自動生成エッジ辞書のラベル、文の結果、点検の項目と、
+# インデックスのカウンタ、処理中の項目キャッシュを1行追記する(全体を書き直さないため、グラフが大きくなっても保存の時間は増えない)。
+# 再開時は各行を順に適用して状態を復元し、処理済みの文書を飛ばして続きから処理するため、インデックスの採番は中断しない場合と同一になる。
+
+import json
+import os
+from source.document_parsing import node_maker, edge_maker, sentence_store, inspection_audit
+from source.document_parsing.compact_records import record_to_json
+from source.document_parsing.incremental import snapshot_positions
+
+CHECKPOINT_VERSION = 2
+
+_written = {}  # 前回の追記までに書き出した各リストの長さ(snapshot_positionsの値と、自動生成エッジ辞書・文の結果・点検の項目の数)
+
+def _current_positions() -> dict:
+    positions = snapshot_positions()
+    positions["auto_labels"] = len(edge_maker.auto_generated_edge_dictionary)
+    positions["sentences"] = sentence_store.get_sentence_store_stats()["entries"]
+    positions["inspection"] = inspection_audit.get_inspection_record_count()
+    return positions
+
+def _write_line(path: str, mode: str, line: dict):
+    with open(path, mode, encoding="utf-8") as f:
+        f.write(json.dumps(line, ensure_ascii=False, default=record_to_json) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def start_checkpoint(path: str, filename: str, root_category_index: int):
+    '''
+    チェックポイントのファイルを作り直してヘッダを書き出す。以降の追記は、この時点以降に追加された内容のみを含む。
+    ルートカテゴリノードは最初の文書の行に含まれる。
+    - filename : process_jsonに与えられたルートカテゴリの名前
+    - root_category_index : ルートカテゴリノードのインデックス
+    '''
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    _write_line(path, "w", {"version": CHECKPOINT_VERSION, "filename": filename, "root_category_index": root_category_index})
+    _written.clear()
+    _written.update({key: 0 for key in _current_positions()})
+
+def save_checkpoint(path: str, doc_name: str, current_item: dict, document_span: dict):
+    '''
+    処理が終わった文書の差分をチェックポイントに1行追記する。
+    点検の項目は追記の時点の内容を書き出すため、点検が終わる前に書き出した項目は再開時にrun_inspection_auditで点検される。
+    - doc_name : 処理が終わった文書名
+    - current_item : 処理中の項目キャッシュ(最後の項目は次の文書の開始時に確定されるため)
+    - document_span : 文書のノード・エッジの範囲(マニフェストの書き出し用、incremental.pyを参照)
+    '''
+    positions = _current_positions()
+    line = {
+        "document": doc_name,
+        "span": document_span,
+        "positions": positions,
+        "categories": node_maker.category_structure[_written["category"]:positions["category"]],
+        "entities": node_maker.entity_structure[_written["entity"]:positions["entity"]],
+        "predicates": node_maker.predicate_structure[_written["predicate"]:positions["predicate"]],
+        "edges": edge_maker.edge[_written["edge"]:positions["edge"]],
+        "auto_labels": edge_maker.auto_generated_edge_dictionary[_written["auto_labels"]:positions["auto_labels"]],
+        "sentence_store": sentence_store.export_sentence_store(start=_written["sentences"]),
+        "inspection": inspection_audit.export_inspection_state(start=_written["inspection"]),
+        "current_item": {
+            "item_name": current_item["item_name"],
+            "nodes": list(current_item["nodes"]),
+            "original_sentences": current_item["original_sentences"]
+        }
+    }
+    _write_line(path, "a", line)
+    _written.update(positions)
+
+def load_checkpoint(path: str, filename: str, document_names) -> dict:
+    '''
+    チェックポイントを読み込み、同じ入力に対するものであることを確認する。
+    書き込み途中で中断した末尾の行は読み捨てる(再開時に切り詰められる)。
+    処理済みの文書が入力の文書の先頭部分と一致しない場合は、同じインデックスで再開できないためValueErrorを送出する。
+    - document_names : 入力の文書名のリスト(処理順)
+    - return : {"root_category_index", "completed_documents", "document_spans", "lines", ...}
+    '''
+    lines = []
+    valid_size = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            try:
+                lines.append(json.loads(raw.decode("utf-8")))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                break
+            valid_size += len(raw)
+    header = lines[0] if lines else {}
+    if header.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"unsupported checkpoint version: {header.get('version')}")
+    if header["filename"] != filename:
+        raise ValueError(f"checkpoint was created for '{header['filename']}', not '{filename}'")
+    completed = [line["document"] for line in lines[1:]]
+    if list(document_names)[:len(completed)] != completed:
+        raise ValueError("completed documents in the checkpoint do not match the input documents")
+    return {
+        "path": path,
+        "valid_size": valid_size,
+        "root_category_index": header["root_category_index"],
+        "completed_documents": completed,
+        "document_spans": {line["document"]: line["span"] for line in lines[1:]},
+        "lines": lines[1:]
+    }
+
+def restore_checkpoint(state: dict, current_item: dict):
+    '''
+    チェックポイントの各行をノード・エッジの各モジュールと項目キャッシュに適用して復元し、以降の追記に備える。
+    リストは他のモジュールから参照されているため、同じオブジェクトの中身を置き換える。
+    '''
+    # (1) 空の状態から各行の差分を順に追加
+    node_maker.load_node_structures([], [], [])
+    edge_maker.load_edges([])
+    edge_maker.auto_generated_edge_dictionary.clear()
+    sentence_entries, inspection_records = [], []
+    for line in state["lines"]:
+        for records, node_type in ((line["categories"], "category"),
+                                   (line["entities"], "entity"),
+                                   (line["predicates"], "predicate")):
+            for record in records:
+                node_maker.add_node_record(node_type, record)
+        for record in line["edges"]:
+            edge_maker.add_edge_record(record)
+        edge_maker.auto_generated_edge_dictionary.extend(line["auto_labels"])
+        sentence_entries.extend(line["sentence_store"]["entries"])
+        inspection_records.extend(line["inspection"]["records"])
+
+    # (2) カウンタ・項目キャッシュなど、最後の行の時点の状態を復元
+    if state["lines"]:
+        last = state["lines"][-1]
+        node_maker.index_number_node = last["positions"]["node_index"]
+        edge_maker.index_number_edge = last["positions"]["edge_index"]
+        current_item["item_name"] = last["current_item"]["item_name"]
+        current_item["nodes"][:] = last["current_item"]["nodes"]
+        current_item["original_sentences"] = last["current_item"]["original_sentences"]
+        sentence_store.import_sentence_store({"entries": sentence_entries, "stats": last["sentence_store"]["stats"]})
+        inspection_audit.import_inspection_state({"document": last["inspection"]["document"], "records": inspection_records})
+
+    # (3) 書き込み途中の末尾の行を切り詰め、以降の追記を続けられるようにする
+    os.truncate(state["path"], state["valid_size"])
+    _written.clear()
+    _written.update(_current_positions())
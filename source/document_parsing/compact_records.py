@@ -0,0 +1,112 @@
+# compact_records.py
+# ノード・エッジを少ないメモリで保持するためのレコード型
+# ノード・エッジは従来dictで保持していたが、件数が多い場合にキーの表を持つdictの大きさが無視できないため、
+# __slots__で属性を固定したレコードで保持する。レコードはdictと同じ読み出し方(node["index"], node.get(...), dict(node))ができる。
+# 文字列(エッジの種類、カテゴリの種類、ノードのテキスト、格要素)はsys.internで共有し、同じ文字列を重複して保持しない。
+
+import sys
+from collections.abc import Mapping
+
+class CompactRecord(Mapping):
+    '''
+    キーが固定された読み出し専用のレコード。_fieldsの順にキーを持ち、dictと同じ順で列挙される。
+    '''
+    __slots__ = ()
+    _fields = ()
+    _interned = ()  # sys.internで共有する文字列のフィールド
+
+    def __init__(self, *values):
+        for name, value in zip(self._fields, values):
+            if name in self._interned and isinstance(value, str):
+                value = sys.intern(value)
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        '''
+        dict(またはレコード)からレコードを作成する。
+        '''
+        return cls(*(data[name] for name in cls._fields))
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class CategoryRecord(CompactRecord):
+    __slots__ = ("index", "hierarchical_level", "category_type", "category_title")
+    _fields = __slots__
+    _interned = ("category_type", "category_title")
+
+class EntityRecord(CompactRecord):
+    __slots__ = ("index", "hierarchical_level", "entity")
+    _fields = __slots__
+    _interned = ("entity",)
+
+class PredicateRecord(CompactRecord):
+    '''
+    述語構造のノード。格要素(argument)は共有した文字列のタプルで保持する。
+    '''
+    __slots__ = ("index", "hierarchical_level", "agent_argument", "predicate", "argument", "modifier")
+    _fields = __slots__
+    _interned = ("agent_argument", "predicate", "modifier")
+
+    def __init__(self, index, hierarchical_level, agent_argument, predicate, argument, modifier):
+        super().__init__(index, hierarchical_level, agent_argument, predicate,
+                         tuple(sys.intern(arg) for arg in argument), modifier)
+
+    def __repr__(self):
+        return repr(dict(self, argument=list(self.argument)))
+
+class EdgeRecord(CompactRecord):
+    __slots__ = ("index", "type", "from", "to")
+    _fields = __slots__
+    _interned = ("type",)
+
+NODE_RECORD_TYPES = {"category": CategoryRecord, "entity": EntityRecord, "predicate": PredicateRecord}
+_FIELD_SETS = {record_type: frozenset(record_type._fields) for record_type in (CategoryRecord, EntityRecord, PredicateRecord, EdgeRecord)}
+
+def to_node_record(node_type: str, data):
+    '''
+    ノードのdictをレコードに変換する(レコードの場合はそのまま返す)。
+    想定と異なるキーを持つdictは変換せずにそのまま返す。
+    - node_type : "category", "entity", "predicate" のいずれか
+    '''
+    record_type = NODE_RECORD_TYPES[node_type]
+    if isinstance(data, record_type) or data.keys() != _FIELD_SETS[record_type]:
+        return data
+    return record_type.from_dict(data)
+
+def to_edge_record(data):
+    '''
+    エッジのdictをレコードに変換する(レコードの場合、想定と異なるキーを持つdictの場合はそのまま返す)。
+    '''
+    if isinstance(data, EdgeRecord) or data.keys() != _FIELD_SETS[EdgeRecord]:
+        return data
+    return EdgeRecord.from_dict(data)
+
+def record_to_json(value):
+    '''
+    json.dumpのdefaultに指定し、レコードをdictとして書き出す。
+    '''
+    if isinstance(value, CompactRecord):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,107 @@
+# concurrent_analysis.py
+# 文書内の文のLLM解析をasyncioで並行に実行するモジュール
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from source.document_parsing import sentence_parser
+from source.document_parsing.sentence_parser import analyze_sentence, register_sentence_analysis
+from source.document_parsing.predicate_extraction import extract_entity_and_predicate_structures
+from source.document_parsing.micro_batching import pack_sentences, extract_time_and_place_batch, extract_predicates_batch, MICRO_BATCH_MAX_TOKENS
+from source.document_parsing.time_and_place_rules import match_time_and_place
+from source.document_parsing.sentence_store import has_sentence_result
+
+DEFAULT_CONCURRENCY = 8  # 同時に解析する文の数の既定値
+
+def _run_limited(functions_and_args, concurrency):
+    '''
+    セマフォで同時実行数を制限しながら、(関数, 引数)のリストを並行に実行する。
+    - return : 入力と同じ順序の戻り値リスト
+    '''
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+
+        async def run_with_limit(func, args):
+            async with semaphore:
+                return await asyncio.to_thread(func, *args)
+
+        return await asyncio.gather(*(run_with_limit(func, args) for func, args in functions_and_args))
+
+    return asyncio.run(run_all())
+
+def _analyze_sentences_micro_batched(sentences, concurrency, micro_batch_size, micro_batch_tokens):
+    '''
+    時間・場所表現抽出と述語抽出は複数の文をまとめたプロンプトで、述語項構造抽出は文ごとに並行に実行する。
+    - return : sentencesと同じ順序の解析結果リスト
+    '''
+    # (1) 規則ベースが有効な場合は、規則で時間・場所表現を抽出できない文のみをLLMでの抽出の対象とする
+    local_time_and_place = {}
+    if sentence_parser.USE_RULE_BASED_TIME_AND_PLACE:
+        for sentence in sentences:
+            result = match_time_and_place(sentence + "。", record_stats=True)
+            if result is not None:
+                local_time_and_place[sentence] = result
+    escalated_sentences = [s for s in sentences if s not in local_time_and_place]
+
+    # (2) 文をグループに分割し、グループごとに時間・場所表現と述語を抽出
+    time_and_place_groups = pack_sentences(escalated_sentences, micro_batch_size, micro_batch_tokens)
+    predicate_groups = pack_sentences(sentences, micro_batch_size, micro_batch_tokens)
+    tasks = [(extract_time_and_place_batch, ([s + "。" for s in group],)) for group in time_and_place_groups]
+    tasks += [(extract_predicates_batch, (group,)) for group in predicate_groups]
+    group_results = _run_limited(tasks, concurrency)
+
+    escalated_results = []
+    for results in group_results[:len(time_and_place_groups)]:
+        escalated_results.extend(results)
+    escalated_time_and_place = dict(zip(escalated_sentences, escalated_results))
+    time_and_place_list = [local_time_and_place[s] if s in local_time_and_place else escalated_time_and_place[s] for s in sentences]
+    predicate_list = []
+    for results in group_results[len(time_and_place_groups):]:
+        predicate_list.extend(results)
+
+    # (3) 文ごとに述語項構造を抽出
+    structure_tasks = []
+    for sentence, time_and_place, (event_predicates, entity_predicates) in zip(sentences, time_and_place_list, predicate_list):
+        structure_tasks.append((extract_entity_and_predicate_structures, (
+            sentence, event_predicates, entity_predicates, time_and_place["time"], time_and_place["place"]
+        )))
+    structure_results = _run_limited(structure_tasks, concurrency)
+
+    analyses = []
+    for time_and_place, (event_predicates, entity_predicates), (structures, entities) in zip(time_and_place_list, predicate_list, structure_results):
+        analyses.append({
+            "time": time_and_place["time"],
+            "place": time_and_place["place"],
+            "event_predicates": event_predicates,
+            "entity_predicates": entity_predicates,
+            "structures": structures,
+            "entities": entities
+        })
+    return analyses
+
+def prefetch_sentence_analyses(sentences, concurrency=DEFAULT_CONCURRENCY, micro_batch_size=None, micro_batch_tokens=MICRO_BATCH_MAX_TOKENS):
+    '''
+    文のリストを並行に解析し、結果をsentence_parserに登録する。
+    ノードやエッジの生成はその後の逐次処理(process_sentence)で行われるため、
+    インデックスの採番は逐次実行の場合と同一になる。
+    - sentences : 解析対象の文のリスト(process_sentenceに渡される形式)
+    - concurrency : 同時に実行するLLM呼び出しの最大数
+    - micro_batch_size : 指定した場合、時間・場所表現抽出と述語抽出を最大この文数ずつまとめて実行する
+                         (一括抽出または構造化出力が有効な場合は使用しない)
+    - micro_batch_tokens : まとめる文の最大トークン数(概算)
+    '''
+    # 結果が記録済みの文(sentence_store)は解析しない
+    mode = sentence_parser.sentence_store_mode()
+    unique_sentences = [s for s in dict.fromkeys(sentences) if not has_sentence_result(s, mode)]
+    if not unique_sentences:
+        return
+    concurrency = max(1, concurrency or 1)
+
+    if micro_batch_size and micro_batch_size > 1 and not (sentence_parser.USE_FUSED_EXTRACTION or sentence_parser.USE_STRUCTURED_OUTPUT):
+        analyses = _analyze_sentences_micro_batched(unique_sentences, concurrency, micro_batch_size, micro_batch_tokens)
+    else:
+        analyses = _run_limited([(analyze_sentence, (s,)) for s in unique_sentences], concurrency)
+
+    for sentence, analysis in zip(unique_sentences, analyses):
+        register_sentence_analysis(sentence, analysis)
@@ -0,0 +1,483 @@
+# dry_run.py
+# APIを呼び出さずに、データセットの処理に必要なAPI呼び出し数・トークン数・料金・所要時間を見積もるモジュール
+# process_json/process_itemと同じ規則で入力を走査し、各ステージの実際のプロンプトを組み立ててトークン数を数える。
+# 前段の応答に依存する部分(述語のリストやノードのリスト)は、対象の文と同程度の長さとして見積もる。
+
+import os
+from source.document_parsing import inspection_audit, llm_cache, local_tokenizer, rate_limiter, sentence_parser, sentence_store
+from source.document_parsing.llm_cache import make_cache_key
+from source.document_parsing.llm_client import get_base_url
+from source.document_parsing.llm_routing import get_route, estimate_cost
+from source.document_parsing.text_utils import estimate_token_count, is_heading_start, split_heading_and_rest
+from source.document_parsing.json_processor import split_into_sentences
+from source.document_parsing.time_and_place_extraction import TIME_AND_PLACE_PREFIX, build_time_and_place_messages, parse_time_and_place
+from source.document_parsing.predicate_extraction import PREDICATE_PREFIX, STRUCTURE_PREFIX, build_predicate_messages, build_structure_messages, parse_structures
+from source.document_parsing.causal_relationship_extraction import CAUSAL_PREFIX, build_causal_messages
+from source.document_parsing.detailed_info_relationship_extraction import EXPLAIN_DETAILS_PREFIX, build_explain_details_messages
+from source.document_parsing.fused_extraction import FUSED_PREFIX, build_fused_messages
+from source.document_parsing.time_and_place_rules import match_time_and_place
+from source.document_parsing.micro_batching import pack_sentences, build_time_and_place_batch_messages, build_predicates_batch_messages, MICRO_BATCH_MAX_TOKENS
+from source.document_parsing.structured_output import STRUCTURED_PREFIXES, build_structured_messages, build_response_format
+from source.document_parsing.time_evolution_extraction import build_tokenize_messages, build_gpt_inspection_messages
+from source.document_parsing.entity_realation_extraction import build_entity_relationship_messages
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+TOKENS_PER_MESSAGE = 3           # メッセージ1件あたりの書式分のトークン数
+REPLY_PRIMING_TOKENS = 3         # 応答の開始を示す書式分のトークン数
+PROMPT_CACHE_MIN_TOKENS = 1024   # プロバイダ側のプロンプトキャッシュが効く最小のトークン数
+PROMPT_CACHE_INCREMENT = 128     # プロンプトキャッシュが効くトークン数の単位
+NUMBERED_OUTPUT_TOKENS = 4       # まとめて実行する場合の、1文あたりの文番号の行のトークン数
+
+# 少数ショットの例を持たないステージの応答トークン数の見積もり
+DRY_RUN_OUTPUT_TOKENS = {
+    "gpt_inspection": 16,
+    "entity_relationship": 120,
+}
+
+# プロンプトにノードのインデックスや前段の応答を含むため、入力内の重複やLLM応答キャッシュのヒットを見積もらないステージ
+INDEX_DEPENDENT_STAGES = (
+    "causal_relationship", "explain_details", "causal_relationship_json", "explain_details_json",
+    "tokenize", "entity_relationship", "gpt_inspection"
+)
+
+# 1回の呼び出しの所要時間の見積もり : 固定の待ち時間 + 入力トークン数 / 入力の処理速度 + 応答トークン数 / 生成速度
+LATENCY_BASE_SECONDS = 0.4
+PREFILL_TOKENS_PER_SECOND = 4000
+DEFAULT_OUTPUT_TOKENS_PER_SECOND = 50
+MODEL_OUTPUT_TOKENS_PER_SECOND = {
+    "gpt-4o": 70,
+    "gpt-4o-mini": 90,
+    "gpt-4.1": 70,
+    "gpt-4.1-mini": 90,
+    "gpt-4.1-nano": 120,
+    "local-model": 15,
+}
+
+_encodings = {}
+
+def _get_encoding(model: str):
+    '''
+    モデルに対応するtiktokenのエンコーディングを返す。tiktokenが利用できない場合はNone。
+    '''
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            # 登録されていないモデル(ローカルのモデルなど)はgpt-4o系のエンコーディングで数える
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # エンコーディングのファイルを取得できない場合など
+            _encodings[model] = None
+    return _encodings[model]
+
+def tokenizer_name(model: str = "gpt-4o") -> str:
+    encoding = _get_encoding(model)
+    return f"tiktoken ({encoding.name})" if encoding is not None else "estimate_token_count"
+
+def count_tokens(text: str, model: str) -> int:
+    '''
+    テキストのトークン数を数える。tiktokenが利用できない場合はestimate_token_countで概算する。
+    '''
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return estimate_token_count(text)
+    return len(encoding.encode(text))
+
+def count_message_tokens(messages, model: str) -> int:
+    '''
+    chat.completionsに渡すメッセージ全体の入力トークン数を数える。
+    '''
+    return sum(count_tokens(m.get("content", ""), model) + TOKENS_PER_MESSAGE for m in messages) + REPLY_PRIMING_TOKENS
+
+def _mean_example_output_tokens(prefix, model: str) -> float:
+    '''
+    固定部分に含まれる少数ショットの例の応答(assistant)の平均トークン数を返す。
+    '''
+    outputs = [count_tokens(m["content"], model) for m in prefix if m["role"] == "assistant"]
+    return sum(outputs) / len(outputs) if outputs else 0.0
+
+def _mean_example_nodes_per_sentence() -> float:
+    '''
+    少数ショットの例の応答から、1文あたりに生成されるノード数(述語項構造・エンティティ・時間・場所表現)の平均を求める。
+    '''
+    structures = [parse_structures(m["content"]) for m in STRUCTURE_PREFIX if m["role"] == "assistant"]
+    time_and_place = [
+        parse_time_and_place(answer["content"], question["content"])
+        for question, answer in zip(TIME_AND_PLACE_PREFIX, TIME_AND_PLACE_PREFIX[1:]) if answer["role"] == "assistant"
+    ]
+    structure_nodes = sum(len(s) + len(e) for s, e in structures) / len(structures) if structures else 1.0
+    time_and_place_nodes = sum(len(r["time"]) + len(r["place"]) for r in time_and_place) / len(time_and_place) if time_and_place else 0.0
+    return max(1.0, structure_nodes + time_and_place_nodes)
+
+# 項目の確定(finalize_current_item)が行われるか(ノードが2つ以上か)の判断に用いる、1文あたりのノード数の見積もり
+NODES_PER_SENTENCE = _mean_example_nodes_per_sentence()
+
+def _example_prefix(stage: str):
+    '''
+    応答トークン数の見積もりに用いる少数ショットの例を含む固定部分を返す。
+    '''
+    if stage in STRUCTURED_PREFIXES:
+        return STRUCTURED_PREFIXES[stage]
+    return {
+        "time_and_place": TIME_AND_PLACE_PREFIX,
+        "time_and_place_batch": TIME_AND_PLACE_PREFIX,
+        "predicates": PREDICATE_PREFIX,
+        "predicates_batch": PREDICATE_PREFIX,
+        "predicate_structures": STRUCTURE_PREFIX,
+        "causal_relationship": CAUSAL_PREFIX,
+        "explain_details": EXPLAIN_DETAILS_PREFIX,
+        "fused_extraction": FUSED_PREFIX,
+    }.get(stage)
+
+def estimate_output_tokens(stage: str, messages, model: str, sentence_count: int = 1) -> int:
+    '''
+    応答トークン数を見積もる。少数ショットの例があるステージは例の応答の平均、
+    トークン分割は例の入出力の比率、それ以外はDRY_RUN_OUTPUT_TOKENSを用いる。
+    - sentence_count : まとめて実行する場合の文数
+    '''
+    if stage == "tokenize":
+        example_ratio = count_tokens(messages[2]["content"], model) / max(1, count_tokens(messages[1]["content"], model))
+        output_tokens = count_tokens(messages[-1]["content"], model) * example_ratio
+    elif stage in DRY_RUN_OUTPUT_TOKENS:
+        output_tokens = DRY_RUN_OUTPUT_TOKENS[stage]
+    else:
+        output_tokens = _mean_example_output_tokens(_example_prefix(stage), model)
+        if stage.endswith("_batch"):
+            output_tokens = (output_tokens + NUMBERED_OUTPUT_TOKENS) * sentence_count
+    return int(round(output_tokens))
+
+def estimate_latency(model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+    '''
+    1回の呼び出しの所要時間(秒)を見積もる。
+    '''
+    output_speed = MODEL_OUTPUT_TOKENS_PER_SECOND.get(model, DEFAULT_OUTPUT_TOKENS_PER_SECOND)
+    return LATENCY_BASE_SECONDS + (input_tokens - cached_tokens) / PREFILL_TOKENS_PER_SECOND + output_tokens / output_speed
+
+def collect_items(data) -> list:
+    '''
+    process_json/process_itemと同じ規則で入力を走査し、項目(finalize_current_itemの単位)ごとに
+    文(process_sentenceに渡される形式)と原文、生成されるノード数の見積もりを列挙する。
+    - data : JSON形式のデータ {文書名: 文書の内容}
+    - return : [{"document", "name", "sentences", "original_sentences", "nodes"}, ...]
+    '''
+    items = []
+    current = {"document": None, "name": None, "sentences": [], "original_sentences": "", "nodes": 0}
+
+    def finalize():
+        # 項目名が無い場合は何もしない(内容は次の項目に引き継がれる)
+        if not current["name"]:
+            return
+        items.append(dict(current, sentences=list(current["sentences"])))
+        current.update(name=None, sentences=[], original_sentences="", nodes=0)
+
+    def add_sentence(sentence: str):
+        current["original_sentences"] += sentence
+        current["sentences"].append(sentence + "。")
+        current["nodes"] += NODES_PER_SENTENCE  # 1文から生成されるノード数は少数ショットの例から見積もる
+
+    def walk(key, value):
+        # (1) キーがある場合は新しい項目を開始する
+        if key:
+            finalize()
+            current["name"] = key
+        # (2) 階層構造を持つ場合は再帰的に走査する
+        if isinstance(value, dict):
+            for sub_key, sub_val in value.items():
+                walk(sub_key, sub_val)
+            return
+        if isinstance(value, list):
+            for sub_item in value:
+                walk("", sub_item)
+            return
+        # (3) 文字列の場合
+        if not isinstance(value, str) or not value.strip():
+            return
+        if is_heading_start(value):
+            heading_prefix, rest = split_heading_and_rest(value)
+            if heading_prefix is not None:
+                current["original_sentences"] += value
+                current["nodes"] += 1
+                if rest and "。" in rest:
+                    for s in split_into_sentences(rest):
+                        add_sentence(s)
+                elif rest:
+                    current["original_sentences"] += heading_prefix + rest
+                    current["nodes"] += 1
+                return
+        if "。" in value:
+            for s in split_into_sentences(value):
+                add_sentence(s)
+        else:
+            current["original_sentences"] += value
+            current["nodes"] += 1
+
+    for doc_name, doc_value in data.items():
+        finalize()
+        current["document"] = doc_name
+        walk("", doc_value)
+    finalize()
+    return items
+
+def _resolved_by_rules(sentence: str) -> bool:
+    '''
+    規則ベースの時間・場所表現抽出が有効で、その文の時間・場所表現がLLMを呼び出さずに得られるかどうか。
+    '''
+    return sentence_parser.USE_RULE_BASED_TIME_AND_PLACE and match_time_and_place(sentence + "。") is not None
+
+def _sentence_analysis_requests(sentence: str) -> list:
+    '''
+    1文の解析(analyze_sentence)で行われる呼び出しを (ステージ名, メッセージ, 文数) のリストで返す。
+    '''
+    if sentence_parser.USE_FUSED_EXTRACTION:
+        return [("fused_extraction", build_fused_messages(sentence), 1)]
+    requests = [
+        ("time_and_place", build_time_and_place_messages(sentence + "。"), 1),
+        ("predicates", build_predicate_messages(sentence), 1),
+        ("predicate_structures", build_structure_messages(sentence, [sentence], [], [], []), 1),
+    ]
+    if _resolved_by_rules(sentence):
+        requests = requests[1:]
+    if sentence_parser.USE_STRUCTURED_OUTPUT:
+        requests = [(stage + "_json", build_structured_messages(stage + "_json", messages), n) for stage, messages, n in requests]
+    return requests
+
+def _relation_requests(sentence: str) -> list:
+    '''
+    1文の因果関係・説明関係の抽出で行われる呼び出しを返す(ノードのリストは文1つ分として見積もる)。
+    '''
+    nodes = [{"index": 0, "text": sentence}]
+    requests = [
+        ("causal_relationship", build_causal_messages(sentence, nodes), 1),
+        ("explain_details", build_explain_details_messages(sentence, nodes), 1),
+    ]
+    if sentence_parser.USE_STRUCTURED_OUTPUT:
+        requests = [(stage + "_json", build_structured_messages(stage + "_json", messages), n) for stage, messages, n in requests]
+    return requests
+
+def _micro_batched_requests(sentences, micro_batch_size: int) -> tuple:
+    '''
+    まとめて実行する場合の呼び出しを、第1波(時間・場所表現と述語)と第2波(述語項構造)に分けて返す。
+    '''
+    first_wave = []
+    for group in pack_sentences([s for s in sentences if not _resolved_by_rules(s)], micro_batch_size, MICRO_BATCH_MAX_TOKENS):
+        if len(group) == 1:
+            first_wave.append(("time_and_place", build_time_and_place_messages(group[0] + "。"), 1))
+        else:
+            first_wave.append(("time_and_place_batch", build_time_and_place_batch_messages([s + "。" for s in group]), len(group)))
+    for group in pack_sentences(sentences, micro_batch_size, MICRO_BATCH_MAX_TOKENS):
+        if len(group) == 1:
+            first_wave.append(("predicates", build_predicate_messages(group[0]), 1))
+        else:
+            first_wave.append(("predicates_batch", build_predicates_batch_messages(group), len(group)))
+    second_wave = [_sentence_analysis_requests(s)[-1] for s in sentences]
+    return first_wave, second_wave
+
+def _item_predicate_nodes(item: dict) -> list:
+    # 述語ノードは文1つにつき1つとして見積もる
+    return [{"index": i, "predicate": s} for i, s in enumerate(item["sentences"], 1)]
+
+def _item_requests(item: dict) -> list:
+    '''
+    項目の確定(finalize_current_item)で行われる呼び出しを返す。
+    '''
+    if item["nodes"] < 2:
+        return []
+    predicate_nodes = _item_predicate_nodes(item)
+    requests = []
+    # ローカルのトークン分割を用いる場合はトークン分割の呼び出しは行われない
+    if predicate_nodes and local_tokenizer.resolve_tokenizer_backend() == "gpt":
+        requests.append(("tokenize", build_tokenize_messages([f"({n['index']}) {n['predicate']}" for n in predicate_nodes]), 1))
+    requests.append(("entity_relationship", build_entity_relationship_messages([], predicate_nodes, [], item["original_sentences"]), 1))
+    return requests
+
+def _inspection_requests(item: dict) -> list:
+    '''
+    時間関係の点検(inspection_audit)で行われる呼び出しを返す。点検を行わない設定の場合は空。
+    '''
+    predicate_nodes = _item_predicate_nodes(item)
+    if inspection_audit.INSPECTION_MODE == "off" or item["nodes"] < 2 or not predicate_nodes:
+        return []
+    return [("gpt_inspection", build_gpt_inspection_messages(item["original_sentences"], predicate_nodes, []), 1)]
+
+def estimate_dataset(data, concurrency=None, micro_batch_size=None) -> dict:
+    '''
+    データセットの処理に必要なAPI呼び出し数・トークン数・概算料金・所要時間を見積もる。
+    一括抽出・構造化出力・規則ベースの時間・場所表現抽出の設定(sentence_parser)とルーティング設定(llm_routing)、RPM・TPMの上限(rate_limiter)を反映する。
+    - data : JSON形式のデータ
+    - concurrency : process_jsonに与える同時実行数
+    - micro_batch_size : process_jsonに与える1つのプロンプトにまとめる最大文数
+    - return : {"documents", "items", "sentences", "tokenizer", "stages", "serial_seconds", "wall_seconds", "rate_limit_seconds", "rule_based_sentences"}
+    '''
+    stages = {}
+    seen_keys = set()
+    prefix_seen = set()
+    rate_limited = {"calls": 0, "tokens": 0}
+    # 既存のキャッシュファイルがある場合のみ参照する(見積もりのためにファイルを作成しない)
+    use_persistent_cache = llm_cache.CACHE_ENABLED and os.path.exists(llm_cache.CACHE_DB_PATH)
+
+    def account(stage: str, messages, sentence_count: int) -> float:
+        '''
+        1回の呼び出しを集計し、所要時間の見積もりを返す。
+        同一のリクエスト、以前の実行でLLM応答キャッシュに保存済みのリクエストはキャッシュから得られるため数えない。
+        '''
+        route = get_route(stage)
+        model = route["model"]
+        stats = stages.setdefault(stage, {
+            "model": model, "calls": 0, "cache_hits": 0, "input_tokens": 0, "cached_tokens": 0,
+            "output_tokens": 0, "cost_usd": 0.0, "latency_seconds": 0.0
+        })
+        # (1) LLM応答キャッシュによる重複の除外(前段の応答やノードのインデックスに依存しない文単位のステージのみ)
+        if llm_cache.CACHE_ENABLED and stage not in INDEX_DEPENDENT_STAGES:
+            # request_chat_completionと同じパラメータでキャッシュキーを生成する
+            params = {"max_tokens": route["max_tokens"]} if route["max_tokens"] else {}
+            if stage in STRUCTURED_PREFIXES:
+                params["response_format"] = build_response_format(stage)
+            key = make_cache_key(stage, model, messages, base_url=get_base_url(route["base_url"]), temperature=0.0, **params)
+            if key in seen_keys or (use_persistent_cache and llm_cache.peek_cached_response(key) is not None):
+                stats["cache_hits"] += 1
+                return 0.0
+            seen_keys.add(key)
+
+        # (2) 入力・応答トークン数。固定部分は2回目以降の呼び出しでプロンプトキャッシュが効くとみなす
+        input_tokens = count_message_tokens(messages, model)
+        output_tokens = estimate_output_tokens(stage, messages, model, sentence_count)
+        if route["max_tokens"]:
+            output_tokens = min(output_tokens, route["max_tokens"])
+        prefix_tokens = count_message_tokens(messages[:-1], model) - REPLY_PRIMING_TOKENS
+        cached_tokens = 0
+        if stage in prefix_seen and prefix_tokens >= PROMPT_CACHE_MIN_TOKENS:
+            cached_tokens = prefix_tokens // PROMPT_CACHE_INCREMENT * PROMPT_CACHE_INCREMENT
+        prefix_seen.add(stage)
+
+        # (3) 集計
+        latency = estimate_latency(model, input_tokens, cached_tokens, output_tokens)
+        stats["calls"] += 1
+        stats["input_tokens"] += input_tokens
+        stats["cached_tokens"] += cached_tokens
+        stats["output_tokens"] += output_tokens
+        stats["cost_usd"] += estimate_cost(model, input_tokens, cached_tokens, output_tokens)
+        stats["latency_seconds"] += latency
+        if not route["base_url"]:
+            rate_limited["calls"] += 1
+            rate_limited["tokens"] += input_tokens + output_tokens
+        return latency
+
+    def run_parallel(chains, workers=None) -> float:
+        '''
+        呼び出しの列(1文分の逐次的な呼び出しなど)を同時にworkers件(既定はconcurrency件)まで実行した場合の所要時間を返す。
+        '''
+        latencies = [sum(account(stage, messages, n) for stage, messages, n in chain) for chain in chains]
+        if not latencies:
+            return 0.0
+        return max(sum(latencies) / max(1, workers or concurrency or 1), max(latencies))
+
+    # (1) 文書・項目ごとの呼び出しを集計
+    items = collect_items(data)
+    use_micro_batch = micro_batch_size and micro_batch_size > 1 and not (sentence_parser.USE_FUSED_EXTRACTION or sentence_parser.USE_STRUCTURED_OUTPUT)
+    wall_seconds = 0.0
+    stored_sentences = set()
+    documents = list(dict.fromkeys(item["document"] for item in items))
+    for document in documents:
+        doc_items = [item for item in items if item["document"] == document]
+        doc_sentences = [s for item in doc_items for s in item["sentences"]]
+
+        # (1-1) 文の解析 : 並行実行・まとめて実行する場合は文書内の重複しない文を事前に解析する
+        if concurrency or micro_batch_size:
+            unique_sentences = list(dict.fromkeys(doc_sentences))
+            if use_micro_batch:
+                first_wave, second_wave = _micro_batched_requests(unique_sentences, micro_batch_size)
+                wall_seconds += run_parallel([[r] for r in first_wave]) + run_parallel([[r] for r in second_wave])
+            else:
+                wall_seconds += run_parallel([_sentence_analysis_requests(s) for s in unique_sentences])
+        else:
+            for s in doc_sentences:
+                wall_seconds += sum(account(stage, messages, n) for stage, messages, n in _sentence_analysis_requests(s))
+
+        # (1-2) 因果関係・説明関係の抽出と項目の確定は逐次的に行われる(既に現れた文はsentence_storeから再現される)
+        for s in doc_sentences:
+            if sentence_store.SENTENCE_STORE_ENABLED:
+                if s in stored_sentences:
+                    continue
+                stored_sentences.add(s)
+            wall_seconds += sum(account(stage, messages, n) for stage, messages, n in _relation_requests(s))
+        for item in doc_items:
+            wall_seconds += sum(account(stage, messages, n) for stage, messages, n in _item_requests(item))
+
+    # (1-3) 時間関係の点検はメインの処理とは別に並行して行われる(deferredは処理の後、backgroundは処理と重なる)
+    inspection_chains = [chain for chain in map(_inspection_requests, items) if chain]
+    inspection_seconds = run_parallel(inspection_chains, inspection_audit.INSPECTION_WORKERS)
+    if inspection_audit.INSPECTION_MODE == "deferred":
+        wall_seconds += inspection_seconds
+    else:
+        wall_seconds = max(wall_seconds, inspection_seconds)
+
+    serial_seconds = sum(stats["latency_seconds"] for stats in stages.values())
+    rule_based_sentences = None
+    if sentence_parser.USE_RULE_BASED_TIME_AND_PLACE and not sentence_parser.USE_FUSED_EXTRACTION:
+        unique_sentences = list(dict.fromkeys(s for item in items for s in item["sentences"]))
+        rule_based_sentences = (sum(_resolved_by_rules(s) for s in unique_sentences), len(unique_sentences))
+
+    # (2) RPM・TPMの上限による所要時間の下限
+    rate_limit_seconds = 0.0
+    if rate_limiter.RATE_LIMIT_ENABLED:
+        limiter = rate_limiter.rate_limiter
+        if limiter.rpm_limit:
+            rate_limit_seconds = max(rate_limit_seconds, 60.0 * rate_limited["calls"] / (limiter.rpm_limit * rate_limiter.RATE_LIMIT_MARGIN))
+        if limiter.tpm_limit:
+            rate_limit_seconds = max(rate_limit_seconds, 60.0 * rate_limited["tokens"] / (limiter.tpm_limit * rate_limiter.RATE_LIMIT_MARGIN))
+
+    return {
+        "documents": len(documents),
+        "items": len(items),
+        "sentences": sum(len(item["sentences"]) for item in items),
+        "tokenizer": tokenizer_name(),
+        "concurrency": concurrency,
+        "micro_batch_size": micro_batch_size,
+        "stages": stages,
+        "serial_seconds": serial_seconds,
+        "wall_seconds": max(wall_seconds, rate_limit_seconds),
+        "rate_limit_seconds": rate_limit_seconds,
+        "rule_based_sentences": rule_based_sentences,
+    }
+
+def format_dry_run_report(result: dict) -> str:
+    '''
+    estimate_datasetの結果を表形式の文字列にする。
+    '''
+    lines = [
+        f"documents={result['documents']}, items={result['items']}, sentences={result['sentences']}, tokenizer={result['tokenizer']}",
+        ""
+    ]
+    header = f"{'stage':<26} {'model':<14} {'calls':>6} {'cache_hit':>9} {'input_tok':>10} {'cached_tok':>10} {'output_tok':>10} {'cost_usd':>9} {'llm_s':>8}"
+    lines.append(header)
+    lines.append("-" * len(header))
+    totals = {"calls": 0, "cache_hits": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "cost_usd": 0.0, "latency_seconds": 0.0}
+    for stage, stats in result["stages"].items():
+        lines.append(
+            f"{stage:<26} {stats['model']:<14} {stats['calls']:>6} {stats['cache_hits']:>9} {stats['input_tokens']:>10} "
+            f"{stats['cached_tokens']:>10} {stats['output_tokens']:>10} {stats['cost_usd']:>9.4f} {stats['latency_seconds']:>8.1f}"
+        )
+        for key in totals:
+            totals[key] += stats[key]
+    lines.append("-" * len(header))
+    lines.append(
+        f"{'total':<26} {'':<14} {totals['calls']:>6} {totals['cache_hits']:>9} {totals['input_tokens']:>10} "
+        f"{totals['cached_tokens']:>10} {totals['output_tokens']:>10} {totals['cost_usd']:>9.4f} {totals['latency_seconds']:>8.1f}"
+    )
+    lines.append(f"note : tokenize / entity_relationship / gpt_inspection calls are heuristic (item node counts estimated at {NODES_PER_SENTENCE:.1f} per sentence from the few-shot examples)")
+    lines.append("")
+    lines.append(
+        f"projected wall clock : {result['wall_seconds']:.1f}s (concurrency={result['concurrency'] or 1}, "
+        f"micro_batch={result['micro_batch_size'] or '-'}, serial={result['serial_seconds']:.1f}s, "
+        f"rate_limit_floor={result['rate_limit_seconds']:.1f}s)"
+    )
+    if result["rule_based_sentences"]:
+        local, total = result["rule_based_sentences"]
+        lines.append(f"rule-based time/place : {local}/{total} unique sentences resolved locally ({local / total if total else 0.0:.1%})")
+    return "\n".join(lines)
@@ -1,13 +1,33 @@
 # edge_maker.py
 # ノード間のエッジを管理するモジュー
+# エッジは生成順にリストに保存し、インデックス・開始ノード・終端ノード・種類ごとの索引(エッジストア)を合わせて管理する。
+# リストにエッジを追加・復元する場合は、索引と一致させるためadd_edge_record・load_edgesを用いる。
+# エッジはdictと同じように読み出せるレコード(compact_records.py)に変換して保持する。
 
 from source.document_parsing.node_maker import get_node_content_by_index
+from source.document_parsing.compact_records import to_edge_record
 from source.document_parsing.logger import log_to_file
 
 index_number_edge = 1  # グローバルエッジID
 edge = []              # すべてのエッジを保存するリスト
 auto_generated_edge_dictionary = []  #自動生成エッジ辞書
 
+_edge_table = {}  # {エッジのインデックス: エッジ}
+_edges_from = {}  # {開始ノードのインデックス: [エッジ, ...]}
+_edges_to = {}    # {終端ノードのインデックス: [エッジ, ...]}
+_edges_by_type = {}  # {エッジの種類: [エッジ, ...]}
+_edge_keys = set()   # {(エッジの種類, 開始ノード, 終端ノード), ...}
+
+#　除外条件に該当する関係リスト(これらの関係の終端ノードはnext_TimeStamp関係の分析から除外する)
+EXCLUDE_RELATION_TARGETS = {
+    "explain_reason",
+    "info_SpecificTime",
+    "info_SpecificPlace",
+    "explain_details",
+    "correspond_to"
+}
+_excluded_targets = set()  # EXCLUDE_RELATION_TARGETSの関係の終端ノードのインデックス(エッジの追加時に更新する)
+
 def append_edge_info(edge_type, from_node_index, to_node_index, doc_created_edge_indexes=None):
     '''
     新しいエッジを生成してedgeリストに追加する。
@@ -23,7 +43,7 @@ def append_edge_info(edge_type, from_node_index, to_node_index, doc_created_edge
         'from': from_node_index,
         'to': to_node_index
     }
-    edge.append(edge_info)
+    add_edge_record(edge_info)
 
     if doc_created_edge_indexes is not None:
         doc_created_edge_indexes.add(index_number_edge)
@@ -35,6 +55,91 @@ def append_edge_info(edge_type, from_node_index, to_node_index, doc_created_edge
 
     index_number_edge += 1
 
+def add_edge_record(record: dict):
+    '''
+    インデックスが付与済みのエッジをレコードに変換してリストに追加し、索引に登録する(インデックスのカウンタは変更しない)。
+    '''
+    record = to_edge_record(record)
+    edge.append(record)
+    _index_edge(record)
+
+def _index_edge(record: dict):
+    _edge_table[record["index"]] = record
+    _edges_from.setdefault(record["from"], []).append(record)
+    _edges_to.setdefault(record["to"], []).append(record)
+    _edges_by_type.setdefault(record["type"], []).append(record)
+    _edge_keys.add((record["type"], record["from"], record["to"]))
+    if record["type"] in EXCLUDE_RELATION_TARGETS:
+        _excluded_targets.add(record["to"])
+
+def load_edges(records):
+    '''
+    エッジのリストの内容を置き換え、索引を作り直す(チェックポイントからの復元用)。
+    '''
+    edge[:] = [to_edge_record(record) for record in records]
+    _edge_table.clear()
+    _edges_from.clear()
+    _edges_to.clear()
+    _edges_by_type.clear()
+    _edge_keys.clear()
+    _excluded_targets.clear()
+    for record in edge:
+        _index_edge(record)
+
+def get_edges_by_indexes(indexes) -> list:
+    '''
+    インデックスの集合に含まれるエッジを生成順に返す(文書ごとのエッジの取得用)。
+    エッジ以外のインデックスが含まれていても無視する。所要時間は全エッジ数ではなくインデックスの数に比例する。
+    '''
+    return [_edge_table[edge_index] for edge_index in sorted(set(indexes)) if edge_index in _edge_table]
+
+def has_edge(edge_type, from_node_index, to_node_index) -> bool:
+    '''
+    指定した種類・開始ノード・終端ノードのエッジが存在するかどうかを返す。
+    '''
+    return (edge_type, from_node_index, to_node_index) in _edge_keys
+
+def is_excluded_target(node_index) -> bool:
+    '''
+    ノードが除外条件に該当する関係(EXCLUDE_RELATION_TARGETS)の終端ノードかどうかを返す。
+    '''
+    return node_index in _excluded_targets
+
+def out_edges(node_index, types=None) -> list:
+    '''
+    ノードを開始ノードとするエッジを生成順に返す。
+    - types : 指定した場合はその種類(の集合)のエッジのみ
+    '''
+    edges = _edges_from.get(node_index, [])
+    return [e for e in edges if e["type"] in types] if types is not None else list(edges)
+
+def in_edges(node_index, types=None) -> list:
+    '''
+    ノードを終端ノードとするエッジを生成順に返す。
+    - types : 指定した場合はその種類(の集合)のエッジのみ
+    '''
+    edges = _edges_to.get(node_index, [])
+    return [e for e in edges if e["type"] in types] if types is not None else list(edges)
+
+def edges_by_type(edge_type) -> list:
+    '''
+    指定した種類のエッジを生成順に返す。
+    '''
+    return list(_edges_by_type.get(edge_type, []))
+
+def edges_touching(node_indexes) -> list:
+    '''
+    開始ノードまたは終端ノードがノードの集合に含まれるエッジを生成順に返す。
+    所要時間は全エッジ数ではなく、集合のノードに接続するエッジの数に比例する。
+    '''
+    touching = {}
+    for node_index in set(node_indexes):
+        for e in _edges_from.get(node_index, ()):
+            touching[e["index"]] = e
+        for e in _edges_to.get(node_index, ()):
+            touching[e["index"]] = e
+    return [touching[edge_index] for edge_index in sorted(touching)]
+
 def get_edge():
     '''
     すべてのエッジリストを取得する。
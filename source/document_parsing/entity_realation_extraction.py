@@ -2,21 +2,21 @@
 # 自動生成エッジを生成するプログラムモジュール
 
 import re
-from openai import OpenAI
 from source.document_parsing.edge_maker import append_edge_info, get_auto_generated_edge_dictionary, add_auto_edge_label
-from source.document_parsing.logger import log_to_file, log_token_usage
+from source.document_parsing.logger import log_to_file
+from source.document_parsing.llm_request import request_chat_completion
+from source.document_parsing.llm_client import get_client
 
-client = OpenAI()
+client = get_client()
 
-def extract_entity_relationship(entity_nodes, predicate_nodes, edges, original_sentences, doc_created_edge_indexes):
+def build_entity_relationship_messages(entity_nodes, predicate_nodes, edges, original_sentences) -> list:
     """
-    ノード間に付与すべき自動生成エッジを分析し、必要に応じて新たなエッジラベルを
-    自動生成エッジ辞書へ追加したうえで、にノード間にエッジを付与する関数
+    自動生成エッジの分析のためにGPTに与えるメッセージを生成する関数
     - entity_nodes : エンティティノードを格納したリスト
     - predicate_nodes : 述語ノードを格納したリスト
     - edges : 事前に定義されているエッジのリスト
     - original_sentences : 原文テキスト全体
-    - doc_created_edge_indexes : 生成エッジのインデックスを登録するセット
+    - return : chat.completionsに渡すメッセージのリスト
     """
 
     # (1) GPTに与えるプロンプト
@@ -124,18 +124,26 @@ def extract_entity_relationship(entity_nodes, predicate_nodes, edges, original_s
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
+    return messages
+
+def extract_entity_relationship(entity_nodes, predicate_nodes, edges, original_sentences, doc_created_edge_indexes):
+    """
+    ノード間に付与すべき自動生成エッジを分析し、必要に応じて新たなエッジラベルを
+    自動生成エッジ辞書へ追加したうえで、にノード間にエッジを付与する関数
+    - entity_nodes : エンティティノードを格納したリスト
+    - predicate_nodes : 述語ノードを格納したリスト
+    - edges : 事前に定義されているエッジのリスト
+    - original_sentences : 原文テキスト全体
+    - doc_created_edge_indexes : 生成エッジのインデックスを登録するセット
+    """
+
+    # (1) GPTに与えるプロンプト
+    messages = build_entity_relationship_messages(entity_nodes, predicate_nodes, edges, original_sentences)
     content = ""
 
     # (2) OpenAI APIを呼び出す
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.0
-        )
-        content = response.choices[0].message.content.strip()
-        if hasattr(response, "usage") and hasattr(response.usage, "total_tokens"):
-            log_token_usage(response.usage.total_tokens)
+        content = request_chat_completion(client, "entity_relationship", messages)
     except Exception as e:
         print(f"[ERROR] OpenAI API call failed: {e}")
         return
@@ -0,0 +1,201 @@
+# fused_extraction.py
+# 時間・場所表現、述語、述語項構造とエンティティを1回のGPT呼び出しでまとめて抽出するモジュール
+
+import re
+from source.document_parsing.llm_request import request_chat_completion, freeze_messages, extend_prefix
+from source.document_parsing.time_and_place_extraction import parse_time_and_place
+from source.document_parsing.predicate_extraction import split_into_sentences, parse_predicates, parse_structures
+from source.document_parsing.llm_client import get_client
+
+client = get_client()
+
+FUSED_SECTION_HEADERS = ("[時間表現]", "[場所表現]", "[事象述語]", "[概念述語]", "[述語項構造]", "[エンティティ]")
+
+# 一括抽出のプロンプトと少数ショットの例
+FUSED_PROMPT = (
+    "[タスク目的]\n\n"
+    "入力文から、(A)時間表現と場所表現、(B)事象述語と概念述語、(C)述語項構造とエンティティを順に抽出する。\n"
+    "(C)は(A)(B)の結果を前提として抽出する。\n\n"
+    "[(A) 時間表現・場所表現]\n"
+    "- 時間表現は年月日、曜日、午前午後、または季節を含む『名詞句』のみ抽出する。\n"
+    "- 場所表現は地名、施設名、または特定の場所を表す『名詞句』のみ抽出する。\n"
+    "- 「の」で連結された名詞句は可能な限り一つの塊として扱う。ただし名詞以外の修飾表現が介入する場合は、コア名詞だけを抽出する。\n"
+    "- 存在しない場合は必ず「無し」を明示する。\n\n"
+    "[(B) 事象述語・概念述語]\n"
+    "- 述語は動作・状態・存在を表す文節であり、動詞・形容詞・形容動詞に加えて事態性名詞（サ変名詞）も含む。\n"
+    "- 事象述語 : 現実世界で実際に発生した動作・変化・現象を表す述語。「～となった」のような実際の状態変化も含む。\n"
+    "- 概念述語 : 抽象的な内容、属性、可能性、必要性、方策など、具体的な行為や変化を伴わない述語。\n"
+    "- 意味を持つ最低限の格要素を含めて抽出する（例：「けがをした」）。複合名詞は分割しない。\n"
+    "- 順序を維持しつつ重複を避ける。\n\n"
+    "[(C) 述語項構造・エンティティ]\n"
+    "- 事象述語を基に、述語と格要素(ガ格, ヲ格, ニ格, デ格, ト格, カラ格, ヨリ格, ヘ格, マデ格, ノ格など)、修飾語(修飾)、外の関係(外の関係)からなる述語項構造を抽出する。\n"
+    "- 連体修飾語は格要素に含め、連用修飾語は(修飾)として扱う。\n"
+    "- 格要素が原因事象や結果事象を表す場合は格要素に含めず、エンティティとして抽出する。外の関係は外の関係としてもエンティティとしても抽出する。\n"
+    "- 概念述語や事件性のない名詞表現（「ガクッという音」など）は名詞句化してエンティティとして抽出する。\n"
+    "- (A)で抽出した時間表現・場所表現は新たなエンティティとして扱わない。\n\n"
+    "[入力に関する説明]\n"
+    "- 原文 : 分析対象の文\n"
+    "- 短文分割結果 : 原文を句点(。)、読点(、)、セミコロン(;)を基準として分割し、番号を付けたもの\n\n"
+    "[出力形式]\n"
+    "[時間表現] <time : 時間表現1>, <time : 時間表現2>, ...\n"
+    "[場所表現] <place : 場所表現1>, <place : 場所表現2>, ...\n"
+    "[事象述語] (1)<述語1> (2)<述語2> …\n"
+    "[概念述語] (1)<述語1> (2)<述語2> …\n"
+    "[述語項構造]\n"
+    "(1) 述語(述語), 修飾語(修飾), 名詞1(格), 名詞2(格)\n"
+    "[エンティティ]\n"
+    "(1) エンティティ\n"
+    "該当するものが無い項目には「無し」と出力する。\n"
+)
+FUSED_EXAMPLES = [
+    {
+        "input": "東京ビッグサイトのエスカレーターにおいて、定員以上の乗客が乗り込んだため、ガクッという音とショックの後エスカレーターは停止し逆走した。",
+        "output": "[時間表現] <time : 無し>\n"
+                  "[場所表現] <place : 東京ビッグサイトのエスカレーター>\n"
+                  "[事象述語] (1)<乗り込んだ> (2)<停止し> (3)<逆走した>\n"
+                  "[概念述語] 無し\n"
+                  "[述語項構造]\n"
+                  "(1) 乗り込んだ(述語), 定員以上の乗客(ガ格)\n"
+                  "(2) 停止し(述語), エスカレーター(ガ格)\n"
+                  "(3) 逆走した(述語), エスカレーター(ガ格)\n"
+                  "[エンティティ]\n"
+                  "(1) ガクッという音\n"
+                  "(2) ショック"
+    },
+    {
+        "input": "客達は、エスカレーターの乗り口付近で仰向けに折り重なるようにして倒れ、10人がエスカレーターの段差に体をぶつけ足首を切ったり、軽い打撲のけがをした。",
+        "output": "[時間表現] <time : 無し>\n"
+                  "[場所表現] <place : エスカレーターの乗り口付近>\n"
+                  "[事象述語] (1)<折り重なる> (2)<倒れ> (3)<ぶつけ> (4)<切ったり> (5)<けがをした>\n"
+                  "[概念述語] 無し\n"
+                  "[述語項構造]\n"
+                  "(1) 折り重なる(述語), 客達(ガ格), 仰向け(ニ格)\n"
+                  "(2) 倒れ(述語), 客達(ガ格)\n"
+                  "(3) ぶつけ(述語), 10人(ガ格), エスカレーターの段差(ニ格), 体(ヲ格)\n"
+                  "(4) 切ったり(述語), 10人(ガ格), 足首(ヲ格)\n"
+                  "(5) けがをした(述語), 10人(ガ格), 軽い打撲(ノ格)\n"
+                  "[エンティティ]\n"
+                  "無し"
+    },
+    {
+        "input": "このエスカレーターは、荷重制限が約7.5t、逆送防止用ブレーキ能力の限界が約9.3tであったのに対し、事故当時は約120人が乗車したことから、逆送防止用ブレーキ能力の限界荷重をもオーバーし自動停止しさらにブレーキも効かず逆走・降下した。",
+        "output": "[時間表現] <time : 事故当時>\n"
+                  "[場所表現] <place : 無し>\n"
+                  "[事象述語] (1)<乗車した> (2)<オーバーし> (3)<自動停止し> (4)<効かず> (5)<逆走・降下した>\n"
+                  "[概念述語] (1)<約9.3tであった>\n"
+                  "[述語項構造]\n"
+                  "(1) 乗車した(述語), 約120人(ガ格)\n"
+                  "(2) 自動停止し(述語), エスカレーター(ガ格)\n"
+                  "(3) 効かず(述語), ブレーキ(ガ格)\n"
+                  "(4) 逆走・降下した(述語), エスカレーター(ガ格)\n"
+                  "[エンティティ]\n"
+                  "(1) 荷重制限が約7.5t\n"
+                  "(2) 逆送防止用ブレーキ能力の限界が約9.3tであった\n"
+                  "(3) 逆送防止用ブレーキ能力の限界荷重をもオーバー"
+    },
+    {
+        "input": "事故を起こしたエスカレーターは閉鎖された。",
+        "output": "[時間表現] <time : 無し>\n"
+                  "[場所表現] <place : 無し>\n"
+                  "[事象述語] (1)<起こした> (2)<閉鎖された>\n"
+                  "[概念述語] 無し\n"
+                  "[述語項構造]\n"
+                  "(1) 起こした(述語), 事故(ヲ格), エスカレーター(外の関係)\n"
+                  "(2) 閉鎖された(述語), エスカレーター(ガ格)\n"
+                  "[エンティティ]\n"
+                  "無し"
+    },
+    {
+        "input": "特にイベントなどで第三者に利用させる場合、適正な管理を確保させる 。",
+        "output": "[時間表現] <time : 無し>\n"
+                  "[場所表現] <place : 無し>\n"
+                  "[事象述語] 無し\n"
+                  "[概念述語] (1)<利用させる> (2)<確保させる>\n"
+                  "[述語項構造]\n"
+                  "無し\n"
+                  "[エンティティ]\n"
+                  "(1) イベント\n"
+                  "(2) 第三者利用\n"
+                  "(3) 適正な管理の確保"
+    }
+]
+
+def _build_fused_prefix() -> tuple:
+    '''
+    一括抽出のメッセージのうち、対象の文によらない固定部分(システムプロンプト、指示、少数ショットの例)を生成する。
+    '''
+    messages = [
+        {"role": "system", "content": "You are an assistant that extracts time and place expressions, predicates, predicate-argument structures and entities from a sentence."},
+        {"role": "user", "content": FUSED_PROMPT},
+    ]
+    for example in FUSED_EXAMPLES:
+        messages.append({"role": "user", "content": f"原文:\n{example['input']}\n\n短文分割結果:\n{split_into_sentences(example['input'])}\n\n"})
+        messages.append({"role": "assistant", "content": example["output"]})
+    return freeze_messages(messages)
+
+# 固定部分はモジュール読み込み時に一度だけ組み立てる
+FUSED_PREFIX = _build_fused_prefix()
+
+def build_fused_messages(sentence: str) -> list:
+    '''
+    時間・場所表現、述語、述語項構造、エンティティを一度に抽出するためにGPTに与えるメッセージを生成する関数。
+    - sentence : 処理対象の文
+    - return : chat.completionsに渡すメッセージのリスト
+    '''
+    # (1) 固定部分の後に対象の文を追加
+    return extend_prefix(FUSED_PREFIX, {"role": "user", "content": f"原文:\n{sentence}\n\n短文分割結果:\n{split_into_sentences(sentence)}\n\n"})
+
+def _split_sections(content: str) -> dict:
+    '''
+    応答を各見出し([時間表現]など)ごとのテキストに分割する。見出しが存在しない項目は含まれない。
+    '''
+    header_pattern = "|".join(re.escape(h) for h in FUSED_SECTION_HEADERS)
+    sections = {}
+    matches = list(re.finditer(header_pattern, content))
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        sections[m.group(0)] = content[m.start():end].strip()
+    return sections
+
+def parse_fused_extraction(content: str, sentence: str):
+    '''
+    一括抽出の応答を、個別ステージと同じパーサーを用いて解析する関数。
+    - content : GPTの応答テキスト
+    - sentence : 処理対象の文
+    - return : sentence_parser.analyze_sentenceと同じ形式の辞書。見出しが欠けている場合はNone
+    '''
+    sections = _split_sections(content)
+    if any(h not in sections for h in FUSED_SECTION_HEADERS):
+        return None
+
+    # (1) 時間・場所表現
+    time_and_place = parse_time_and_place(sections["[時間表現]"] + "\n" + sections["[場所表現]"], sentence)
+
+    # (2) 事象述語・概念述語
+    event_predicates, entity_predicates = parse_predicates(sections["[事象述語]"] + "\n" + sections["[概念述語]"])
+
+    # (3) 述語項構造・エンティティ
+    predicate_argument_structures, entities = parse_structures(sections["[述語項構造]"] + "\n" + sections["[エンティティ]"])
+
+    return {
+        "time": time_and_place["time"],
+        "place": time_and_place["place"],
+        "event_predicates": event_predicates,
+        "entity_predicates": entity_predicates,
+        "structures": predicate_argument_structures,
+        "entities": entities
+    }
+
+def extract_fused(sentence: str):
+    '''
+    1回のGPT呼び出しで文の時間・場所表現、述語、述語項構造、エンティティを抽出する関数。
+    - sentence : 処理対象の文
+    - return : analyze_sentenceと同じ形式の辞書。失敗した場合はNone
+    '''
+    try:
+        messages = build_fused_messages(sentence)
+        content = request_chat_completion(client, "fused_extraction", messages)
+        return parse_fused_extraction(content, sentence)
+    except Exception as e:
+        print(f"Error in fused extraction: {e}")
+        return None
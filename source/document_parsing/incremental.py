@@ -0,0 +1,144 @@
+# incremental.py
+# 入力データの更新時に、変更のあった文書のみを再解析するためのマニフェストを管理するモジュール
+# 文書ごとに内容のハッシュと、その文書で生成したノード・エッジ(文書の範囲内のインデックス)を結果と並べて保存する。
+# 次回の実行時にハッシュが一致する文書は、保存したノード・エッジを現在のインデックスに付け替えて追加し、LLMによる解析を行わない。
+
+import hashlib
+import json
+import os
+from source.document_parsing import node_maker, edge_maker
+from source.document_parsing.sentence_parser import sentence_store_mode
+from source.document_parsing.local_tokenizer import resolve_tokenizer_backend
+from source.document_parsing.compact_records import record_to_json
+
+MANIFEST_VERSION = 1
+
+def compute_document_hash(doc_value) -> str:
+    '''
+    文書の内容(JSONの値)のハッシュを返す。キーの順序は処理順に影響するため並べ替えない。
+    '''
+    text = json.dumps(doc_value, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def current_settings() -> dict:
+    '''
+    解析結果に影響する設定を返す。設定が異なるマニフェストの結果は再利用しない。
+    '''
+    return {"extraction_mode": list(sentence_store_mode()), "tokenizer": resolve_tokenizer_backend()}
+
+def snapshot_positions() -> dict:
+    '''
+    ノード・エッジの各リストの長さとインデックスのカウンタを返す。文書の開始時と終了時に取得して文書の範囲とする。
+    '''
+    return {
+        "category": len(node_maker.category_structure),
+        "entity": len(node_maker.entity_structure),
+        "predicate": len(node_maker.predicate_structure),
+        "edge": len(edge_maker.edge),
+        "node_index": node_maker.index_number_node,
+        "edge_index": edge_maker.index_number_edge
+    }
+
+def build_document_fragment(doc_hash: str, start: dict, end: dict, root_category_index: int, trailing_edges: int = 0):
+    '''
+    文書の範囲のノード・エッジをマニフェストに保存する形にまとめる。
+    文書の範囲外のノード(ルートカテゴリノードを除く)を参照するエッジがある場合は再現できないためNoneを返す。
+    - start, end : 文書の開始時・終了時のsnapshot_positionsの値
+    - trailing_edges : 文書の最後の項目の確定で生成したエッジの数(範囲の末尾にある)
+    '''
+    edges = edge_maker.edge[start["edge"]:end["edge"]]
+    for e in edges:
+        for node_index in (e["from"], e["to"]):
+            if node_index != root_category_index and not start["node_index"] <= node_index < end["node_index"]:
+                return None
+    edge_types = {e["type"] for e in edges}
+    return {
+        "hash": doc_hash,
+        "node_index": start["node_index"],
+        "edge_index": start["edge_index"],
+        "categories": node_maker.category_structure[start["category"]:end["category"]],
+        "entities": node_maker.entity_structure[start["entity"]:end["entity"]],
+        "predicates": node_maker.predicate_structure[start["predicate"]:end["predicate"]],
+        "edges": edges,
+        "auto_labels": [item for item in edge_maker.auto_generated_edge_dictionary if item["label"] in edge_types],
+        "trailing_edges": trailing_edges
+    }
+
+def replay_document_fragment(fragment: dict, root_category_index: int, stored_root_index: int, doc_created_indexes=None):
+    '''
+    保存された文書のノード・エッジを、現在のインデックスに付け替えて追加する。
+    - stored_root_index : マニフェストの作成時のルートカテゴリノードのインデックス
+    - doc_created_indexes : 追加したノード・エッジのインデックスを記録するセット
+    - return : 文書カテゴリノードのインデックス
+    '''
+    node_offset = node_maker.index_number_node - fragment["node_index"]
+    edge_offset = edge_maker.index_number_edge - fragment["edge_index"]
+
+    def remap(node_index):
+        return root_category_index if node_index == stored_root_index else node_index + node_offset
+
+    # (1) ノードを追加(カテゴリ・エンティティ・述語構造)
+    node_count = 0
+    for records, node_type in ((fragment["categories"], "category"),
+                               (fragment["entities"], "entity"),
+                               (fragment["predicates"], "predicate")):
+        for record in records:
+            node_maker.add_node_record(node_type, dict(record, index=record["index"] + node_offset))
+            if doc_created_indexes is not None:
+                doc_created_indexes.add(record["index"] + node_offset)
+        node_count += len(records)
+
+    # (2) エッジを追加
+    for e in fragment["edges"]:
+        edge_maker.add_edge_record(dict(e, index=e["index"] + edge_offset, **{"from": remap(e["from"]), "to": remap(e["to"])}))
+        if doc_created_indexes is not None:
+            doc_created_indexes.add(e["index"] + edge_offset)
+
+    # (3) 自動生成エッジ辞書のラベルを追加(既に存在するラベルは追加されない)
+    for item in fragment["auto_labels"]:
+        edge_maker.add_auto_edge_label(item["label"], item["explanation"])
+
+    node_maker.index_number_node += node_count
+    edge_maker.index_number_edge += len(fragment["edges"])
+    return fragment["categories"][0]["index"] + node_offset
+
+def load_manifest(path: str, filename: str):
+    '''
+    マニフェストを読み込む。存在しない場合や、入力名・設定が異なる場合は再利用できる文書が無いものとしてNoneを返す。
+    - return : {"root_category_index": ..., "documents": {doc_name: fragment, ...}} またはNone
+    '''
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("filename") != filename or manifest.get("settings") != current_settings():
+        return None
+    return manifest
+
+def write_manifest(path: str, filename: str, root_category_index: int, document_spans: dict):
+    '''
+    文書ごとのハッシュとノード・エッジをマニフェストとして書き出す。
+    - document_spans : {doc_name: {"hash", "start", "end", "trailing_edges"}, ...} (startとendはsnapshot_positionsの値)
+    - return : マニフェストに保存した文書の数
+    '''
+    documents = {}
+    for doc_name, span in document_spans.items():
+        fragment = build_document_fragment(span["hash"], span["start"], span["end"], root_category_index, span.get("trailing_edges", 0))
+        if fragment is not None:
+            documents[doc_name] = fragment
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "filename": filename,
+        "settings": current_settings(),
+        "root_category_index": root_category_index,
+        "documents": documents
+    }
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, default=record_to_json)
+    os.replace(temp_path, path)
+    return len(documents)
@@ -0,0 +1,167 @@
+# inspection_audit.py
+# 時間関係の点検(GPT_inspection)を、ノード・エッジの生成とは切り離した後処理として実行するモジュール
+# 点検の結果はエッジにはならないため、項目の確定時には点検に必要なデータのみを記録し、
+# 点検は別スレッド(background)またはJSON全体の処理の後(deferred)に実行してレポートに書き出す。
+# - off : 点検を行わない(既定)
+# - deferred : process_jsonの終了後にまとめて点検する
+# - background : 項目の確定時に別スレッドで点検を開始し、メインの処理は待たない
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from source.document_parsing.logger import log_to_file
+from source.document_parsing.time_evolution_extraction import GPT_inspection
+
+INSPECTION_MODES = ("off", "deferred", "background")
+INSPECTION_MODE = "off"
+INSPECTION_WORKERS = 4  # 点検を同時に実行する数
+
+_inspection_lock = threading.Lock()
+_inspection_records = []  # [{"document", "item", "original_sentences", "predicate_nodes", "time_evolution_edges", "candidates"}, ...]
+_inspection_futures = []
+_executor = None
+_current_document = None
+
+def set_inspection_mode(mode: str):
+    '''
+    時間関係の点検の実行方法を設定する。
+    - mode : "off", "deferred", "background" のいずれか
+    '''
+    global INSPECTION_MODE
+    if mode not in INSPECTION_MODES:
+        raise ValueError(f"unknown inspection mode: {mode}")
+    INSPECTION_MODE = mode
+
+def set_inspection_document(document: str):
+    '''
+    以降に記録される項目が属する文書名を設定する(process_jsonから呼ばれる)。
+    '''
+    global _current_document
+    _current_document = document
+
+def export_inspection_state(start: int = 0) -> dict:
+    '''
+    記録された項目(点検の結果を含む)と現在の文書名をJSONに変換できる形で返す(チェックポイント用)。
+    - start : 指定した場合、この位置以降に記録された項目のみを返す(チェックポイントへの追記用)
+    '''
+    with _inspection_lock:
+        return {"document": _current_document, "records": [dict(r) for r in _inspection_records[start:]]}
+
+def get_inspection_record_count() -> int:
+    '''
+    記録された項目の数を返す。
+    '''
+    with _inspection_lock:
+        return len(_inspection_records)
+
+def import_inspection_state(state: dict):
+    '''
+    export_inspection_stateで出力した内容を復元する。点検が終わっていない項目はrun_inspection_auditで点検される。
+    '''
+    global _current_document
+    with _inspection_lock:
+        _current_document = state["document"]
+        _inspection_records[:] = state["records"]
+        for record in _inspection_records:
+            record["time_evolution_edges"] = [tuple(e) for e in record["time_evolution_edges"]]
+            if record["candidates"] is not None:
+                record["candidates"] = [tuple(c) for c in record["candidates"]]
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=INSPECTION_WORKERS)
+    return _executor
+
+def _inspect(record: dict):
+    '''
+    1つの項目を点検し、見落とされた可能性のある時間関係をrecordの"candidates"に格納する。
+    '''
+    record["candidates"] = GPT_inspection(record["original_sentences"], record["predicate_nodes"], record["time_evolution_edges"])
+    return record
+
+def record_inspection_item(item_name: str, original_sentences: str, predicate_nodes, time_evolution_edges):
+    '''
+    項目の確定時に、点検に必要なデータ(原文、述語ノードのテキスト、付与された時間関係)を記録する。
+    backgroundの場合はこの時点で別スレッドで点検を開始する。
+    - predicate_nodes : 述語ノードのリスト [{'index':..., 'predicate':...}, ...]
+    - time_evolution_edges : 付与されたnext_TimeStamp関係 (from_idx, to_idx) のリスト
+    '''
+    if INSPECTION_MODE == "off":
+        return
+    record = {
+        "document": _current_document,
+        "item": item_name,
+        "original_sentences": original_sentences,
+        "predicate_nodes": [{"index": nd["index"], "predicate": nd.get("predicate", nd.get("entity", ""))} for nd in predicate_nodes],
+        "time_evolution_edges": list(time_evolution_edges),
+        "candidates": None
+    }
+    with _inspection_lock:
+        _inspection_records.append(record)
+        if INSPECTION_MODE == "background":
+            _inspection_futures.append(_get_executor().submit(_inspect, record))
+
+def run_inspection_audit() -> list:
+    '''
+    記録された項目のうち未点検のものを点検し、backgroundで開始した点検の終了を待つ。
+    - return : 点検済みの記録のリスト
+    '''
+    with _inspection_lock:
+        pending = [r for r in _inspection_records if r["candidates"] is None]
+        futures = list(_inspection_futures)
+        _inspection_futures.clear()
+
+    # (1) backgroundで開始した点検の終了を待つ
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            log_to_file(f"[ERROR] GPT_inspection failed: {e}")
+
+    # (2) 未点検の項目(deferred)を並行に点検する
+    pending = [r for r in pending if r["candidates"] is None]
+    if pending:
+        list(_get_executor().map(_inspect, pending))
+
+    # (3) 点検の結果をログに出力
+    for record in _inspection_records:
+        texts = {nd["index"]: nd["predicate"] for nd in record["predicate_nodes"]}
+        if record["candidates"]:
+            log_to_file(f"[Time Evolution] GPT found new Next_TimeStamp relationship candidates ({record['document']} / {record['item']}):")
+            for (a_idx, b_idx) in record["candidates"]:
+                log_to_file(f"  Node#{a_idx}({texts.get(a_idx, 'N/A')}) => Node#{b_idx}({texts.get(b_idx, 'N/A')})")
+        else:
+            log_to_file(f"[Time Evolution] No missing Next_TimeStamp relationships were detected ({record['document']} / {record['item']})")
+    return list(_inspection_records)
+
+def write_inspection_report(path: str) -> dict:
+    '''
+    点検の結果をJSONのレポートとして書き出す。
+    - return : 集計 {"items", "items_with_candidates", "candidates"}
+    '''
+    items = []
+    for record in _inspection_records:
+        texts = {nd["index"]: nd["predicate"] for nd in record["predicate_nodes"]}
+        items.append({
+            "document": record["document"],
+            "item": record["item"],
+            "time_evolution_edges": [list(edge) for edge in record["time_evolution_edges"]],
+            "candidates": [
+                {"from": a_idx, "to": b_idx, "from_text": texts.get(a_idx, "N/A"), "to_text": texts.get(b_idx, "N/A")}
+                for (a_idx, b_idx) in (record["candidates"] or [])
+            ]
+        })
+    summary = {
+        "items": len(items),
+        "items_with_candidates": sum(1 for item in items if item["candidates"]),
+        "candidates": sum(len(item["candidates"]) for item in items)
+    }
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "items": items}, f, ensure_ascii=False, indent=2)
+    return summary
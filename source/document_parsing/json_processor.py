@@ -1,13 +1,20 @@
 # json_processor.py
 
+import os
 from source.document_parsing.logger import log_to_file, produce_similarity_report, log_and_print_final_results
-from source.document_parsing.node_maker import append_category_info, append_entity_info, get_entity_structure, get_predicate_structure, get_category_structure
-from source.document_parsing.edge_maker import append_edge_info, get_edge
-from source.document_parsing.sentence_parser import process_sentence
+from source.document_parsing.node_maker import append_category_info, append_entity_info, get_nodes_by_indexes
+from source.document_parsing.edge_maker import append_edge_info, get_edges_by_indexes, is_excluded_target, edges_touching
+from source.document_parsing.sentence_parser import process_sentence, clear_sentence_analyses, sentence_analysis_stages, sentence_store_mode, mark_analysis_start
 from source.document_parsing.similarity_based_equivalent_extraction import run_similarity_check, create_equivalent_edges
 from source.document_parsing.text_utils import is_heading_start, split_heading_and_rest
 from source.document_parsing.time_evolution_extraction import calculate_event_evolution_relationship
 from source.document_parsing.entity_realation_extraction import extract_entity_relationship
+from source.document_parsing.concurrent_analysis import prefetch_sentence_analyses
+from source.document_parsing.inspection_audit import record_inspection_item, set_inspection_document
+from source.document_parsing.checkpoint import start_checkpoint, save_checkpoint, load_checkpoint, restore_checkpoint
+from source.document_parsing.stage_scheduler import pipeline_enabled, start_sentence_pipeline, clear_sentence_pipeline
+from source.document_parsing.sentence_store import has_sentence_result
+from source.document_parsing.incremental import compute_document_hash, snapshot_positions, replay_document_fragment, load_manifest, write_manifest
 
 # 項目キャッシュ: 処理中の項目に属するノード情報を保持する
 _current_item_cache = {
@@ -16,15 +23,6 @@ _current_item_cache = {
     "original_sentences" : ""   # 原文
 }
 
-#　除外条件に該当する関係リスト
-EXCLUDE_RELATION_TARGETS = {
-    "explain_reason",
-    "info_SpecificTime",
-    "info_SpecificPlace",
-    "explain_details",
-    "correspond_to"
-}
-
 def finalize_current_item(doc_created_edge_indexes=None):
     '''
     現在の項目情報をもとに、時系列の計算などを行って next_TimeStampエッジを生成する。
@@ -36,10 +34,6 @@ def finalize_current_item(doc_created_edge_indexes=None):
 
     if len(_current_item_cache["nodes"]) >= 2:
         # (2) 分析対象データの準備
-        # (2-1) ノードの情報を取得
-        all_entities   = get_entity_structure()
-        all_predicates = get_predicate_structure()
-
         # (2-2) 項目キャッシュからインデックス情報を抽出
         item_entity_indexes = [ x["index"] for x in _current_item_cache["nodes"] if x["type"] == "entity" ]
         item_predicate_indexes = [ x["index"] for x in _current_item_cache["nodes"] if x["type"] == "predicate" ]
@@ -49,30 +43,30 @@ def finalize_current_item(doc_created_edge_indexes=None):
 
         # (3) next_TimeStamp関係を生成
         # (3-1) 除外条件に該当する関係を持つノードは分析から除外
-        excluded_nodes = set()
-        all_edges = get_edge()
-        for e in all_edges:
-            if e["type"] in EXCLUDE_RELATION_TARGETS:
-                excluded_nodes.add(e["to"])
+        #       (除外条件に該当する関係の終端ノードはエッジの追加時にedge_makerで記録している)
+        excluded_nodes = {idx for idx in item_entity_indexes + item_predicate_indexes if is_excluded_target(idx)}
 
         # (3-2) インデックス情報からevent_evolution_relationship分析対象ノードを取得
         item_entity_for_event_indexes = [ idx for idx in item_entity_indexes if idx not in excluded_nodes]
         item_predicate_for_event_indexes = [ idx for idx in item_predicate_indexes if idx not in excluded_nodes]
-        item_entity_nodes = [ e for e in all_entities   if e["index"] in item_entity_for_event_indexes ]
-        item_predicate_nodes = [ p for p in all_predicates if p["index"] in item_predicate_for_event_indexes ]
+        item_entity_nodes = get_nodes_by_indexes(item_entity_for_event_indexes, "entity")
+        item_predicate_nodes = get_nodes_by_indexes(item_predicate_for_event_indexes, "predicate")
 
         # (3-3) time_evolution_extractionモジュールに渡してnext_TimeStamp関係を生成
-        calculate_event_evolution_relationship(item_entity_nodes, item_predicate_nodes, original_sentences, doc_created_edge_indexes)
+        time_evolution_relationship = calculate_event_evolution_relationship(item_entity_nodes, item_predicate_nodes, original_sentences, doc_created_edge_indexes)
+
+        # (3-4) 時間関係の点検(GPT_inspection)に必要なデータを記録(点検はinspection_auditで後処理として行う)
+        if item_predicate_nodes:
+            record_inspection_item(_current_item_cache["item_name"], original_sentences, item_predicate_nodes, time_evolution_relationship)
 
         # (4) 自動生成関係を生成
         # (4-1) インデックス情報からextract_entity_relationship分析対象ノードを取得
-        item_entity_nodes = [ e for e in all_entities   if e["index"] in item_entity_indexes ]
-        item_predicate_nodes = [ p for p in all_predicates if p["index"] in item_predicate_indexes ]
+        item_entity_nodes = get_nodes_by_indexes(item_entity_indexes, "entity")
+        item_predicate_nodes = get_nodes_by_indexes(item_predicate_indexes, "predicate")
         
         # (4-2) インデックス情報からextract_entity_relationship分析対象エッジを取得
-        all_edges = get_edge()
         item_node_indexes = set(item_entity_indexes + item_predicate_indexes)
-        item_edges = [edge for edge in all_edges if (edge["from"] in item_node_indexes or edge["to"] in item_node_indexes)]
+        item_edges = edges_touching(item_node_indexes)
 
         # (4-3) entity_realation_extractionモジュールに渡して自動生成関係を生成
         extract_entity_relationship(item_entity_nodes, item_predicate_nodes, item_edges, original_sentences, doc_created_edge_indexes)
@@ -102,6 +96,36 @@ def add_original_sentence_to_current_item(sentence:str):
     '''
     _current_item_cache["original_sentences"] = _current_item_cache["original_sentences"]+sentence
 
+def split_into_sentences(text: str) -> list:
+    '''
+    テキストを句点(。)で分割し、空でない文を前後の空白を除去して返す。
+    '''
+    return [s.strip() for s in text.split("。") if s.strip()]
+
+def collect_sentences(value) -> list:
+    '''
+    process_itemと同じ規則でJSONの値を走査し、process_sentenceに渡される文を出現順に列挙する。
+    - value : JSONの値（文字列・リスト・辞書）
+    - return : 文のリスト(末尾に"。"を付与した形式)
+    '''
+    sentences = []
+    if isinstance(value, dict):
+        for sub_val in value.values():
+            sentences.extend(collect_sentences(sub_val))
+    elif isinstance(value, list):
+        for sub_item in value:
+            sentences.extend(collect_sentences(sub_item))
+    elif isinstance(value, str) and value.strip():
+        if is_heading_start(value):
+            heading_prefix, rest = split_heading_and_rest(value)
+            if heading_prefix is not None:
+                if rest and "。" in rest:
+                    sentences.extend(s + "。" for s in split_into_sentences(rest))
+                return sentences
+        if "。" in value:
+            sentences.extend(s + "。" for s in split_into_sentences(value))
+    return sentences
+
 def process_item(key, value, parent_category_index=None, hierarchical_level=0, doc_created_indexes=None):
     '''
     JSONのキーと値に応じて再帰的にノード生成や文解析を行う関数。
@@ -157,11 +181,7 @@ def process_item(key, value, parent_category_index=None, hierarchical_level=0, d
 
                 # (3-2-2) restが文の場合("。"が含まれている) => 文の解析を行う
                 if rest and "。" in rest:
-                    sentences = rest.split("。")
-                    for s in sentences:
-                        s = s.strip()
-                        if not s:
-                            continue
+                    for s in split_into_sentences(rest):
                         add_original_sentence_to_current_item(s)
                         created_nodes = process_sentence(s + "。",doc_created_indexes)
                         if current_category_index and created_nodes:
@@ -184,11 +204,7 @@ def process_item(key, value, parent_category_index=None, hierarchical_level=0, d
         # (3-3) headingがない場合
         # (3-3-1) 文の場合("。"が含まれている) => 文の解析を行う
         if "。" in value:
-            sentences = value.split("。")
-            for s in sentences:
-                s = s.strip()
-                if not s:
-                    continue
+            for s in split_into_sentences(value):
                 add_original_sentence_to_current_item(s)
                 created_nodes = process_sentence(s + "。",doc_created_indexes)
                 if current_category_index and created_nodes:
@@ -205,47 +221,120 @@ def process_item(key, value, parent_category_index=None, hierarchical_level=0, d
                 append_edge_info("sub", current_category_index, e_idx, doc_created_indexes)
 
 
-def process_json(data, filename):
+def _trailing_edge_indexes(span: dict) -> set:
+    '''
+    文書の範囲の末尾にある、最後の項目の確定で生成したエッジのインデックスを返す。
+    '''
+    end = span["end"]["edge_index"]
+    return set(range(end - span.get("trailing_edges", 0), end))
+
+def process_json(data, filename, concurrency=None, micro_batch_size=None, checkpoint_path=None, resume=False, manifest_path=None, incremental=False):
     '''
     JSONオブジェクトを受け取り、カテゴリノードを作って再帰的に処理を行った上で、
     類似度チェックや結果のログ出力をまとめて行う。
     - data : JSON形式のデータ
     - filename : ルートカテゴリの名前として使われる
+    - concurrency : 指定した場合、文書ごとに文のLLM解析を最大concurrency件まで並行に実行する
+    - micro_batch_size : 指定した場合、時間・場所表現抽出と述語抽出を最大この文数ずつ1つのプロンプトにまとめて実行する
+    - checkpoint_path : 指定した場合、文書の処理が終わるたびにその文書の差分をチェックポイントに追記する
+    - resume : Trueの場合、checkpoint_pathのチェックポイントから状態を復元し、処理済みの文書を飛ばす
+    - manifest_path : 指定した場合、文書ごとの内容のハッシュとノード・エッジをマニフェストとして書き出す
+    - incremental : Trueの場合、manifest_pathのマニフェストと内容が一致する文書は解析せずに前回のノード・エッジを再利用する
     '''
-    # (1) カテゴリ名(root)カテゴリノードを生成
-    root_category_index = append_category_info(key=filename, level=3, cat_type='カテゴリ名', doc_created_node_indexes=None)
-    log_to_file(f"Root category created: [category] '{filename}' (level=3, カテゴリ名)")
+    completed_documents = []
+    document_spans = {}
+    carried_indexes = set()  # 前の文書の最後の項目の確定で生成したエッジ(次の文書の開始時に確定していた頃と同様に次の文書の追跡セットに含める)
+    reused_documents = 0
+    manifest = load_manifest(manifest_path, filename) if incremental else None
+    state = load_checkpoint(checkpoint_path, filename, data.keys()) if resume and checkpoint_path and os.path.exists(checkpoint_path) else None
+    if state and state["completed_documents"]:
+        # (1) チェックポイントから状態を復元(ルートカテゴリノードも復元される)
+        restore_checkpoint(state, _current_item_cache)
+        root_category_index = state["root_category_index"]
+        completed_documents = state["completed_documents"]
+        document_spans = state["document_spans"]
+        if completed_documents:
+            carried_indexes = _trailing_edge_indexes(document_spans[completed_documents[-1]])
+        log_to_file(f"Resumed from checkpoint '{checkpoint_path}': {len(completed_documents)} documents already processed")
+    else:
+        # (1) カテゴリ名(root)カテゴリノードを生成
+        root_category_index = append_category_info(key=filename, level=3, cat_type='カテゴリ名', doc_created_node_indexes=None)
+        log_to_file(f"Root category created: [category] '{filename}' (level=3, カテゴリ名)")
+        if checkpoint_path:
+            start_checkpoint(checkpoint_path, filename, root_category_index)
 
     # (2) 文書(doc)カテゴリノードを生成
+    doc_created_indexes = None
     for doc_name, doc_value in data.items():
-        doc_created_indexes = set()
+        if doc_name in completed_documents:
+            continue
+        doc_created_indexes = set(carried_indexes)
+        doc_hash = compute_document_hash(doc_value)
+        doc_start = snapshot_positions()
+
+        # (2-0) 前回のマニフェストと内容が一致する文書はノード・エッジを再利用する
+        stored = manifest["documents"].get(doc_name) if manifest else None
+        if stored is not None and stored["hash"] == doc_hash:
+            finalize_current_item(doc_created_indexes)
+            replay_document_fragment(stored, root_category_index, manifest["root_category_index"], doc_created_indexes)
+            log_to_file(f"\nDocument category: [category] '{doc_name}' (level=2, 文書名) reused from manifest (unchanged)")
+            document_spans[doc_name] = {"hash": doc_hash, "start": doc_start, "end": snapshot_positions(), "trailing_edges": stored.get("trailing_edges", 0)}
+            carried_indexes = _trailing_edge_indexes(document_spans[doc_name])
+            reused_documents += 1
+            completed_documents.append(doc_name)
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, doc_name, _current_item_cache, document_spans[doc_name])
+            continue
+
         doc_category_index = append_category_info(key=doc_name,level=2, cat_type='文書名', doc_created_node_indexes=doc_created_indexes)
         finalize_current_item(doc_created_indexes)
+        set_inspection_document(doc_name)
         log_to_file(f"\nDocument category: [category] '{doc_name}' (level=2, 文書名)")
         append_edge_info("sub", root_category_index, doc_category_index)
-        # (2-1) 文書カテゴリノードに含まれる下位構造を処理
+        # (2-1) 並行実行・まとめて実行するモードの場合、文書内の文を事前に解析
+        mark_analysis_start()
+        if concurrency or micro_batch_size:
+            prefetch_sentence_analyses(collect_sentences(doc_value), concurrency, micro_batch_size)
+        # ステージのスケジューラを使う場合は、文の前半のステージを先行して開始する(結果が記録済みの文は除く)
+        elif pipeline_enabled():
+            mode = sentence_store_mode()
+            start_sentence_pipeline([s for s in collect_sentences(doc_value) if not has_sentence_result(s, mode)], sentence_analysis_stages)
+
+        # (2-2) 文書カテゴリノードに含まれる下位構造を処理
         process_item("", doc_value, parent_category_index=doc_category_index, hierarchical_level=1,doc_created_indexes=doc_created_indexes)
+        clear_sentence_analyses()
+        clear_sentence_pipeline()
 
-        # (2-2) 文書ごとに作成されたノード情報を取得
-        entity_nodes_global = get_entity_structure()
-        predicate_nodes_global = get_predicate_structure()
-        category_nodes_global = get_category_structure()
-        
-        doc_category_nodes = [ e for e in category_nodes_global if e["index"] in doc_created_indexes ]
-        doc_entity_nodes   = [ e for e in entity_nodes_global  if e["index"] in doc_created_indexes ]
-        doc_predicate_nodes= [ p for p in predicate_nodes_global if p["index"] in doc_created_indexes ]
+        # (2-3) 文書ごとに作成されたノード情報を取得
+        doc_category_nodes = get_nodes_by_indexes(doc_created_indexes, "category")
+        doc_entity_nodes   = get_nodes_by_indexes(doc_created_indexes, "entity")
+        doc_predicate_nodes= get_nodes_by_indexes(doc_created_indexes, "predicate")
         
-        # (2-3) 類似度計算の後、equivalent関係の付与
+        # (2-4) 類似度計算の後、equivalent関係の付与
         run_similarity_check(doc_entity_nodes, doc_predicate_nodes)
         create_equivalent_edges(doc_created_indexes)
 
-        # (2-4) 文書ごとに得られた結果をログファイルに出力
-        edge_global = get_edge()
-        doc_edges = [ p for p in edge_global if p["index"] in doc_created_indexes ]
+        # (2-5) 文書ごとに得られた結果をログファイルに出力
+        doc_edges = get_edges_by_indexes(doc_created_indexes)
         log_and_print_final_results(doc_name, doc_category_nodes, doc_entity_nodes, doc_predicate_nodes, doc_edges)
         produce_similarity_report(doc_entity_nodes, doc_predicate_nodes) # 参考として類似度計算の結果
+
+        # (2-6) 文書の最後の項目を確定し、文書のノード・エッジの範囲を記録する
+        carried_indexes = set()
+        finalize_current_item(carried_indexes)
+        document_spans[doc_name] = {"hash": doc_hash, "start": doc_start, "end": snapshot_positions(), "trailing_edges": len(carried_indexes)}
+
+        # (2-7) 文書の差分をチェックポイントに追記
+        completed_documents.append(doc_name)
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, doc_name, _current_item_cache, document_spans[doc_name])
     
     finalize_current_item(doc_created_indexes)
+
+    # (3) 文書ごとのハッシュとノード・エッジをマニフェストとして書き出す
+    if manifest_path:
+        saved = write_manifest(manifest_path, filename, root_category_index, document_spans)
+        log_to_file(f"\nManifest written to '{manifest_path}': {saved} documents ({reused_documents} reused in this run)")
     
     #クラスタリング方式のequivalent関係の付与
     #cluster_equivalent_edges(entity_nodes, predicate_nodes, n_clusters=5)
\ No newline at end of file
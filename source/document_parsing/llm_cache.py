@@ -0,0 +1,215 @@
+# llm_cache.py
+# chat.completionsの応答をディスク上(SQLite)にキャッシュするモジュール
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+CACHE_ENABLED = True                      # キャッシュの有効/無効
+CACHE_DB_PATH = os.path.join("cache", "llm_cache.sqlite3")  # キャッシュファイルの保存場所
+CACHE_MAX_ENTRIES = 200000                # 保存する最大エントリ数
+CACHE_MAX_BYTES = 1024 * 1024 * 1024      # 保存する応答の最大合計サイズ(byte)
+CACHE_EVICT_BATCH = 1000                  # 上限を超えた場合に一度に削除する最小のエントリ数(削除が保存のたびに起きないようにする)
+
+# ステージごとのプロンプトバージョン
+# プロンプトや出力形式を変更した場合は該当ステージの値を上げることで、そのステージのキャッシュのみが無効になる
+PROMPT_VERSIONS = {
+    "time_and_place": 1,
+    "predicates": 1,
+    "predicate_structures": 1,
+    "causal_relationship": 1,
+    "explain_details": 1,
+    "tokenize": 1,
+    "gpt_inspection": 1,
+    "entity_relationship": 1,
+    "fused_extraction": 1,
+    "time_and_place_batch": 1,
+    "predicates_batch": 1,
+    "time_and_place_json": 1,
+    "predicates_json": 1,
+    "predicate_structures_json": 1,
+    "causal_relationship_json": 1,
+    "explain_details_json": 1,
+}
+
+_connection = None
+_lock = threading.Lock()
+_cache_stats = {}  # {stage: {"hit": n, "miss": n}}
+_cache_totals = {"entries": 0, "bytes": 0}  # 保存されているエントリ数と合計サイズ(接続時に集計し、以降は保存・削除のたびに更新する)
+
+def _get_connection():
+    '''
+    キャッシュ用のSQLite接続を取得する。初回呼び出し時にテーブルを作成する。
+    '''
+    global _connection
+    if _connection is None:
+        cache_dir = os.path.dirname(CACHE_DB_PATH)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        _connection = sqlite3.connect(CACHE_DB_PATH, check_same_thread=False, timeout=30.0)
+        # 複数のプロセス(sharding)から同時に読み書きできるようWALモードにする
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS completion_cache ("
+            " cache_key TEXT PRIMARY KEY,"
+            " stage TEXT NOT NULL,"
+            " prompt_version INTEGER NOT NULL,"
+            " model TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " size_bytes INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON completion_cache(last_access)")
+        _connection.commit()
+        _load_cache_totals(_connection)
+    return _connection
+
+def _load_cache_totals(conn):
+    '''
+    保存されているエントリ数と合計サイズを集計し直す(接続時と、上限を超えた可能性がある場合のみ行う)。
+    '''
+    entry_count, total_bytes = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM completion_cache"
+    ).fetchone()
+    _cache_totals["entries"] = entry_count
+    _cache_totals["bytes"] = total_bytes
+
+def _normalize_messages(messages):
+    '''
+    メッセージを正規化する。Unicode正規化(NFC)と前後の空白除去を行い、役割と内容のみを残す。
+    '''
+    normalized = []
+    for m in messages:
+        content = m.get("content", "")
+        if isinstance(content, str):
+            content = unicodedata.normalize("NFC", content).strip()
+        normalized.append({"role": m.get("role", ""), "content": content})
+    return normalized
+
+def make_cache_key(stage: str, model: str, messages, base_url=None, **params) -> str:
+    '''
+    ステージ名・プロンプトバージョン・接続先・モデル名・正規化したメッセージからキャッシュキー(sha256)を生成する。
+    - base_url : 実際の接続先のURL。スタブサーバやローカルのサーバの応答を、同じモデル名の他の接続先の応答として再利用しないために含める
+    - params : temperatureなど応答に影響するその他のパラメータ
+    '''
+    payload = {
+        "stage": stage,
+        "prompt_version": PROMPT_VERSIONS.get(stage, 0),
+        "base_url": str(base_url).rstrip("/") if base_url else None,
+        "model": model,
+        "messages": _normalize_messages(messages),
+        "params": params,
+    }
+    serialized = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+def _count(stage: str, kind: str):
+    stats = _cache_stats.setdefault(stage, {"hit": 0, "miss": 0})
+    stats[kind] += 1
+
+def get_cached_response(cache_key: str, stage: str):
+    '''
+    キャッシュから応答を取得する。存在しない場合はNoneを返す。
+    取得できた場合は最終アクセス時刻を更新する(LRU)。
+    '''
+    if not CACHE_ENABLED:
+        return None
+    with _lock:
+        conn = _get_connection()
+        row = conn.execute("SELECT content FROM completion_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+        if row is None:
+            _count(stage, "miss")
+            return None
+        conn.execute("UPDATE completion_cache SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key))
+        conn.commit()
+        _count(stage, "hit")
+        return row[0]
+
+def peek_cached_response(cache_key: str):
+    '''
+    ヒット数・ミス数や最終アクセス時刻を更新せずにキャッシュの応答を参照する。存在しない場合はNoneを返す。
+    '''
+    if not CACHE_ENABLED:
+        return None
+    with _lock:
+        conn = _get_connection()
+        row = conn.execute("SELECT content FROM completion_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+        return row[0] if row else None
+
+def store_response(cache_key: str, stage: str, model: str, content: str):
+    '''
+    応答をキャッシュに保存し、上限を超えた場合は最終アクセスが古いものから削除する。
+    '''
+    if not CACHE_ENABLED:
+        return
+    size_bytes = len(content.encode("utf-8"))
+    with _lock:
+        conn = _get_connection()
+        replaced = conn.execute("SELECT size_bytes FROM completion_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO completion_cache"
+            " (cache_key, stage, prompt_version, model, content, size_bytes, last_access)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (cache_key, stage, PROMPT_VERSIONS.get(stage, 0), model, content, size_bytes, time.time())
+        )
+        if replaced is None:
+            _cache_totals["entries"] += 1
+            _cache_totals["bytes"] += size_bytes
+        else:
+            _cache_totals["bytes"] += size_bytes - replaced[0]
+        _evict_if_needed(conn)
+        conn.commit()
+
+def _evict_if_needed(conn):
+    '''
+    エントリ数・合計サイズの上限を超えている場合、LRU順にエントリをまとめて削除する。
+    エントリ数・合計サイズはメモリ上の値で判定し、上限を超えた場合のみ集計し直す(他のプロセスが書き込んだ分を反映するため)。
+    '''
+    if _cache_totals["entries"] <= CACHE_MAX_ENTRIES and _cache_totals["bytes"] <= CACHE_MAX_BYTES:
+        return
+    _load_cache_totals(conn)
+
+    oldest = "SELECT cache_key, size_bytes FROM completion_cache ORDER BY last_access ASC LIMIT ?"
+    while _cache_totals["entries"] > CACHE_MAX_ENTRIES or _cache_totals["bytes"] > CACHE_MAX_BYTES:
+        batch = max(CACHE_EVICT_BATCH, _cache_totals["entries"] - CACHE_MAX_ENTRIES)
+        evicted_count, evicted_bytes = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM ({oldest})", (batch,)
+        ).fetchone()
+        if evicted_count == 0:
+            break
+        conn.execute(f"DELETE FROM completion_cache WHERE cache_key IN (SELECT cache_key FROM ({oldest}))", (batch,))
+        _cache_totals["entries"] -= evicted_count
+        _cache_totals["bytes"] -= evicted_bytes
+
+def purge_stale_entries():
+    '''
+    現在のPROMPT_VERSIONSと一致しない古いバージョンのエントリを削除する。
+    - return : 削除したエントリ数
+    '''
+    with _lock:
+        conn = _get_connection()
+        removed = 0
+        for stage, version in PROMPT_VERSIONS.items():
+            cur = conn.execute(
+                "DELETE FROM completion_cache WHERE stage = ? AND prompt_version != ?", (stage, version)
+            )
+            removed += cur.rowcount
+        conn.commit()
+        _load_cache_totals(conn)
+        return removed
+
+def get_cache_stats():
+    '''
+    ステージごとのキャッシュヒット数・ミス数を返す。
+    '''
+    return {stage: dict(counts) for stage, counts in _cache_stats.items()}
+
+def reset_cache_stats():
+    '''
+    キャッシュのヒット数・ミス数をリセットする。
+    '''
+    _cache_stats.clear()
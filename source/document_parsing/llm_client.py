@@ -0,0 +1,231 @@
+# llm_client.py
+# 全ての抽出モジュールで共有するOpenAIクライアントと、再試行・サーキットブレーカーを提供するモジュール
+
+import random
+import threading
+import time
+import httpx
+import openai
+from openai import OpenAI
+from source.document_parsing.logger import log_to_file
+
+# HTTP接続の設定
+MAX_CONNECTIONS = 32            # 同時に開くHTTP接続の最大数
+MAX_KEEPALIVE_CONNECTIONS = 16  # 再利用のために保持する接続の最大数
+KEEPALIVE_EXPIRY = 30.0         # 保持した接続を破棄するまでの時間(秒)
+CONNECT_TIMEOUT = 10.0          # 接続確立のタイムアウト(秒)
+REQUEST_TIMEOUT = 120.0         # 1リクエストあたりのタイムアウト(秒)
+
+# 再試行の設定
+MAX_RETRIES = 6                 # 再試行可能なエラーに対する最大再試行回数
+BACKOFF_BASE = 1.0              # 指数バックオフの初期待機時間(秒)
+BACKOFF_MAX = 60.0              # 待機時間の上限(秒)
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# サーキットブレーカーの設定
+CIRCUIT_FAILURE_THRESHOLD = 5   # 連続でこの回数だけ失敗した場合に回路を開く
+CIRCUIT_RESET_TIMEOUT = 30.0    # 回路を開いてから試行を再開するまでの時間(秒)
+CIRCUIT_FAIL_FAST = False       # Trueの場合、回路が開いている間の呼び出しは待機せずにCircuitOpenErrorを送出する
+CIRCUIT_PROBE_POLL = 0.1        # half_openの試行の結果を待つ間の確認間隔(秒)
+
+_clients = {}  # {接続先(Noneは既定): OpenAIクライアント}
+_client_lock = threading.Lock()
+
+class CircuitOpenError(Exception):
+    '''
+    サーキットブレーカーが開いているために呼び出しを行わなかったことを表す例外。
+    '''
+    pass
+
+class CircuitBreaker:
+    '''
+    連続した失敗を検知してAPIへの呼び出しを一時的に止めるサーキットブレーカー。
+    - closed : 通常状態
+    - open : 連続失敗が閾値に達した状態。reset_timeoutが経過するまで呼び出しを行わない
+    - half_open : reset_timeout経過後の状態。1件の呼び出し(試行)のみを通し、成功すればclosedに、失敗すれば再びopenになる。
+                  試行の結果が出るまで、他の呼び出しは待機する
+    '''
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait_until_available(self, fail_fast=None):
+        '''
+        呼び出し可能な状態になるまで待機する。fail_fastがTrueの場合は待機せずにCircuitOpenErrorを送出する。
+        reset_timeoutの経過後は、openからhalf_openに移した1件の呼び出しのみが戻り(試行)、他の呼び出しは試行の結果を待つ。
+        - return : 試行として呼び出す場合はTrue、closedの状態で呼び出す場合はFalse
+        '''
+        if fail_fast is None:
+            fail_fast = CIRCUIT_FAIL_FAST
+        while True:
+            with self._lock:
+                if self.state == "closed":
+                    return False
+                if self.state == "half_open":
+                    remaining = CIRCUIT_PROBE_POLL
+                    message = "circuit is half-open (probe in progress)"
+                else:
+                    remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                    if remaining <= 0:
+                        self.state = "half_open"
+                        return True
+                    message = f"circuit is open (retry in {remaining:.1f}s)"
+            if fail_fast:
+                raise CircuitOpenError(message)
+            time.sleep(min(remaining, 1.0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+
+    def release_probe(self):
+        '''
+        再試行の対象外のエラー(リクエストの内容の誤りなど)を受け取った場合に呼ぶ。接続先は応答しているため、
+        half_openの試行であればclosedに戻して待機中の呼び出しを再開する(closed・openの状態は変更しない)。
+        '''
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "closed"
+                self.consecutive_failures = 0
+
+    def abandon_probe(self):
+        '''
+        試行が成功・失敗のいずれも記録されずに終わった場合(KeyboardInterruptやタスクの取り消しなど)に呼ぶ。
+        half_openをopenに戻し、reset_timeoutは経過済みのため、待機中の次の呼び出しが新たな試行となる。
+        '''
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    log_to_file(f"[LLM] circuit opened after {self.consecutive_failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+circuit_breaker = CircuitBreaker()  # 既定の接続先のサーキットブレーカー
+_circuit_breakers = {None: circuit_breaker}
+
+def get_circuit_breaker(base_url=None) -> CircuitBreaker:
+    '''
+    接続先ごとのサーキットブレーカーを返す。
+    '''
+    with _client_lock:
+        if base_url not in _circuit_breakers:
+            _circuit_breakers[base_url] = CircuitBreaker()
+        return _circuit_breakers[base_url]
+
+def get_client(base_url=None):
+    '''
+    全モジュールで共有するOpenAIクライアントを返す。初回呼び出し時に接続プールとタイムアウトを設定して生成する。
+    再試行はcall_with_retryで行うため、SDK側の自動再試行は無効にしている。
+    - base_url : 既定以外の接続先(ローカルのOpenAI互換サーバなど)を使う場合に指定する。接続先ごとに1つのクライアントを共有する
+    '''
+    with _client_lock:
+        if base_url not in _clients:
+            http_client = openai.DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY
+                )
+            )
+            options = {"base_url": base_url} if base_url else {}
+            _clients[base_url] = OpenAI(
+                http_client=http_client,
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+                max_retries=0,
+                **options
+            )
+        return _clients[base_url]
+
+def get_base_url(base_url=None) -> str:
+    '''
+    接続先のクライアントが実際に用いるURLを返す(LLM応答キャッシュのキーに用いる)。
+    - base_url : ルーティング設定の接続先。Noneの場合は既定の接続先(--base-url, OPENAI_BASE_URLを反映したもの)
+    '''
+    return str(get_client(base_url).base_url)
+
+def set_base_url(base_url: str):
+    '''
+    共有クライアントの接続先を変更する(ローカルのスタブサーバやOpenAI互換サーバを利用する場合)。
+    環境変数OPENAI_BASE_URLを設定した場合と同じ効果を持つ。
+    '''
+    get_client().base_url = base_url
+
+def is_retryable_error(error: Exception) -> bool:
+    '''
+    一時的なエラー(接続エラー、タイムアウト、429、5xxなど)であれば再試行可能と判定する。
+    '''
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+def _retry_after_seconds(error: Exception):
+    '''
+    応答ヘッダのretry-afterが指定されていれば、その秒数を返す。
+    '''
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, retry_after=None) -> float:
+    '''
+    attempt回目(0始まり)の再試行までの待機時間を返す。指数バックオフにフルジッターを適用する。
+    retry-afterが指定されている場合はその値を下限とする。
+    '''
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, BACKOFF_MAX))
+    return delay
+
+def call_with_retry(func, *args, stage="", breaker=None, **kwargs):
+    '''
+    再試行可能なエラーに対して指数バックオフで再試行しながらfuncを呼び出す。
+    サーキットブレーカーが開いている間は呼び出しを待機する。
+    - stage : ログ出力に用いるステージ名
+    - breaker : 使用するサーキットブレーカー(省略時は既定の接続先のもの)
+    - return : funcの戻り値
+    '''
+    breaker = breaker or circuit_breaker
+    attempt = 0
+    while True:
+        probe = breaker.wait_until_available()
+        settled = False
+        try:
+            result = func(*args, **kwargs)
+            settled = True
+        except Exception as e:
+            settled = True
+            if not is_retryable_error(e):
+                breaker.release_probe()
+                raise
+            breaker.record_failure()
+            if attempt >= MAX_RETRIES:
+                log_to_file(f"[LLM] {stage}: giving up after {attempt + 1} attempts ({type(e).__name__})")
+                raise
+            delay = backoff_delay(attempt, _retry_after_seconds(e))
+            log_to_file(f"[LLM] {stage}: {type(e).__name__}, retrying in {delay:.1f}s (attempt {attempt + 1}/{MAX_RETRIES})")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        finally:
+            # 試行が結果を記録せずに中断された場合は、half_openのまま他の呼び出しを待たせ続けないように戻す
+            if probe and not settled:
+                breaker.abandon_probe()
+        breaker.record_success()
+        return result
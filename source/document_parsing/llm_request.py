@@ -0,0 +1,135 @@
+# llm_request.py
+# 各抽出モジュールからのchat.completions呼び出しを一元化するモジュール
+
+import threading
+import time
+from types import MappingProxyType
+from source.document_parsing.logger import log_token_usage
+from source.document_parsing.llm_cache import make_cache_key, get_cached_response, store_response
+from source.document_parsing.llm_client import call_with_retry, get_client, get_circuit_breaker
+from source.document_parsing.llm_routing import get_route, estimate_cost
+from source.document_parsing.rate_limiter import call_with_rate_limit
+
+_usage_lock = threading.Lock()
+_usage_stats = {}  # {stage: {"model", "calls", "prompt_tokens", "cached_tokens", "completion_tokens", "latency_seconds", ...}}
+_failed_requests = 0  # 再試行しても失敗した呼び出しの数(呼び出し元で例外を処理して空の結果とした場合も含む)
+
+def freeze_messages(messages) -> tuple:
+    '''
+    モジュール読み込み時に一度だけ組み立てるプロンプトの固定部分(システムプロンプトや少数ショットの例)を
+    変更できない形式に変換する。
+    '''
+    return tuple(MappingProxyType(dict(m)) for m in messages)
+
+def extend_prefix(prefix, *messages) -> list:
+    '''
+    固定部分の後ろに可変部分(対象の文など)を追加し、chat.completionsに渡せるメッセージのリストを生成する。
+    固定部分を常に先頭に置くことで、プロバイダ側のプロンプトキャッシュが効く共通接頭辞を最大にする。
+    '''
+    return [dict(m) for m in prefix] + list(messages)
+
+def _record_usage(stage: str, model: str, usage, latency_seconds: float):
+    '''
+    応答のusageからプロンプト・キャッシュ済み・出力トークン数と所要時間、概算料金をステージごとに集計する。
+    '''
+    prompt_details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(prompt_details, "cached_tokens", 0) or 0
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    with _usage_lock:
+        stats = _usage_stats.setdefault(stage, {
+            "model": model, "calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0,
+            "latency_seconds": 0.0, "max_latency_seconds": 0.0, "cost_usd": 0.0
+        })
+        stats["model"] = model
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["latency_seconds"] += latency_seconds
+        stats["max_latency_seconds"] = max(stats["max_latency_seconds"], latency_seconds)
+        stats["cost_usd"] += estimate_cost(model, prompt_tokens, cached_tokens, completion_tokens)
+
+def get_usage_stats():
+    '''
+    ステージごとのモデル、API呼び出し数、トークン使用量(うちプロンプトキャッシュが効いたトークン数)、所要時間、概算料金を返す。
+    '''
+    with _usage_lock:
+        return {stage: dict(stats) for stage, stats in _usage_stats.items()}
+
+def get_failed_request_count() -> int:
+    '''
+    再試行しても失敗したchat.completions呼び出しの累計を返す。
+    抽出関数はAPIのエラーを処理して空の結果を返すため、結果が失敗によるものかどうかはこの値の増加で判断する。
+    '''
+    with _usage_lock:
+        return _failed_requests
+
+def _count_failed_request():
+    global _failed_requests
+    with _usage_lock:
+        _failed_requests += 1
+
+def request_chat_completion(client, stage: str, messages, model=None, temperature=0.0, response_format=None) -> str:
+    '''
+    chat.completionsを呼び出して応答テキストを返す。同一のリクエストがキャッシュに存在する場合はAPIを呼び出さない。
+    モデル・接続先・最大出力トークン数・タイムアウトはステージのルーティング設定(llm_routing)に従う。
+    - client : OpenAIクライアント(ルーティング設定で接続先が指定されている場合はその接続先のクライアントを用いる)
+    - stage : 呼び出し元のステージ名 (llm_cache.PROMPT_VERSIONSのキー)
+    - messages : chat.completionsに渡すメッセージ
+    - model : 指定した場合、ルーティング設定のモデルより優先する
+    - response_format : 構造化出力(JSONスキーマ)を指定する場合のresponse_format
+    - return : 応答テキスト(前後の空白を除去済み)
+    '''
+    # (1) ルーティング設定を適用
+    route = get_route(stage)
+    model = model or route["model"]
+    params = {"max_tokens": route["max_tokens"]} if route["max_tokens"] else {}
+    if response_format is not None:
+        params["response_format"] = response_format
+    if route["base_url"]:
+        client = get_client(route["base_url"])
+
+    # (2) キャッシュを確認
+    cache_key = make_cache_key(stage, model, messages, base_url=client.base_url, temperature=temperature, **params)
+    cached_content = get_cached_response(cache_key, stage)
+    if cached_content is not None:
+        return cached_content
+
+    # (3) OpenAI APIを呼び出す(一時的なエラーは再試行する)
+    #     既定の接続先ではRPM・TPMの枠を確保してから呼び出す。独自の接続先(ローカルのサーバなど)は対象外とする
+    if route["timeout"]:
+        params["timeout"] = route["timeout"]
+    started_at = time.monotonic()
+    try:
+        if route["base_url"]:
+            response = call_with_retry(
+                client.chat.completions.create,
+                stage=stage,
+                breaker=get_circuit_breaker(route["base_url"]),
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                **params
+            )
+        else:
+            response = call_with_retry(
+                call_with_rate_limit,
+                client.chat.completions.create,
+                messages,
+                stage=stage,
+                model=model,
+                temperature=temperature,
+                **params
+            )
+    except Exception:
+        _count_failed_request()
+        raise
+    content = response.choices[0].message.content.strip()
+    if hasattr(response, "usage") and hasattr(response.usage, "total_tokens"):
+        log_token_usage(response.usage.total_tokens)
+        _record_usage(stage, model, response.usage, time.monotonic() - started_at)
+
+    # (4) 応答をキャッシュに保存
+    store_response(cache_key, stage, model, content)
+    return content
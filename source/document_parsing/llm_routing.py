@@ -0,0 +1,83 @@
+# llm_routing.py
+# ステージごとに使用するモデルと接続先(base_url)、最大出力トークン数、タイムアウトを設定するモジュール
+
+import json
+
+DEFAULT_MODEL = "gpt-4o"
+LOCAL_BASE_URL = "http://127.0.0.1:8080/v1"  # ローカルのOpenAI互換サーバ(llama.cppのserverなど)
+LOCAL_MODEL = "local-model"
+
+# ルーティングプロファイル {プロファイル名: {ステージ名: 設定}}
+# 設定に含まれない項目は既定値(DEFAULT_MODEL, 共有クライアントの接続先, 制限なし)となる
+ROUTING_PROFILES = {
+    "default": {},
+    # 単純なステージ(トークン分割、時間関係の点検)を小型のモデルで実行する
+    "economy": {
+        "tokenize": {"model": "gpt-4o-mini", "max_tokens": 2048},
+        "gpt_inspection": {"model": "gpt-4o-mini", "max_tokens": 256},
+    },
+    # 単純なステージをローカルのCPUサーバで実行する
+    "local": {
+        "tokenize": {"model": LOCAL_MODEL, "base_url": LOCAL_BASE_URL, "max_tokens": 2048, "timeout": 300},
+        "gpt_inspection": {"model": LOCAL_MODEL, "base_url": LOCAL_BASE_URL, "max_tokens": 256, "timeout": 300},
+    },
+}
+
+# モデルごとの料金(USD / 100万トークン)。登録されていないモデル(ローカルのモデルなど)は0として扱う
+MODEL_PRICES = {
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+    "gpt-4.1-nano": {"input": 0.10, "cached_input": 0.025, "output": 0.40},
+}
+
+STAGE_ROUTES = {}  # 現在のルーティング設定 {ステージ名: 設定}
+ROUTE_KEYS = ("model", "base_url", "max_tokens", "timeout")
+
+def load_routing(profile="default", config_path=None):
+    '''
+    ルーティング設定を読み込む。プロファイルの設定の上にJSONファイルの設定を重ねる。
+    - profile : ROUTING_PROFILESのキー
+    - config_path : {ステージ名: {"model": ..., "base_url": ..., "max_tokens": ..., "timeout": ...}} 形式のJSONファイル
+    '''
+    if profile not in ROUTING_PROFILES:
+        raise ValueError(f"unknown routing profile: {profile}")
+    routes = {stage: dict(route) for stage, route in ROUTING_PROFILES[profile].items()}
+    if config_path:
+        with open(config_path, "r", encoding="utf-8") as f:
+            for stage, route in json.load(f).items():
+                routes.setdefault(stage, {}).update(route)
+    STAGE_ROUTES.clear()
+    STAGE_ROUTES.update(routes)
+
+def get_route(stage: str) -> dict:
+    '''
+    ステージのルーティング設定を返す。設定されていない項目はNone(modelはDEFAULT_MODEL)となる。
+    '''
+    route = STAGE_ROUTES.get(stage, {})
+    resolved = {key: route.get(key) for key in ROUTE_KEYS}
+    resolved["model"] = resolved["model"] or DEFAULT_MODEL
+    return resolved
+
+def redirect_base_urls(base_url: str):
+    '''
+    接続先が設定されている全てのステージの接続先を変更する(スタブサーバでのベンチマーク用)。
+    '''
+    for route in STAGE_ROUTES.values():
+        if route.get("base_url"):
+            route["base_url"] = base_url
+
+def estimate_cost(model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+    '''
+    トークン数からAPI利用料金(USD)を概算する。
+    '''
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    uncached_tokens = max(0, prompt_tokens - cached_tokens)
+    return (
+        uncached_tokens * prices["input"]
+        + cached_tokens * prices["cached_input"]
+        + completion_tokens * prices["output"]
+    ) / 1_000_000
@@ -0,0 +1,147 @@
+# local_tokenizer.py
+# 時系列関係の推定(time_evolution_extraction.tokenize_sentence)で用いるトークン分割のバックエンドを提供するモジュール
+# - gpt : 従来通りGPTでトークン分割と動詞の基本形変換を行う
+# - janome : 形態素解析器Janome(辞書同梱のPure Python実装)でローカルに処理する
+# - simple : 追加のパッケージを必要としない文字種による簡易な分割(基本形変換は「する」のみ)
+# 既定の auto は、APIが利用できる場合は従来通りgptを用い、GPTの呼び出しに失敗した場合はsimpleで処理する。
+# APIキーも接続先も設定されていない場合のみ、Janomeがインストールされていればjanome、無ければsimpleを用いる。
+
+import os
+import re
+import threading
+from source.document_parsing.llm_routing import get_route
+
+try:
+    from janome.tokenizer import Tokenizer as JanomeTokenizer
+except ImportError:
+    JanomeTokenizer = None
+
+TOKENIZER_BACKENDS = ("auto", "gpt", "janome", "simple")
+TOKENIZER_BACKEND = "auto"
+
+# Janomeの助動詞のうち、トークンとして残すもの(否定)とその表記
+KEPT_AUXILIARY_VERBS = {"ない": "ない", "ぬ": "ない", "ん": "ない"}
+
+# simpleで、漢字・カタカナ・英数字の並びの直後にあれば切り離す助詞
+SIMPLE_PARTICLES = ("から", "まで", "より", "による", "として", "など", "が", "を", "に", "で", "の", "と", "へ", "は", "も", "や")
+# simpleで「する」とみなすサ変動詞の活用語尾
+SIMPLE_SURU_FORMS = ("しました", "します", "した", "して", "する", "し")
+SIMPLE_TOKEN_PATTERN = re.compile(r"[0-9０-９A-Za-zＡ-Ｚａ-ｚ]+[一-龥々]?|[一-龥々〆ヵヶ]+|[ァ-ヴー]+|[ぁ-ん]+|[^\s]")
+
+_janome_tokenizer = None
+_janome_lock = threading.Lock()
+
+def set_tokenizer_backend(backend: str):
+    '''
+    トークン分割のバックエンドを設定する。
+    - backend : "auto", "gpt", "janome", "simple" のいずれか
+    '''
+    global TOKENIZER_BACKEND
+    if backend not in TOKENIZER_BACKENDS:
+        raise ValueError(f"unknown tokenizer backend: {backend}")
+    if backend == "janome" and JanomeTokenizer is None:
+        raise ValueError("tokenizer backend 'janome' requires the janome package (pip install janome)")
+    TOKENIZER_BACKEND = backend
+
+def is_api_configured() -> bool:
+    '''
+    トークン分割のAPI呼び出しに用いるAPIキーまたは接続先(環境変数、ルーティング設定)が設定されているかを返す。
+    '''
+    return bool(os.environ.get("OPENAI_API_KEY") or os.environ.get("OPENAI_BASE_URL") or get_route("tokenize")["base_url"])
+
+def resolve_tokenizer_backend() -> str:
+    '''
+    設定(auto)を実際に用いるバックエンド名("gpt", "janome", "simple")に解決する。
+    autoはAPIが利用できる場合はgpt、利用できない場合はjanome(インストールされていない場合はsimple)とする。
+    '''
+    if TOKENIZER_BACKEND == "auto":
+        if is_api_configured():
+            return "gpt"
+        return "janome" if JanomeTokenizer is not None else "simple"
+    return TOKENIZER_BACKEND
+
+def _get_janome_tokenizer():
+    global _janome_tokenizer
+    with _janome_lock:
+        if _janome_tokenizer is None:
+            _janome_tokenizer = JanomeTokenizer()
+        return _janome_tokenizer
+
+def tokenize_text_janome(text: str) -> list:
+    '''
+    Janomeで1行のテキストをトークンに分割する。GPTの出力形式に合わせて以下のように整える。
+    - 動詞・形容詞は基本形にする
+    - 助動詞は否定(「ない」)のみ残す
+    - 接尾辞は直前の名詞に、接頭詞は直後の語に結合する(「客達」「10人」「逆走」など)
+    '''
+    tokens = []
+    prefix = ""
+    for token in _get_janome_tokenizer().tokenize(text):
+        pos, pos_detail = token.part_of_speech.split(",")[:2]
+        if pos == "助動詞":
+            if token.base_form in KEPT_AUXILIARY_VERBS:
+                tokens.append(KEPT_AUXILIARY_VERBS[token.base_form])
+            continue
+        if pos == "接頭詞":
+            prefix += token.surface
+            continue
+        if prefix:
+            tokens.append(prefix + token.surface)
+            prefix = ""
+            continue
+        if pos == "名詞" and pos_detail == "接尾" and tokens:
+            tokens[-1] += token.surface
+            continue
+        if pos in ("動詞", "形容詞") and token.base_form != "*":
+            tokens.append(token.base_form)
+        else:
+            tokens.append(token.surface)
+    if prefix:
+        tokens.append(prefix)
+    return tokens
+
+def tokenize_text_simple(text: str) -> list:
+    '''
+    文字種の切れ目で1行のテキストをトークンに分割する。
+    ひらがなの並びは先頭の助詞とサ変動詞の活用語尾(「する」に変換)のみを切り離す。
+    '''
+    tokens = []
+    for chunk in SIMPLE_TOKEN_PATTERN.findall(text):
+        if not re.fullmatch(r"[ぁ-ん]+", chunk):
+            tokens.append(chunk)
+            continue
+        # (1) 先頭の助詞を切り離す
+        for particle in SIMPLE_PARTICLES:
+            if chunk.startswith(particle) and len(chunk) > len(particle):
+                tokens.append(particle)
+                chunk = chunk[len(particle):]
+                break
+        # (2) サ変動詞の活用語尾は「する」とする
+        if chunk in SIMPLE_SURU_FORMS:
+            tokens.append("する")
+        else:
+            tokens.append(chunk)
+    return tokens
+
+def tokenize_lines_locally(lines_for_tokenize, backend: str) -> list:
+    '''
+    "(index) text" 形式の複数行をローカルのバックエンドでトークンに分割する。
+    - backend : "janome" または "simple"
+    - return : [(node_idx, [tokens...]), ...] (STOP_WORDSの除外などは行わない)
+    '''
+    tokenize_text = tokenize_text_janome if backend == "janome" else tokenize_text_simple
+    index_pattern = re.compile(r'^\(\s*(\d+)\s*\)\s*(.*)$')
+    result = []
+    for line_str in lines_for_tokenize:
+        line_str = line_str.strip()
+        if not line_str:
+            continue
+        m = index_pattern.match(line_str)
+        if m:
+            node_idx = int(m.group(1))
+            text = m.group(2)
+        else:
+            node_idx = 0
+            text = line_str
+        result.append((node_idx, tokenize_text(text)))
+    return result
@@ -1,15 +1,18 @@
 # logger.py
 
 import os
+import threading
 from datetime import datetime
 
 
 LOG_FILE_PATH = None # グローバル変数でログファイルの保存場所設定
 TOKEN_USAGE_FILE = "token_usage.txt" # トークンの使用量記録用ログファイル
+_token_usage_lock = threading.Lock() # 並行実行時にトークン使用量ファイルの読み書きを保護する
 
-def initialize_logger():
+def initialize_logger(suffix=None):
     '''
     ロガーファイルを初期化し、logsディレクトリを作成した上で日付入りのログファイルを準備する。
+    - suffix : 指定した場合、ログファイル名の末尾に付ける(複数のプロセスで同時に処理する場合など)
     '''
     global LOG_FILE_PATH
 
@@ -21,7 +24,7 @@ def initialize_logger():
 
         # 現在時刻でログファイル名生成
         current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        LOG_FILE_PATH = os.path.join(log_dir, f"{current_time}.log")
+        LOG_FILE_PATH = os.path.join(log_dir, f"{current_time}_{suffix}.log" if suffix else f"{current_time}.log")
 
     except Exception as e:
         print(f"Error initializing logger: {e}")
@@ -46,6 +49,10 @@ def log_token_usage(token_count: int):
     OpenAI APIのトークン使用量を記録する関数。既存のtotal値に加算してファイルに書き戻す。
     - token_count : 今回使用したトークン数
     '''
+    with _token_usage_lock:
+        _write_token_usage(token_count)
+
+def _write_token_usage(token_count: int):
     try:
         lines = []
         total_tokens = 0
@@ -1,10 +1,26 @@
 # main.py
 
+import argparse
 import json
 import os
-from source.document_parsing.logger import initialize_logger
+from source.document_parsing.logger import initialize_logger, log_to_file
 from source.document_parsing.node_maker import get_category_structure, get_entity_structure, get_predicate_structure
 from source.document_parsing.edge_maker import get_edge, get_auto_generated_edge_dictionary
+from source.document_parsing.llm_cache import get_cache_stats
+from source.document_parsing.llm_request import get_usage_stats
+from source.document_parsing.llm_client import get_client, set_base_url
+from source.document_parsing.rate_limiter import configure_rate_limits, get_rate_limit_utilisation
+from source.document_parsing.llm_routing import load_routing, ROUTING_PROFILES
+from source.document_parsing.batch_processor import run_batch_extraction, OpenAIBatchBackend, LocalBatchBackend, make_client_responder
+from source.document_parsing.sentence_parser import set_fused_extraction, set_structured_output, set_rule_based_time_and_place
+from source.document_parsing.time_and_place_rules import get_rule_based_stats
+from source.document_parsing.local_tokenizer import set_tokenizer_backend, TOKENIZER_BACKENDS
+from source.document_parsing.sentence_store import set_sentence_store_enabled, get_sentence_store_stats
+from source.document_parsing.inspection_audit import set_inspection_mode, run_inspection_audit, write_inspection_report, INSPECTION_MODES
+from source.document_parsing.structured_output import get_structured_output_stats
+from source.document_parsing.stage_scheduler import set_pipeline_workers, get_schedule_stats
+from source.document_parsing.dry_run import estimate_dataset, format_dry_run_report
+from source.document_parsing.sharding import run_sharded
 from json_processor import process_json
 from csv_exporter import export_to_csv
 
@@ -15,19 +31,80 @@ def main():
     - JSONファイル名を指定し、読み込んだ後はprocess_jsonに渡す。
     - ノードやエッジの最終結果をCSVとして保存する。
     '''
+    # (0) コマンドライン引数
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default="test.json", help="入力されるJSON形式ファイル")
+    parser.add_argument("--concurrency", type=int, default=None, help="文のLLM解析を並行に実行する場合の同時実行数")
+    parser.add_argument("--batch", choices=["openai", "local"], default=None, help="文単位のLLM解析を事前にBatch APIで実行する場合のバックエンド(localはリクエストを--base-urlに1件ずつ送る)")
+    parser.add_argument("--batch-dir", default="batch", help="Batch API用のJSONLファイルを保存するディレクトリ")
+    parser.add_argument("--fused", action="store_true", help="時間・場所表現、述語、述語項構造を1回のGPT呼び出しで抽出する")
+    parser.add_argument("--structured", action="store_true", help="各抽出ステージの応答をJSONスキーマに従った構造化出力として受け取る")
+    parser.add_argument("--rule-based-time-place", action="store_true", help="時間・場所表現を規則で抽出できる文はLLMを呼び出さない")
+    parser.add_argument("--tokenizer", choices=TOKENIZER_BACKENDS, default="auto", help="時系列関係の推定で用いるトークン分割のバックエンド")
+    parser.add_argument("--inspection", choices=INSPECTION_MODES, default="off", help="時間関係の点検(GPT_inspection)の実行方法")
+    parser.add_argument("--inspection-report", default=os.path.join("results", "inspection_report.json"), help="時間関係の点検の結果を書き出すファイル")
+    parser.add_argument("--no-sentence-store", action="store_true", help="同じ文の解析結果を文書をまたいで再利用しない")
+    parser.add_argument("--checkpoint", default=None, help="指定した場合、文書ごとの処理が終わるたびにその文書の差分を追記するチェックポイントのファイル(JSON Lines形式)")
+    parser.add_argument("--resume", action="store_true", help="チェックポイントから処理済みの文書を飛ばして再開する")
+    parser.add_argument("--manifest", default=os.path.join("results", "manifest.json"), help="文書ごとの内容のハッシュとノード・エッジを保存するマニフェストのファイル")
+    parser.add_argument("--incremental", action="store_true", help="マニフェストと内容が一致する文書は解析せずに前回の結果を再利用する")
+    parser.add_argument("--pipeline", type=int, default=0, help="文のステージを依存関係に従って並行に実行するスレッド数(先の文の解析も先行して開始する)")
+    parser.add_argument("--shards", type=int, default=0, help="文書を分けて処理するプロセス数(チェックポイント・時間関係の点検には対応しない)")
+    parser.add_argument("--micro-batch", type=int, default=None, help="時間・場所表現抽出と述語抽出で1つのプロンプトにまとめる最大文数")
+    parser.add_argument("--rpm", type=int, default=None, help="1分あたりのリクエスト数の上限(省略時は制限しない)")
+    parser.add_argument("--tpm", type=int, default=None, help="1分あたりのトークン数の上限(省略時は制限しない)")
+    parser.add_argument("--base-url", default=None, help="OpenAI互換APIの接続先(ローカルのスタブサーバなど)")
+    parser.add_argument("--routing-profile", choices=sorted(ROUTING_PROFILES), default="default", help="ステージごとのモデル・接続先のプロファイル")
+    parser.add_argument("--routing-config", default=None, help="ステージごとのモデル・接続先を設定するJSONファイル")
+    parser.add_argument("--dry-run", action="store_true", help="APIを呼び出さずに呼び出し数・トークン数・料金・所要時間の見積もりのみを出力する")
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    if args.shards and (args.resume or args.inspection != "off"):
+        parser.error("--shards cannot be combined with --resume or --inspection")
+    load_routing(args.routing_profile, args.routing_config)
+    set_fused_extraction(args.fused)
+    set_structured_output(args.structured)
+    set_rule_based_time_and_place(args.rule_based_time_place)
+    set_tokenizer_backend(args.tokenizer)
+    set_inspection_mode(args.inspection)
+    set_sentence_store_enabled(not args.no_sentence_store)
+    set_pipeline_workers(args.pipeline)
+    configure_rate_limits(args.rpm, args.tpm)
+    if args.base_url:
+        set_base_url(args.base_url)
+
     # (1) ロガー初期化
     initialize_logger()
 
     # (2) JSONデータのロード
-    input_filename = "test.json"
+    input_filename = args.input
     filename_only = os.path.splitext(input_filename)[0]
     with open(input_filename, 'r', encoding='utf-8') as file:
         data = json.load(file)
 
-    # (3) JSON全体の処理
-    process_json(data, filename_only)
+    # (2-1) 見積もりのみを行う場合はAPIを呼び出さずに終了
+    if args.dry_run:
+        print(format_dry_run_report(estimate_dataset(data, args.concurrency, args.micro_batch)))
+        return
+
+    # (3) Batch APIによる文単位のLLM解析(結果はLLM応答キャッシュに保存される)
+    if args.batch == "openai":
+        run_batch_extraction(data, OpenAIBatchBackend(get_client()), args.batch_dir, fused=args.fused, rule_based=args.rule_based_time_place, structured=args.structured)
+    elif args.batch == "local":
+        # ローカルのバックエンドはバッチのリクエストを接続先(--base-url)に1件ずつ送って結果ファイルを作成する
+        backend = LocalBatchBackend(os.path.join(args.batch_dir, "endpoint"), responder=make_client_responder(get_client()))
+        run_batch_extraction(data, backend, args.batch_dir, fused=args.fused, rule_based=args.rule_based_time_place, structured=args.structured)
+
+    # (4) JSON全体の処理(複数のプロセスで処理する場合は、文書ごとの結果を入力の順に統合する)
+    if args.shards:
+        run_sharded(data, filename_only, args.shards, concurrency=args.concurrency, micro_batch_size=args.micro_batch,
+                    manifest_path=args.manifest, incremental=args.incremental)
+    else:
+        process_json(data, filename_only, concurrency=args.concurrency, micro_batch_size=args.micro_batch, checkpoint_path=args.checkpoint, resume=args.resume,
+                     manifest_path=args.manifest, incremental=args.incremental)
 
-    # (4) 処理結果をCSV形式で出力
+    # (5) 処理結果をCSV形式で出力
     category_list = get_category_structure()
     entity_list = get_entity_structure()
     predicate_list = get_predicate_structure()
@@ -36,5 +113,68 @@ def main():
 
     export_to_csv(category_list, entity_list, predicate_list, edge_list, new_relation_list, "results")
 
+    # (5-1) 時間関係の点検(エッジは生成しないため、CSVの出力後に実行・待機してレポートに書き出す)
+    if args.inspection != "off":
+        run_inspection_audit()
+        summary = write_inspection_report(args.inspection_report)
+        log_to_file(
+            f"\n[Inspection] {summary['items']} items inspected, {summary['candidates']} candidates "
+            f"in {summary['items_with_candidates']} items -> {args.inspection_report}"
+        )
+
+    # (6) LLM応答キャッシュの利用状況を出力
+    log_to_file("\n=== LLM Cache Statistics ===")
+    for stage, counts in get_cache_stats().items():
+        log_to_file(f"{stage} : hit={counts['hit']}, miss={counts['miss']}")
+
+    # (7) ステージごとのトークン使用量(プロンプトキャッシュの利用状況)と所要時間・概算料金を出力
+    log_to_file("\n=== Prompt Token Usage ===")
+    for stage, stats in get_usage_stats().items():
+        cached_ratio = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+        mean_latency = stats["latency_seconds"] / stats["calls"] if stats["calls"] else 0.0
+        log_to_file(
+            f"{stage} ({stats['model']}) : calls={stats['calls']}, prompt_tokens={stats['prompt_tokens']}, "
+            f"cached_tokens={stats['cached_tokens']} ({cached_ratio:.1%}), completion_tokens={stats['completion_tokens']}, "
+            f"mean_latency={mean_latency:.2f}s, cost=${stats['cost_usd']:.4f}"
+        )
+
+    # (8) レート制限の利用状況を出力
+    utilisation = get_rate_limit_utilisation()
+    log_to_file("\n=== Rate Limit Utilisation ===")
+    log_to_file(
+        f"peak_rpm={utilisation['peak_rpm']}, peak_tpm={utilisation['peak_tpm']}, "
+        f"waits={utilisation['wait_count']} ({utilisation['wait_seconds']:.1f}s)"
+    )
+
+    # (9) 構造化出力の再質問・テキスト形式への切り替えの状況を出力
+    structured_stats = get_structured_output_stats()
+    if structured_stats:
+        log_to_file("\n=== Structured Output ===")
+        for stage, counts in structured_stats.items():
+            log_to_file(f"{stage} : calls={counts['calls']}, reasks={counts['reasks']}, fallbacks={counts['fallbacks']}")
+
+    # (10) 同じ文の解析結果を再利用した割合を出力
+    store_stats = get_sentence_store_stats()
+    log_to_file("\n=== Sentence Store ===")
+    log_to_file(f"lookups={store_stats['lookups']}, hits={store_stats['hits']} (hit rate {store_stats['hit_rate']:.1%}), entries={store_stats['entries']}")
+
+    # (11) 規則ベースの時間・場所表現抽出で処理した文の割合を出力
+    if args.rule_based_time_place:
+        rule_stats = get_rule_based_stats()
+        log_to_file("\n=== Rule-based Time/Place ===")
+        log_to_file(f"local={rule_stats['local']}, escalated={rule_stats['escalated']} (local ratio {rule_stats['local_ratio']:.1%})")
+
+    # (12) ステージのスケジューラを使った場合は、文ごとのクリティカルパスと実際の所要時間の平均を出力
+    schedule_stats = get_schedule_stats()
+    if schedule_stats["sentences"]:
+        count = schedule_stats["sentences"]
+        log_to_file("\n=== Stage Scheduler ===")
+        log_to_file(
+            f"sentences={count}, mean_critical_path={schedule_stats['critical_path'] / count:.3f}s, "
+            f"mean_observed={schedule_stats['observed'] / count:.3f}s"
+        )
+        for stage, seconds in schedule_stats["stages"].items():
+            log_to_file(f"{stage} : mean={seconds / count:.3f}s")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,142 @@
+# micro_batching.py
+# 複数の文を1つのプロンプトにまとめて時間・場所表現と述語を抽出するモジュール
+# 少数ショットの例を含む固定部分を複数の文で共有することで、1文あたりのプロンプトトークンを削減する。
+
+import re
+from source.document_parsing.llm_request import request_chat_completion, extend_prefix
+from source.document_parsing.text_utils import estimate_token_count
+from source.document_parsing.time_and_place_extraction import TIME_AND_PLACE_PREFIX, parse_time_and_place, extract_time_and_place
+from source.document_parsing.predicate_extraction import PREDICATE_PREFIX, parse_predicates, extract_predicates, split_into_sentences
+from source.document_parsing.llm_client import get_client
+
+client = get_client()
+
+MICRO_BATCH_MAX_SENTENCES = 8    # 1つのプロンプトにまとめる最大文数
+MICRO_BATCH_MAX_TOKENS = 1500    # 1つのプロンプトにまとめる文の最大トークン数(概算)
+
+_numbered_line_pattern = re.compile(r'^\[(\d+)\]\s*(.*)$')
+
+def pack_sentences(sentences, max_sentences=MICRO_BATCH_MAX_SENTENCES, max_tokens=MICRO_BATCH_MAX_TOKENS) -> list:
+    '''
+    文のリストを、文数とトークン数(概算)の上限を超えないようにグループに分割する。
+    上限を単独で超える文は1文のみのグループになる。
+    - return : 文のリストのリスト(元の順序を保持)
+    '''
+    groups = []
+    current = []
+    current_tokens = 0
+    for sentence in sentences:
+        tokens = estimate_token_count(sentence)
+        if current and (len(current) >= max_sentences or current_tokens + tokens > max_tokens):
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def split_numbered_output(content: str) -> dict:
+    '''
+    "[n]"で始まる行を区切りとして、番号付きの応答を番号ごとのテキストに分割する。
+    - return : {番号: テキスト}
+    '''
+    blocks = {}
+    current_number = None
+    for line in content.splitlines():
+        m = _numbered_line_pattern.match(line.strip())
+        if m:
+            current_number = int(m.group(1))
+            blocks[current_number] = m.group(2)
+        elif current_number is not None:
+            blocks[current_number] += "\n" + line.strip()
+    return {number: text.strip() for number, text in blocks.items()}
+
+def build_time_and_place_batch_messages(sentences) -> list:
+    '''
+    複数の文の時間・場所表現を1回の呼び出しで抽出するためにGPTに与えるメッセージを生成する関数。
+    - sentences : 対象の文のリスト(extract_time_and_placeに渡す形式)
+    - return : chat.completionsに渡すメッセージのリスト
+    '''
+    # (1) 共通部分の後に番号付きの文をまとめて与える
+    numbered = "\n".join(f"[{i}] 文: {s}" for i, s in enumerate(sentences, 1))
+    return extend_prefix(TIME_AND_PLACE_PREFIX, {"role": "user", "content": (
+        "以下の複数の文それぞれについて、上記と同じ条件で時間表現と場所表現を抽出してください。\n"
+        "各文の結果は1行で出力し、行頭に文番号を付けてください。\n"
+        "例: [1] <time : 無し>, <place : 場所表現1>\n\n"
+        f"{numbered}"
+    )})
+
+def build_predicates_batch_messages(sentences) -> list:
+    '''
+    複数の文の述語を1回の呼び出しで抽出するためにGPTに与えるメッセージを生成する関数。
+    - sentences : 対象の文のリスト
+    - return : chat.completionsに渡すメッセージのリスト
+    '''
+    # (1) 共通部分の後に番号付きの文をまとめて与える
+    numbered = "\n\n".join(
+        f"[{i}]\n原文:\n{s}\n\n短文分割結果:\n{split_into_sentences(s)}" for i, s in enumerate(sentences, 1)
+    )
+    return extend_prefix(PREDICATE_PREFIX, {"role": "user", "content": (
+        "以下の複数の文それぞれについて、上記と同じ基準で述語を抽出・分類してください。\n"
+        "各文の結果は文番号の行に続けて出力してください。\n"
+        "例:\n[1]\n[事象述語] (1)<述語1>\n[概念述語] 無し\n\n"
+        f"{numbered}"
+    )})
+
+def extract_time_and_place_batch(sentences) -> list:
+    '''
+    複数の文の時間表現と場所表現を1回の呼び出しで抽出する。
+    応答から解析できなかった文は、その文のみ単一文の呼び出し(extract_time_and_place)で抽出し直す。
+    - sentences : 対象の文のリスト(extract_time_and_placeに渡す形式)
+    - return : sentencesと同じ順序の {"time": [...], "place": [...]} のリスト
+    '''
+    if len(sentences) == 1:
+        return [extract_time_and_place(sentences[0])]
+
+    results = {}
+    try:
+        # (1) 共通部分の後に番号付きの文をまとめて与える
+        messages = build_time_and_place_batch_messages(sentences)
+        content = request_chat_completion(client, "time_and_place_batch", messages)
+
+        # (2) 番号ごとに分割し、単一文と同じパーサーで解析
+        blocks = split_numbered_output(content)
+        for i, sentence in enumerate(sentences, 1):
+            block = blocks.get(i, "")
+            if re.search(r"<time\s*:", block) and re.search(r"<place\s*:", block):
+                results[i] = parse_time_and_place(block, sentence)
+    except Exception as e:
+        print(f"Error extracting time and place (micro-batch): {e}")
+
+    # (3) 解析できなかった文は単一文の呼び出しで抽出
+    return [results[i] if i in results else extract_time_and_place(s) for i, s in enumerate(sentences, 1)]
+
+def extract_predicates_batch(sentences) -> list:
+    '''
+    複数の文の事象述語と概念述語を1回の呼び出しで抽出する。
+    応答から解析できなかった文は、その文のみ単一文の呼び出し(extract_predicates)で抽出し直す。
+    - sentences : 対象の文のリスト
+    - return : sentencesと同じ順序の (事象述語のリスト, 概念述語のリスト) のリスト
+    '''
+    if len(sentences) == 1:
+        return [extract_predicates(sentences[0])]
+
+    results = {}
+    try:
+        # (1) 共通部分の後に番号付きの文をまとめて与える
+        messages = build_predicates_batch_messages(sentences)
+        content = request_chat_completion(client, "predicates_batch", messages)
+
+        # (2) 番号ごとに分割し、単一文と同じパーサーで解析
+        blocks = split_numbered_output(content)
+        for i in range(1, len(sentences) + 1):
+            block = blocks.get(i, "")
+            if "[事象述語]" in block and "[概念述語]" in block:
+                results[i] = parse_predicates(block)
+    except Exception as e:
+        print(f"Error extracting predicates (micro-batch): {e}")
+
+    # (3) 解析できなかった文は単一文の呼び出しで抽出
+    return [results[i] if i in results else extract_predicates(s) for i, s in enumerate(sentences, 1)]
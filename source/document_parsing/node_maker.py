@@ -1,11 +1,20 @@
 # node_maker.py
 # ノード(カテゴリ・エンティティ・述語構造)を管理するモジュール
+# ノードは種類ごとのリストに生成順に保存し、インデックスからノードを引くための表(ノードストア)を合わせて管理する。
+# リストにノードを追加・復元する場合は、表と一致させるためadd_node_record・load_node_structuresを用いる。
+# ノードはdictと同じように読み出せるレコード(compact_records.py)に変換して保持する。
+
+from source.document_parsing.compact_records import to_node_record
 
 index_number_node = 1  # グローバルインデックス用変数
 category_structure = []  # カテゴリ情報を保存するリスト
 entity_structure = []    # エンティティ情報を保存するリスト
 predicate_structure = [] # 述語構造情報を保存するリスト
 
+NODE_TYPES = ("category", "entity", "predicate")
+_node_structures = {"category": category_structure, "entity": entity_structure, "predicate": predicate_structure}
+_node_table = {}  # {ノードインデックス: (ノードの種類, ノード情報)}
+
 def append_category_info(key, level=0, cat_type='項目名', doc_created_node_indexes=None):
     '''
     カテゴリノードを生成し、category_structureに追加する関数。
@@ -19,7 +28,7 @@ def append_category_info(key, level=0, cat_type='項目名', doc_created_node_in
         'category_type': cat_type,
         'category_title': key
     }
-    category_structure.append(category_info)
+    add_node_record("category", category_info)
     if doc_created_node_indexes is not None:
         doc_created_node_indexes.add(index_number_node)
 
@@ -43,7 +52,7 @@ def append_entity_info(entity_value, doc_created_node_indexes=None):
         'hierarchical_level': 0,
         'entity': entity_value
     }
-    entity_structure.append(entity_info)
+    add_node_record("entity", entity_info)
     if doc_created_node_indexes is not None:
         doc_created_node_indexes.add(index_number_node)
     
@@ -80,7 +89,7 @@ def append_predicate_structure(predicate_argument_structures, doc_created_node_i
             'argument': arguments,
             'modifier': modifier_match.group(0) if modifier_match else ""
         }
-        predicate_structure.append(predicate_info)
+        add_node_record("predicate", predicate_info)
         if doc_created_node_indexes is not None:
             doc_created_node_indexes.add(index_number_node)
         
@@ -89,6 +98,27 @@ def append_predicate_structure(predicate_argument_structures, doc_created_node_i
 
     return created_node_indexes
 
+def add_node_record(node_type: str, record: dict):
+    '''
+    インデックスが付与済みのノード情報をレコードに変換して種類ごとのリストに追加し、インデックスの表に登録する(インデックスのカウンタは変更しない)。
+    - node_type : "category", "entity", "predicate" のいずれか
+    '''
+    record = to_node_record(node_type, record)
+    _node_structures[node_type].append(record)
+    _node_table[record["index"]] = (node_type, record)
+
+def load_node_structures(categories, entities, predicates):
+    '''
+    種類ごとのリストの内容を置き換え、インデックスの表を作り直す(チェックポイントからの復元用)。
+    '''
+    category_structure[:] = [to_node_record("category", record) for record in categories]
+    entity_structure[:] = [to_node_record("entity", record) for record in entities]
+    predicate_structure[:] = [to_node_record("predicate", record) for record in predicates]
+    _node_table.clear()
+    for node_type in NODE_TYPES:
+        for record in _node_structures[node_type]:
+            _node_table[record["index"]] = (node_type, record)
+
 def get_category_structure():
     '''
     category_structureリスト（カテゴリノード情報）を返す。
@@ -107,25 +137,52 @@ def get_predicate_structure():
     '''
     return predicate_structure
 
-def get_node_content_by_index(node_index: int):
+def get_node_by_index(node_index: int):
     '''
-    ノードインデックスに対応するカテゴリ・エンティティ・述語の内容を取得して文字列として返す。
-    見つからない場合は "unknown_idx" を返す。
+    ノードインデックスに対応するノード情報を返す。存在しない場合はNone。
     '''
-    # (1) カテゴリで探索
-    for cat in category_structure:
-        if cat["index"] == node_index:
-            return cat.get("category_title", f"category_idx:{node_index}")
+    entry = _node_table.get(node_index)
+    return entry[1] if entry is not None else None
 
-    # (2) エンティティで探索
-    for ent in entity_structure:
-        if ent["index"] == node_index:
-            return ent.get("entity", f"entity_idx:{node_index}")
+def get_node_type(node_index: int):
+    '''
+    ノードインデックスに対応するノードの種類("category", "entity", "predicate")を返す。存在しない場合はNone。
+    '''
+    entry = _node_table.get(node_index)
+    return entry[0] if entry is not None else None
+
+def iter_nodes(node_type=None):
+    '''
+    ノードを種類ごとに生成順に返す。
+    - node_type : 指定した場合はその種類のノードのみ
+    '''
+    for current_type in (NODE_TYPES if node_type is None else (node_type,)):
+        yield from _node_structures[current_type]
 
-    # (3) 述語構造で探索
-    for pred in predicate_structure:
-        if pred["index"] == node_index:
-            return pred.get("predicate", f"predicate_idx:{node_index}")
+def get_nodes_by_indexes(indexes, node_type=None) -> list:
+    '''
+    インデックスの集合に含まれるノードを生成順に返す(文書・項目ごとのノードの取得用)。
+    ノード以外のインデックスが含まれていても無視する。所要時間は全ノード数ではなくインデックスの数に比例する。
+    - node_type : 指定した場合はその種類のノードのみ
+    '''
+    nodes = []
+    for node_index in sorted(set(indexes)):
+        entry = _node_table.get(node_index)
+        if entry is not None and (node_type is None or entry[0] == node_type):
+            nodes.append(entry[1])
+    return nodes
 
-    # いずれにも該当しない場合
-    return f"unknown_idx:{node_index}"
\ No newline at end of file
+def get_node_content_by_index(node_index: int):
+    '''
+    ノードインデックスに対応するカテゴリ・エンティティ・述語の内容を取得して文字列として返す。
+    見つからない場合は "unknown_idx" を返す。
+    '''
+    entry = _node_table.get(node_index)
+    if entry is None:
+        return f"unknown_idx:{node_index}"
+    node_type, node = entry
+    if node_type == "category":
+        return node.get("category_title", f"category_idx:{node_index}")
+    if node_type == "entity":
+        return node.get("entity", f"entity_idx:{node_index}")
+    return node.get("predicate", f"predicate_idx:{node_index}")
\ No newline at end of file
@@ -0,0 +1,183 @@
+# rate_limiter.py
+# chat.completionsの呼び出しを1分あたりのリクエスト数(RPM)とトークン数(TPM)の上限内に収めるモジュール
+
+import threading
+import time
+from collections import deque
+from source.document_parsing.text_utils import estimate_token_count
+
+RATE_LIMIT_ENABLED = False        # レート制限の有効/無効(configure_rate_limitsで上限を指定した場合に有効になる)
+RPM_LIMIT = None                  # 組織の1分あたりのリクエスト数の上限(Noneの場合は制限しない)
+TPM_LIMIT = None                  # 組織の1分あたりのトークン数の上限(Noneの場合は制限しない)
+RATE_LIMIT_MARGIN = 0.9           # 上限に対して実際に使用する割合(上限をわずかに下回るように調整する)
+EXPECTED_COMPLETION_TOKENS = 300  # 応答のトークン数の事前見積もり
+MESSAGE_OVERHEAD_TOKENS = 4       # メッセージ1件あたりの書式分のトークン数
+
+class TokenBucket:
+    '''
+    1分間でcapacityまで回復するトークンバケット。
+    見積もりと実績の差分を反映するため、残量は負(前借り)になることを許す。
+    '''
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.refill_per_second = capacity / 60.0
+        self.available = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def seconds_until(self, amount: float) -> float:
+        '''
+        amountだけ消費できるようになるまでの秒数を返す(refill後に呼び出す)。
+        '''
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.refill_per_second
+
+class RateLimiter:
+    '''
+    リクエスト数とトークン数の2つのバケットで呼び出しの開始を調整するスケジューラ。
+    - acquire : 見積もりトークン数で枠を確保する(枠が空くまで待機する)
+    - reconcile : 応答のusageで得た実際のトークン数との差分をバケットに反映する
+    '''
+    def __init__(self, rpm_limit=RPM_LIMIT, tpm_limit=TPM_LIMIT, margin=RATE_LIMIT_MARGIN):
+        self._lock = threading.Lock()
+        self.configure(rpm_limit, tpm_limit, margin)
+
+    def configure(self, rpm_limit, tpm_limit, margin=RATE_LIMIT_MARGIN):
+        '''
+        上限を設定し直し、利用状況の記録をリセットする。Noneを与えた項目は制限しない。
+        '''
+        with self._lock:
+            self.rpm_limit = rpm_limit
+            self.tpm_limit = tpm_limit
+            self.request_bucket = TokenBucket(max(1.0, rpm_limit * margin)) if rpm_limit else None
+            self.token_bucket = TokenBucket(max(1.0, tpm_limit * margin)) if tpm_limit else None
+            self.request_history = deque()  # 開始したリクエストの時刻
+            self.token_history = deque()    # (時刻, トークン数) 実績が得られたものは実績、それ以外は見積もり
+            self.in_flight = 0
+            self.wait_count = 0
+            self.wait_seconds = 0.0
+            self.peak_rpm = 0
+            self.peak_tpm = 0
+
+    def _trim_history(self, now: float):
+        while self.request_history and now - self.request_history[0] > 60.0:
+            self.request_history.popleft()
+        while self.token_history and now - self.token_history[0][0] > 60.0:
+            self.token_history.popleft()
+
+    def acquire(self, estimated_tokens: int):
+        '''
+        1リクエスト分と見積もりトークン数分の枠が空くまで待機し、枠を確保する。
+        '''
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = 0.0
+                if self.request_bucket is not None:
+                    self.request_bucket.refill(now)
+                    wait = max(wait, self.request_bucket.seconds_until(1))
+                if self.token_bucket is not None:
+                    self.token_bucket.refill(now)
+                    # バケットの容量を超える見積もりは容量までに丸める(永久に待機しないため)
+                    token_amount = min(estimated_tokens, self.token_bucket.capacity)
+                    wait = max(wait, self.token_bucket.seconds_until(token_amount))
+                if wait <= 0:
+                    if self.request_bucket is not None:
+                        self.request_bucket.available -= 1
+                    if self.token_bucket is not None:
+                        self.token_bucket.available -= estimated_tokens
+                    self.in_flight += 1
+                    self.request_history.append(now)
+                    self.token_history.append((now, estimated_tokens))
+                    self._trim_history(now)
+                    self.peak_rpm = max(self.peak_rpm, len(self.request_history))
+                    self.peak_tpm = max(self.peak_tpm, sum(t for _, t in self.token_history))
+                    if waited > 0:
+                        self.wait_count += 1
+                        self.wait_seconds += waited
+                    return
+            sleep_seconds = min(wait, 1.0)
+            time.sleep(sleep_seconds)
+            waited += sleep_seconds
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        '''
+        見積もりと実際のトークン数の差分をバケットと利用状況に反映する。
+        リクエストが失敗した場合はactual_tokensに0を与えて見積もり分を返却する。
+        '''
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if self.token_bucket is not None:
+                self.token_bucket.available = min(
+                    self.token_bucket.capacity, self.token_bucket.available + estimated_tokens - actual_tokens
+                )
+            self.token_history.append((time.monotonic(), actual_tokens - estimated_tokens))
+
+    def get_utilisation(self) -> dict:
+        '''
+        直近1分間のリクエスト数・トークン数と、上限に対する使用率などを返す。
+        '''
+        with self._lock:
+            now = time.monotonic()
+            self._trim_history(now)
+            rpm = len(self.request_history)
+            tpm = max(0, sum(t for _, t in self.token_history))
+            return {
+                "rpm": rpm,
+                "tpm": tpm,
+                "rpm_utilisation": rpm / self.rpm_limit if self.rpm_limit else 0.0,
+                "tpm_utilisation": tpm / self.tpm_limit if self.tpm_limit else 0.0,
+                "peak_rpm": self.peak_rpm,
+                "peak_tpm": self.peak_tpm,
+                "in_flight": self.in_flight,
+                "wait_count": self.wait_count,
+                "wait_seconds": self.wait_seconds,
+            }
+
+rate_limiter = RateLimiter()
+
+def configure_rate_limits(rpm_limit=None, tpm_limit=None):
+    '''
+    RPM・TPMの上限を設定する。Noneを与えた項目は制限せず、両方ともNoneの場合はレート制限を無効にする。
+    '''
+    global RATE_LIMIT_ENABLED
+    RATE_LIMIT_ENABLED = rpm_limit is not None or tpm_limit is not None
+    rate_limiter.configure(rpm_limit, tpm_limit)
+
+def get_rate_limit_utilisation() -> dict:
+    return rate_limiter.get_utilisation()
+
+def estimate_request_tokens(messages, expected_completion_tokens=EXPECTED_COMPLETION_TOKENS) -> int:
+    '''
+    リクエストの入力トークン数と応答トークン数の見積もりを合計して返す。
+    '''
+    prompt_tokens = 0
+    for m in messages:
+        content = m.get("content", "")
+        if isinstance(content, str):
+            prompt_tokens += estimate_token_count(content)
+        prompt_tokens += MESSAGE_OVERHEAD_TOKENS
+    return prompt_tokens + expected_completion_tokens
+
+def call_with_rate_limit(func, messages, **kwargs):
+    '''
+    レート制限の枠を確保してからfunc(messages=messages, **kwargs)を呼び出し、応答のusageで見積もりを補正する。
+    '''
+    if not RATE_LIMIT_ENABLED:
+        return func(messages=messages, **kwargs)
+
+    estimated_tokens = estimate_request_tokens(messages)
+    rate_limiter.acquire(estimated_tokens)
+    try:
+        response = func(messages=messages, **kwargs)
+    except Exception:
+        rate_limiter.reconcile(estimated_tokens, 0)
+        raise
+    actual_tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
+    rate_limiter.reconcile(estimated_tokens, actual_tokens if actual_tokens is not None else estimated_tokens)
+    return response
@@ -2,14 +2,186 @@
 # 一つの文を分析するモジュール
 
 import re
+import time
 from source.document_parsing.logger import log_to_file
-from source.document_parsing.node_maker import append_entity_info, append_predicate_structure, get_predicate_structure
-from source.document_parsing.edge_maker import append_edge_info
+from source.document_parsing.llm_request import get_failed_request_count
+from source.document_parsing.node_maker import append_entity_info, append_predicate_structure, get_node_by_index
+from source.document_parsing.edge_maker import append_edge_info, get_edge
 from source.document_parsing.time_and_place_extraction import extract_time_and_place
 from source.document_parsing.predicate_extraction import extract_predicates, extract_entity_and_predicate_structures
 from source.document_parsing.text_utils import process_sentence_with_residue_removal, convert_predicate_to_text
-from source.document_parsing.causal_relationship_extraction import extract_causal_relationship
-from source.document_parsing.detailed_info_relationship_extraction import extract_explain_details_relationship
+from source.document_parsing.causal_relationship_extraction import extract_causal_relationship, request_causal_relations, apply_causal_relations
+from source.document_parsing.detailed_info_relationship_extraction import extract_explain_details_relationship, request_explain_details_relations, apply_explain_details_relations
+from source.document_parsing.fused_extraction import extract_fused
+from source.document_parsing.structured_output import (
+    extract_time_and_place_structured, extract_predicates_structured, extract_entity_and_predicate_structures_structured,
+    extract_causal_relationship_structured, extract_explain_details_relationship_structured,
+    request_causal_relations_structured, request_explain_details_relations_structured
+)
+from source.document_parsing.time_and_place_rules import extract_time_and_place_rules
+from source.document_parsing.sentence_store import lookup_sentence_result, store_sentence_result, resolve_relation_edges
+from source.document_parsing.stage_scheduler import pipeline_enabled, take_pipelined_analysis, run_late_stages, record_sentence_schedule
+
+# 事前に(並行して)解析された文の結果: {文: analyze_sentenceの戻り値}
+_prefetched_analyses = {}
+# 事前解析・パイプラインを開始した時点のAPI呼び出しの失敗数(それ以降に失敗があれば、事前解析の結果は記録しない)
+_analysis_failure_mark = 0
+
+USE_FUSED_EXTRACTION = False  # Trueの場合、時間・場所表現、述語、述語項構造を1回のGPT呼び出しで抽出する
+USE_STRUCTURED_OUTPUT = False  # Trueの場合、各抽出ステージの応答をJSONスキーマに従った構造化出力として受け取る
+USE_RULE_BASED_TIME_AND_PLACE = False  # Trueの場合、時間・場所表現を規則で抽出できる文はLLMを呼び出さない
+
+def set_fused_extraction(enabled: bool):
+    '''
+    一括抽出(fused_extraction)を利用するかどうかを設定する。
+    '''
+    global USE_FUSED_EXTRACTION
+    USE_FUSED_EXTRACTION = enabled
+
+def set_structured_output(enabled: bool):
+    '''
+    構造化出力(structured_output)を利用するかどうかを設定する。
+    '''
+    global USE_STRUCTURED_OUTPUT
+    USE_STRUCTURED_OUTPUT = enabled
+
+def set_rule_based_time_and_place(enabled: bool):
+    '''
+    規則ベースの時間・場所表現抽出(time_and_place_rules)を利用するかどうかを設定する。
+    '''
+    global USE_RULE_BASED_TIME_AND_PLACE
+    USE_RULE_BASED_TIME_AND_PLACE = enabled
+
+def sentence_store_mode() -> tuple:
+    '''
+    文単位の結果の記録(sentence_store)のキーに含める抽出の設定。設定が異なる結果は再利用しない。
+    '''
+    return (USE_FUSED_EXTRACTION, USE_STRUCTURED_OUTPUT, USE_RULE_BASED_TIME_AND_PLACE)
+
+def _separate_stages(sentence: str) -> dict:
+    '''
+    時間・場所表現、述語、述語項構造を個別に抽出するステージを依存関係とともに返す。
+    - return : {ステージ名: (関数, 依存先のステージ名のタプル)} 関数はそれまでのステージの結果の辞書を受け取る
+    '''
+    # 構造化出力が有効な場合は各ステージの構造化出力版を用いる
+    if USE_STRUCTURED_OUTPUT:
+        extract_tp, extract_pred, extract_struct = extract_time_and_place_structured, extract_predicates_structured, extract_entity_and_predicate_structures_structured
+    else:
+        extract_tp, extract_pred, extract_struct = extract_time_and_place, extract_predicates, extract_entity_and_predicate_structures
+
+    # (1) 時間・場所表現の抽出(規則ベースが有効な場合は、規則で判断できない文のみLLMで抽出する)
+    def time_and_place(results):
+        if USE_RULE_BASED_TIME_AND_PLACE:
+            return extract_time_and_place_rules(sentence + "。", extract_tp)
+        return extract_tp(sentence + "。")
+
+    # (2) 述語（事象/概念）の抽出
+    def predicates(results):
+        return extract_pred(sentence)
+
+    # (3) 述語項構造と追加エンティティの抽出
+    def structures(results):
+        event_predicates, entity_predicates = results["predicates"]
+        return extract_struct(
+            sentence,
+            event_predicates,
+            entity_predicates,
+            results["time_and_place"]['time'],
+            results["time_and_place"]['place']
+        )
+
+    return {
+        "time_and_place": (time_and_place, ()),
+        "predicates": (predicates, ()),
+        "structures": (structures, ("time_and_place", "predicates"))
+    }
+
+def _assemble_analysis(results: dict) -> dict:
+    '''
+    個別のステージの結果をanalyze_sentenceの戻り値の形式にまとめる。
+    '''
+    event_predicates, entity_predicates = results["predicates"]
+    predicate_argument_structures, entities = results["structures"]
+    return {
+        "time": results["time_and_place"]['time'],
+        "place": results["time_and_place"]['place'],
+        "event_predicates": event_predicates,
+        "entity_predicates": entity_predicates,
+        "structures": predicate_argument_structures,
+        "entities": entities
+    }
+
+def sentence_analysis_stages(sentence: str):
+    '''
+    analyze_sentenceをステージに分けて返す(stage_schedulerで依存関係に従って並行に実行するため)。
+    一括抽出が有効な場合は1つのステージとし、応答の形式が崩れていた場合の個別ステージでの抽出もその中で行う。
+    - return : (ステージの辞書, ステージの結果の辞書から解析結果をまとめる関数)
+    '''
+    if USE_FUSED_EXTRACTION:
+        return {"fused": (lambda results: analyze_sentence(sentence), ())}, (lambda results: results["fused"])
+    return _separate_stages(sentence), _assemble_analysis
+
+def analyze_sentence(sentence: str) -> dict:
+    '''
+    1つの文に対してノード生成前に必要なLLM解析(時間・場所表現、述語、述語項構造)のみを行う関数。
+    ノードやエッジを生成しないため、複数の文に対して並行に呼び出すことができる。
+    - sentence : 対象の文
+    - return : {"time", "place", "event_predicates", "entity_predicates", "structures", "entities"}
+    '''
+    # (0) 一括抽出が有効な場合は1回の呼び出しで抽出し、応答の形式が崩れていた場合のみ個別ステージで抽出する
+    if USE_FUSED_EXTRACTION:
+        analysis = extract_fused(sentence)
+        if analysis is not None:
+            return analysis
+
+    # (1)-(3) 個別のステージを依存関係の順に実行する
+    results = {}
+    for name, (stage, deps) in _separate_stages(sentence).items():
+        results[name] = stage(results)
+    return _assemble_analysis(results)
+
+def _relation_stages(sentence: str, node_list: list) -> dict:
+    '''
+    因果関係・説明関係の問い合わせ(エッジは生成しない)を後半のステージとして返す。
+    問い合わせに失敗した場合は逐次実行と同様にメッセージを表示し、関係は無いものとする。
+    '''
+    def causal_relationship():
+        try:
+            relations = request_causal_relations_structured(sentence, node_list) if USE_STRUCTURED_OUTPUT else None
+            return relations if relations is not None else request_causal_relations(sentence, node_list)
+        except Exception as e:
+            print(f"Error extracting causal relation: {e}")
+            return []
+
+    def explain_details():
+        try:
+            relations = request_explain_details_relations_structured(sentence, node_list) if USE_STRUCTURED_OUTPUT else None
+            return relations if relations is not None else request_explain_details_relations(sentence, node_list)
+        except Exception as e:
+            print(f"Error extracting explanation relation: {e}")
+            return []
+
+    return {"causal_relationship": causal_relationship, "explain_details": explain_details}
+
+def register_sentence_analysis(sentence: str, analysis: dict):
+    '''
+    事前に解析した文の結果を登録する。process_sentenceは登録済みの結果があればLLM解析を省略する。
+    '''
+    _prefetched_analyses[sentence] = analysis
+
+def mark_analysis_start():
+    '''
+    文書内の文の事前解析・パイプラインを開始する前に呼ぶ。事前解析の結果は他の文の解析と並行して得られるため、
+    この時点以降にAPI呼び出しが1件でも失敗した場合は、その文書の事前解析の結果をsentence_storeに記録しない。
+    '''
+    global _analysis_failure_mark
+    _analysis_failure_mark = get_failed_request_count()
+
+def clear_sentence_analyses():
+    '''
+    登録済みの事前解析結果をすべて削除する。
+    '''
+    _prefetched_analyses.clear()
 
 def process_sentence(sentence: str, doc_created_indexes=None):
     '''
@@ -22,12 +194,34 @@ def process_sentence(sentence: str, doc_created_indexes=None):
     # (1) 文ログ出力（デバッグ）
     log_to_file(f"\nProcessing sentence: {sentence}")
 
-    # (2) 時間・場所表現の抽出
-    time_and_place = extract_time_and_place(sentence + "。")
-    time_expressions = time_and_place['time']
-    place_expressions = time_and_place['place']
+    # (2) 時間・場所表現、述語、述語項構造の抽出(同じ文の結果が記録済み、または事前解析済みの場合はその結果を利用)
+    #     failures_beforeは結果の記録の可否の判断に用いる(解析の開始以降にAPI呼び出しが失敗していなければ記録する)
+    failures_before = get_failed_request_count()
+    stored = lookup_sentence_result(sentence, sentence_store_mode())
+    if stored is not None:
+        log_to_file("[SENTENCE STORE] Replaying the stored result of the same sentence.")
+        analysis = stored["analysis"]
+    else:
+        analysis = _prefetched_analyses.get(sentence)
+        if analysis is not None:
+            failures_before = _analysis_failure_mark
+    timings = {}  # ステージごとの (開始時刻, 終了時刻)(スケジューラを使う場合のみ記録する)
+    if analysis is None and pipeline_enabled():
+        pipelined = take_pipelined_analysis(sentence)
+        if pipelined is not None:
+            analysis, timings = pipelined
+            failures_before = _analysis_failure_mark
+    if analysis is None:
+        analysis = analyze_sentence(sentence)
+    time_expressions = analysis["time"]
+    place_expressions = analysis["place"]
+    event_predicates = analysis["event_predicates"]
+    entity_predicates = analysis["entity_predicates"]
+    predicate_argument_structures = analysis["structures"]
+    entities = analysis["entities"]
 
     # (3) 生成されたノード情報を一時的に格納するリスト
+    nodes_start = time.perf_counter()
     created_nodes_in_sentence = []
 
     # (4) 時間表現ノードを作成
@@ -60,20 +254,11 @@ def process_sentence(sentence: str, doc_created_indexes=None):
                 "type": "place"
             })
 
-    # (6) 述語（事象/概念）の抽出
-    event_predicates, entity_predicates = extract_predicates(sentence)
+    # (6) 述語（事象/概念）の抽出結果
     log_to_file(f"Extracted event predicates: {event_predicates if event_predicates else 'None'}")
     log_to_file(f"Extracted entity predicates: {entity_predicates if entity_predicates else 'None'}")
 
-    # (7) 述語項構造と追加エンティティの抽出
-    predicate_argument_structures, entities = extract_entity_and_predicate_structures(
-        sentence,
-        event_predicates,
-        entity_predicates,
-        time_expressions,
-        place_expressions
-    )
-
+    # (7) 述語項構造の抽出結果
     log_to_file("Extracted predicate-argument structures:")
     for i, structure in enumerate(predicate_argument_structures, 1):
         log_to_file(f"  ({i}) {structure}")
@@ -93,7 +278,7 @@ def process_sentence(sentence: str, doc_created_indexes=None):
         if offset < 0:
             offset = 999999
         
-        pred_dict = next((p for p in get_predicate_structure() if p["index"] == idx), None)
+        pred_dict = get_node_by_index(idx)
         if pred_dict is not None:
             text = convert_predicate_to_text(pred_dict).strip()
         else:
@@ -153,15 +338,42 @@ def process_sentence(sentence: str, doc_created_indexes=None):
                 edge_type = "info_SpecificTime" if c["type"] == "time" else "info_SpecificPlace"
                 append_edge_info(edge_type, from_node_index=chosen_idx, to_node_index=c["index"], doc_created_edge_indexes=doc_created_indexes)
 
-    # (12) ノードリストを用いて因果関係と説明関係を抽出 
-    target_node_list = []
-    for n in created_nodes_in_sentence:
-        if n["type"] in ("predicate", "entity"):
-            target_node_list.append({"index": n["index"], "text": n["text"]})   
+    # (12) ノードリストを用いて因果関係と説明関係を抽出
+    timings["nodes"] = (nodes_start, time.perf_counter())
+    all_created_indexes = [d["index"] for d in created_nodes_in_sentence]
+    if stored is not None:
+        # (12-1) 同じ文の結果が記録済みの場合は、記録したエッジを新しいノードのインデックスで付け直す
+        for edge_type, from_idx, to_idx in resolve_relation_edges(stored, all_created_indexes):
+            append_edge_info(edge_type, from_node_index=from_idx, to_node_index=to_idx, doc_created_edge_indexes=doc_created_indexes)
+    else:
+        target_node_list = []
+        for n in created_nodes_in_sentence:
+            if n["type"] in ("predicate", "entity"):
+                target_node_list.append({"index": n["index"], "text": n["text"]})   
 
-    extract_causal_relationship(sentence, target_node_list, doc_created_indexes) #因果関係抽出
-    extract_explain_details_relationship(sentence, target_node_list, doc_created_indexes) #説明関係抽出
+        edge_count_before = len(get_edge())
+        if pipeline_enabled():
+            # (12-2) 因果関係と説明関係の問い合わせを並行に実行し、エッジは逐次実行と同じ順(因果関係→説明関係)に生成する
+            relations, late_timings = run_late_stages(_relation_stages(sentence, target_node_list))
+            apply_causal_relations(relations["causal_relationship"], doc_created_indexes)
+            apply_explain_details_relations(relations["explain_details"], doc_created_indexes)
+            timings.update(late_timings)
+        elif USE_STRUCTURED_OUTPUT:
+            extract_causal_relationship_structured(sentence, target_node_list, doc_created_indexes) #因果関係抽出
+            extract_explain_details_relationship_structured(sentence, target_node_list, doc_created_indexes) #説明関係抽出
+        else:
+            extract_causal_relationship(sentence, target_node_list, doc_created_indexes) #因果関係抽出
+            extract_explain_details_relationship(sentence, target_node_list, doc_created_indexes) #説明関係抽出
 
-    # (13) 生成されたノードのインデックスをまとめて返す
-    all_created_indexes = [d["index"] for d in created_nodes_in_sentence]
+        # (12-3) 文の結果を記録し、同じ文が再び現れた場合に再利用する(API呼び出しが失敗した場合は記録しない)
+        if get_failed_request_count() == failures_before:
+            store_sentence_result(sentence, sentence_store_mode(), analysis, all_created_indexes, get_edge()[edge_count_before:])
+        else:
+            log_to_file("[SENTENCE STORE] Not storing the result of this sentence because an API call failed.")
+
+    # (13) スケジューラを使う場合は、ステージの所要時間からクリティカルパスを求めて記録する
+    if pipeline_enabled():
+        record_sentence_schedule(sentence, timings)
+
+    # (14) 生成されたノードのインデックスをまとめて返す
     return all_created_indexes
\ No newline at end of file
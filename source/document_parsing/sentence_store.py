@@ -0,0 +1,108 @@
+# sentence_store.py
+# 文単位の解析結果を文書をまたいで再利用するための記録モジュール
+# 失敗知識データベースの文書には定型的な文(対策の記述や見出しのみの行など)が繰り返し現れるため、
+# 文ごとにLLM解析の結果(時間・場所表現、述語、述語項構造、エンティティ)と、
+# 因果関係・説明関係のエッジを文内のノードの生成順による相対的な形で記録する。
+# 同じ文が再び現れた場合は、ノードのインデックスを新たに割り当て、記録したエッジを付け直すことでAPIを呼び出さずに再現する。
+# 記録した表現は文中の位置(sentence.find)でノードの順序を決めるため、キーは正規化せずに文そのものとする。
+# API呼び出しが失敗した文の結果は空の抽出結果を含むため記録しない(LLM応答キャッシュが失敗を保存しないのと同じ)。
+
+import threading
+from itertools import islice
+
+SENTENCE_STORE_ENABLED = True  # Falseの場合、文ごとの結果を記録・再利用しない
+
+_store_lock = threading.Lock()
+_sentence_store = {}  # {(文, 抽出モード): {"analysis": {...}, "relation_edges": [(type, from_pos, to_pos), ...]}}
+_store_stats = {"lookups": 0, "hits": 0}
+
+def set_sentence_store_enabled(enabled: bool):
+    '''
+    文単位の解析結果の再利用を行うかどうかを設定する。
+    '''
+    global SENTENCE_STORE_ENABLED
+    SENTENCE_STORE_ENABLED = enabled
+
+def has_sentence_result(sentence: str, mode) -> bool:
+    '''
+    文の結果が記録されているかどうか(ヒット率の集計には含めない)。
+    - mode : 抽出の設定(一括抽出・構造化出力など)を表すタプル。設定が異なる結果は再利用しない
+    '''
+    return SENTENCE_STORE_ENABLED and (sentence, mode) in _sentence_store
+
+def lookup_sentence_result(sentence: str, mode):
+    '''
+    記録された文の結果を返す。記録が無い場合はNone。
+    - return : {"analysis": {...}, "relation_edges": [(type, from_pos, to_pos), ...]} またはNone
+    '''
+    if not SENTENCE_STORE_ENABLED:
+        return None
+    with _store_lock:
+        entry = _sentence_store.get((sentence, mode))
+        _store_stats["lookups"] += 1
+        if entry is not None:
+            _store_stats["hits"] += 1
+        return entry
+
+def store_sentence_result(sentence: str, mode, analysis: dict, created_indexes, relation_edges):
+    '''
+    文の解析結果と、その文で生成した因果関係・説明関係のエッジを相対的な形で記録する。
+    エッジの端点が文内で生成したノード以外の場合は再現できないため記録しない。
+    (API呼び出しが失敗した文は呼び出し元(process_sentence)で除外する)
+    - created_indexes : 文内で生成したノードのインデックス(生成順)
+    - relation_edges : 文内で生成した因果関係・説明関係のエッジ [{"type", "from", "to", ...}, ...]
+    '''
+    if not SENTENCE_STORE_ENABLED:
+        return
+    positions = {node_index: pos for pos, node_index in enumerate(created_indexes)}
+    relative_edges = []
+    for e in relation_edges:
+        if e["from"] not in positions or e["to"] not in positions:
+            return
+        relative_edges.append((e["type"], positions[e["from"]], positions[e["to"]]))
+    with _store_lock:
+        _sentence_store[(sentence, mode)] = {"analysis": analysis, "relation_edges": relative_edges}
+
+def resolve_relation_edges(entry: dict, created_indexes) -> list:
+    '''
+    記録された相対的なエッジを、新たに生成したノードのインデックスに対応付ける。
+    - return : [(type, from_index, to_index), ...]
+    '''
+    return [(edge_type, created_indexes[from_pos], created_indexes[to_pos]) for edge_type, from_pos, to_pos in entry["relation_edges"]]
+
+def get_sentence_store_stats() -> dict:
+    '''
+    文の結果の参照回数と再利用できた回数、再利用率、記録された文の数を返す。
+    '''
+    with _store_lock:
+        lookups = _store_stats["lookups"]
+        return dict(_store_stats, hit_rate=_store_stats["hits"] / lookups if lookups else 0.0, entries=len(_sentence_store))
+
+def export_sentence_store(start: int = 0) -> dict:
+    '''
+    記録された文の結果と集計をJSONに変換できる形で返す(チェックポイント用)。
+    - start : 指定した場合、記録順でこの位置以降に記録された文の結果のみを返す(チェックポイントへの追記用)
+    '''
+    with _store_lock:
+        entries = [[text, list(mode), entry] for (text, mode), entry in islice(_sentence_store.items(), start, None)]
+        return {"entries": entries, "stats": dict(_store_stats)}
+
+def import_sentence_store(state: dict):
+    '''
+    export_sentence_storeで出力した内容を復元する。
+    '''
+    with _store_lock:
+        _sentence_store.clear()
+        for text, mode, entry in state["entries"]:
+            entry["relation_edges"] = [tuple(e) for e in entry["relation_edges"]]
+            _sentence_store[(text, tuple(mode))] = entry
+        _store_stats.update(state["stats"])
+
+def clear_sentence_store():
+    '''
+    記録された文の結果と集計をすべて削除する。
+    '''
+    with _store_lock:
+        _sentence_store.clear()
+        _store_stats["lookups"] = 0
+        _store_stats["hits"] = 0
@@ -0,0 +1,132 @@
+# sharding.py
+# 入力JSONの文書を複数のプロセスに分けて処理し、結果を1つのノード・エッジの集合にまとめるモジュール
+# ノード・エッジのインデックスはプロセスごとのグローバルなカウンタで採番されるため、各プロセスは担当する文書を
+# process_jsonで処理して文書ごとのノード・エッジをマニフェスト(incremental.py)の形式で書き出し、
+# 統合時に入力の文書の順に現在のインデックスへ付け替えて追加する。インデックスの採番は逐次実行の場合と同一になる。
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from source.document_parsing import sentence_parser, local_tokenizer, sentence_store, stage_scheduler, llm_cache, llm_routing
+from source.document_parsing.logger import initialize_logger, log_to_file
+from source.document_parsing.node_maker import append_category_info
+from source.document_parsing.llm_client import get_client, set_base_url
+from source.document_parsing.rate_limiter import rate_limiter, configure_rate_limits
+from source.document_parsing.incremental import compute_document_hash, snapshot_positions, replay_document_fragment, load_manifest, write_manifest
+from source.document_parsing.json_processor import process_json
+
+SHARD_DIR = os.path.join("results", "shards")  # 各プロセスのマニフェストを書き出すディレクトリ
+
+def assign_documents(data: dict, shards: int) -> list:
+    '''
+    文書を大きいものから順に、担当する文字数の合計が最も少ないプロセスに割り当てる。
+    - return : プロセスごとの文書名のリスト(各リストの中は入力の順)
+    '''
+    order = {doc_name: i for i, doc_name in enumerate(data)}
+    sizes = {doc_name: len(json.dumps(doc_value, ensure_ascii=False)) for doc_name, doc_value in data.items()}
+    loads = [0] * shards
+    assigned = [[] for _ in range(shards)]
+    for doc_name in sorted(data, key=lambda name: -sizes[name]):
+        shard = loads.index(min(loads))
+        assigned[shard].append(doc_name)
+        loads[shard] += sizes[doc_name]
+    return [sorted(names, key=order.get) for names in assigned if names]
+
+def collect_worker_options(shards: int) -> dict:
+    '''
+    現在のプロセスの設定(抽出の設定、ルーティング、接続先、レート制限など)を、各プロセスに渡せる形で返す。
+    レート制限は組織全体の上限のため、プロセス数で等分する。
+    '''
+    return {
+        "fused": sentence_parser.USE_FUSED_EXTRACTION,
+        "structured": sentence_parser.USE_STRUCTURED_OUTPUT,
+        "rule_based_time_place": sentence_parser.USE_RULE_BASED_TIME_AND_PLACE,
+        "tokenizer": local_tokenizer.TOKENIZER_BACKEND,
+        "sentence_store": sentence_store.SENTENCE_STORE_ENABLED,
+        "pipeline": stage_scheduler.PIPELINE_WORKERS,
+        "cache": llm_cache.CACHE_ENABLED,
+        "routes": {stage: dict(route) for stage, route in llm_routing.STAGE_ROUTES.items()},
+        "base_url": str(get_client().base_url),
+        "rpm": max(1, rate_limiter.rpm_limit // shards) if rate_limiter.rpm_limit else None,
+        "tpm": max(1, rate_limiter.tpm_limit // shards) if rate_limiter.tpm_limit else None
+    }
+
+def apply_worker_options(options: dict):
+    '''
+    collect_worker_optionsの設定を現在のプロセスに反映する。
+    '''
+    sentence_parser.set_fused_extraction(options["fused"])
+    sentence_parser.set_structured_output(options["structured"])
+    sentence_parser.set_rule_based_time_and_place(options["rule_based_time_place"])
+    local_tokenizer.set_tokenizer_backend(options["tokenizer"])
+    sentence_store.set_sentence_store_enabled(options["sentence_store"])
+    stage_scheduler.set_pipeline_workers(options["pipeline"])
+    llm_cache.CACHE_ENABLED = options["cache"]
+    llm_routing.STAGE_ROUTES.clear()
+    llm_routing.STAGE_ROUTES.update(options["routes"])
+    set_base_url(options["base_url"])
+    configure_rate_limits(options["rpm"], options["tpm"])
+
+def process_shard(shard_id: int, documents: dict, filename: str, options: dict, concurrency=None, micro_batch_size=None) -> str:
+    '''
+    (各プロセスで実行)担当する文書をprocess_jsonで処理し、文書ごとのノード・エッジをマニフェストとして書き出す。
+    - documents : 担当する文書 {文書名: 値}
+    - return : 書き出したマニフェストのパス
+    '''
+    apply_worker_options(options)
+    initialize_logger(f"shard{shard_id}")
+    manifest_path = os.path.join(SHARD_DIR, f"shard_{shard_id}.json")
+    process_json(documents, filename, concurrency=concurrency, micro_batch_size=micro_batch_size, manifest_path=manifest_path)
+    return manifest_path
+
+def run_sharded(data: dict, filename: str, shards: int, concurrency=None, micro_batch_size=None, manifest_path=None, incremental=False):
+    '''
+    文書を複数のプロセスで処理し、結果を入力の文書の順に統合する。
+    - shards : プロセス数
+    - manifest_path, incremental : process_jsonと同じ。incrementalの場合、マニフェストと内容が一致する文書はどのプロセスにも割り当てない
+    '''
+    # (1) マニフェストと内容が一致する文書は前回の結果を用いる
+    manifest = load_manifest(manifest_path, filename) if incremental else None
+    sources = {}  # {文書名: (ノード・エッジ, 作成時のルートカテゴリノードのインデックス)}
+    if manifest:
+        for doc_name, doc_value in data.items():
+            stored = manifest["documents"].get(doc_name)
+            if stored is not None and stored["hash"] == compute_document_hash(doc_value):
+                sources[doc_name] = (stored, manifest["root_category_index"])
+
+    # (2) 残りの文書をプロセスに割り当てて処理する(各プロセスのインデックスは1から始まる)
+    pending = {doc_name: doc_value for doc_name, doc_value in data.items() if doc_name not in sources}
+    assignments = assign_documents(pending, max(1, min(shards, len(pending)))) if pending else []
+    log_to_file(f"Sharding {len(pending)} documents across {len(assignments)} processes ({len(sources)} reused from manifest)")
+    if assignments:
+        options = collect_worker_options(len(assignments))
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(assignments), mp_context=context) as executor:
+            futures = [
+                executor.submit(process_shard, shard_id, {name: pending[name] for name in names}, filename, options, concurrency, micro_batch_size)
+                for shard_id, names in enumerate(assignments)
+            ]
+            for future in futures:
+                with open(future.result(), "r", encoding="utf-8") as f:
+                    shard_manifest = json.load(f)
+                for doc_name, fragment in shard_manifest["documents"].items():
+                    sources[doc_name] = (fragment, shard_manifest["root_category_index"])
+
+    # (3) 入力の文書の順に、ノード・エッジを現在のインデックスに付け替えて追加する
+    root_category_index = append_category_info(key=filename, level=3, cat_type='カテゴリ名', doc_created_node_indexes=None)
+    log_to_file(f"Root category created: [category] '{filename}' (level=3, カテゴリ名)")
+    document_spans = {}
+    for doc_name in data:
+        if doc_name not in sources:
+            raise RuntimeError(f"document '{doc_name}' could not be merged (no self-contained result in its shard)")
+        fragment, stored_root_index = sources[doc_name]
+        start = snapshot_positions()
+        replay_document_fragment(fragment, root_category_index, stored_root_index)
+        document_spans[doc_name] = {"hash": fragment["hash"], "start": start, "end": snapshot_positions(), "trailing_edges": fragment.get("trailing_edges", 0)}
+        log_to_file(f"Document merged: [category] '{doc_name}' ({len(fragment['categories']) + len(fragment['entities']) + len(fragment['predicates'])} nodes, {len(fragment['edges'])} edges)")
+
+    # (4) 統合後の文書ごとのハッシュとノード・エッジをマニフェストとして書き出す
+    if manifest_path:
+        saved = write_manifest(manifest_path, filename, root_category_index, document_spans)
+        log_to_file(f"\nManifest written to '{manifest_path}': {saved} documents")
@@ -0,0 +1,218 @@
+# stage_scheduler.py
+# 文の解析ステージを依存関係(DAG)に従って並行に実行するスケジューラ
+# 1つの文のステージは次の依存関係を持つ(一括抽出が有効な場合は前半の3つが fused の1つになる)。
+#   time_and_place ─┐
+#                   ├─ structures ─ nodes ─┬─ causal_relationship
+#   predicates ─────┘                      └─ explain_details
+# 前半のステージ(ノード生成前のLLM解析)は先の文の分も先行して開始し、文kの後半のステージと文k+1以降の前半のステージを重ねて実行する。
+# ノード・エッジの生成はprocess_sentenceで文の順に逐次行うため、インデックスの採番は逐次実行の場合と同一になる。
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from source.document_parsing.logger import log_to_file
+
+PIPELINE_WORKERS = 0  # 前半のステージを実行するスレッド数(0の場合はスケジューラを使わず逐次実行する)
+PIPELINE_LOOKAHEAD = None  # 先行して解析を開始する文の数(Noneの場合はPIPELINE_WORKERSと同じ)
+
+# ステージの依存関係(クリティカルパスの計算に用いる。記録の無いステージは無視する)
+SENTENCE_STAGE_DEPENDENCIES = {
+    "fused": (),
+    "time_and_place": (),
+    "predicates": (),
+    "structures": ("time_and_place", "predicates"),
+    "nodes": ("fused", "structures"),
+    "causal_relationship": ("nodes",),
+    "explain_details": ("nodes",)
+}
+
+_early_executor = None
+_late_executor = None
+_pipeline = deque()  # 解析待ちの文 [{"sentence": ..., "future": Future または None}, ...]
+_pipeline_sentences = set()
+_analysis_stages = None  # 文から (ステージの辞書, 結果をまとめる関数) を返す関数
+_stats_lock = threading.Lock()
+_schedule_stats = {"sentences": 0, "critical_path": 0.0, "observed": 0.0, "stages": {}}
+
+def set_pipeline_workers(workers: int, lookahead: int = None):
+    '''
+    スケジューラのスレッド数と先行して解析を開始する文の数を設定する。
+    - workers : 前半のステージを実行するスレッド数(0の場合は逐次実行)
+    - lookahead : 先行して解析を開始する文の数(省略時はworkersと同じ)
+    '''
+    global PIPELINE_WORKERS, PIPELINE_LOOKAHEAD, _early_executor
+    PIPELINE_WORKERS = max(0, workers or 0)
+    PIPELINE_LOOKAHEAD = lookahead
+    _early_executor = None
+
+def pipeline_enabled() -> bool:
+    return PIPELINE_WORKERS > 0
+
+def _get_executors():
+    global _early_executor, _late_executor
+    if _early_executor is None:
+        _early_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS)
+    if _late_executor is None:
+        # 処理中の文の後半のステージが先行する文の前半のステージの後ろで待たされないよう、別のスレッドで実行する
+        _late_executor = ThreadPoolExecutor(max_workers=2)
+    return _early_executor, _late_executor
+
+def submit_stage_graph(executor, stages: dict) -> Future:
+    '''
+    依存関係を持つステージを、依存先がすべて終わったものから順にexecutorへ投入する。
+    スレッド内で他のステージの終了を待たないため、同じexecutorを複数の文で共有してもデッドロックしない。
+    - stages : {ステージ名: (関数, 依存先のステージ名のタプル)} 関数はそれまでの結果の辞書を受け取る
+    - return : (結果の辞書, {ステージ名: (開始時刻, 終了時刻)}) を値とするFuture
+    '''
+    done = Future()
+    results = {}
+    timings = {}
+    waiting = {name: set(deps) for name, (func, deps) in stages.items()}
+    lock = threading.Lock()
+
+    def run(name):
+        start = time.perf_counter()
+        value = stages[name][0](results)
+        timings[name] = (start, time.perf_counter())
+        return value
+
+    def submit(names):
+        for name in names:
+            executor.submit(run, name).add_done_callback(lambda future, name=name: on_done(name, future))
+
+    def on_done(name, future):
+        with lock:
+            if done.done():
+                return
+            if future.exception() is not None:
+                done.set_exception(future.exception())
+                return
+            results[name] = future.result()
+            ready = []
+            for other, deps in waiting.items():
+                if name in deps:
+                    deps.discard(name)
+                    if not deps:
+                        ready.append(other)
+            if len(results) == len(stages):
+                done.set_result((results, timings))
+        submit(ready)
+
+    ready = [name for name, deps in waiting.items() if not deps]
+    for name in ready:
+        del waiting[name]
+    submit(ready)
+    return done
+
+def critical_path(timings: dict, dependencies: dict = SENTENCE_STAGE_DEPENDENCIES):
+    '''
+    ステージの所要時間と依存関係から、クリティカルパス(依存関係による最短の所要時間)を求める。
+    - timings : {ステージ名: (開始時刻, 終了時刻)}
+    - return : (所要時間(秒), [ステージ名, ...])
+    '''
+    longest = {}
+    for name, deps in dependencies.items():
+        if name not in timings:
+            continue
+        start, end = timings[name]
+        before = max((longest[d] for d in deps if d in longest), key=lambda x: x[0], default=(0.0, []))
+        longest[name] = (before[0] + (end - start), before[1] + [name])
+    return max(longest.values(), key=lambda x: x[0], default=(0.0, []))
+
+def start_sentence_pipeline(sentences, analysis_stages):
+    '''
+    文書内の文の前半のステージを、先頭から先行数の分だけ開始する。
+    - sentences : process_sentenceに渡される順の文のリスト(同じ文は最初の1回のみ解析する)
+    - analysis_stages : 文から (ステージの辞書, 結果をまとめる関数) を返す関数
+    '''
+    global _analysis_stages
+    clear_sentence_pipeline()
+    _analysis_stages = analysis_stages
+    for sentence in dict.fromkeys(sentences):
+        _pipeline.append({"sentence": sentence, "future": None})
+        _pipeline_sentences.add(sentence)
+    _fill_pipeline()
+
+def _fill_pipeline():
+    '''
+    解析待ちの先頭から先行数の分の文のうち、まだ開始していないものの前半のステージを開始する。
+    '''
+    lookahead = PIPELINE_LOOKAHEAD or PIPELINE_WORKERS
+    for i, entry in enumerate(_pipeline):
+        if i >= lookahead:
+            break
+        if entry["future"] is None:
+            _start_entry(entry)
+
+def _start_entry(entry: dict):
+    executor, _ = _get_executors()
+    stages, assemble = _analysis_stages(entry["sentence"])
+    entry["future"] = _chain(submit_stage_graph(executor, stages), assemble)
+
+def _chain(graph: Future, assemble) -> Future:
+    chained = Future()
+
+    def on_done(future):
+        if future.exception() is not None:
+            chained.set_exception(future.exception())
+        else:
+            results, timings = future.result()
+            chained.set_result((assemble(results), timings))
+
+    graph.add_done_callback(on_done)
+    return chained
+
+def take_pipelined_analysis(sentence: str):
+    '''
+    文の前半のステージの結果を待って取り出し、続く文の前半のステージを開始する。
+    - return : (解析結果, {ステージ名: (開始時刻, 終了時刻)})。文が解析待ちに無い場合はNone
+    '''
+    if sentence not in _pipeline_sentences:
+        return None
+    while _pipeline and _pipeline[0]["sentence"] != sentence:
+        _pipeline_sentences.discard(_pipeline.popleft()["sentence"])
+    entry = _pipeline.popleft()
+    _pipeline_sentences.discard(sentence)
+    if entry["future"] is None:
+        _start_entry(entry)
+    _fill_pipeline()
+    return entry["future"].result()
+
+def clear_sentence_pipeline():
+    '''
+    解析待ちの文をすべて削除する(開始済みの解析の結果は破棄される)。
+    '''
+    _pipeline.clear()
+    _pipeline_sentences.clear()
+
+def run_late_stages(stage_functions: dict):
+    '''
+    ノード生成後の後半のステージ(因果関係・説明関係の問い合わせ)を並行に実行する。
+    - stage_functions : {ステージ名: 引数なしの関数}
+    - return : ({ステージ名: 戻り値}, {ステージ名: (開始時刻, 終了時刻)})
+    '''
+    _, executor = _get_executors()
+    stages = {name: (lambda results, func=func: func(), ()) for name, func in stage_functions.items()}
+    return submit_stage_graph(executor, stages).result()
+
+def record_sentence_schedule(sentence: str, timings: dict):
+    '''
+    文のステージの所要時間からクリティカルパスを求めてログに出力し、集計に加える。
+    '''
+    latency, path = critical_path(timings)
+    observed = max(end for start, end in timings.values()) - min(start for start, end in timings.values())
+    log_to_file(f"[SCHEDULE] critical path {latency:.3f}s ({' -> '.join(path)}), observed {observed:.3f}s")
+    with _stats_lock:
+        _schedule_stats["sentences"] += 1
+        _schedule_stats["critical_path"] += latency
+        _schedule_stats["observed"] += observed
+        for name, (start, end) in timings.items():
+            _schedule_stats["stages"][name] = _schedule_stats["stages"].get(name, 0.0) + (end - start)
+
+def get_schedule_stats() -> dict:
+    '''
+    スケジューラで処理した文の数と、クリティカルパス・実際の所要時間・ステージごとの所要時間の合計(秒)を返す。
+    '''
+    with _stats_lock:
+        return dict(_schedule_stats, stages=dict(_schedule_stats["stages"]))
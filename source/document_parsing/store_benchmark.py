@@ -0,0 +1,230 @@
+# store_benchmark.py
+# ノード・エッジの管理(node_maker・edge_maker)の処理時間を、グラフの規模を変えて計測するベンチマーク
+# LLMは呼び出さず、合成したノード・エッジを追加しながら、各規模でのエッジ生成1件あたりの時間と、
+# 項目の確定で行うエッジの検索(重複の確認、項目のノードに接続するエッジの取得)1回あたりの時間と、
+# 文書の終了時に行う文書ごとのノード・エッジの取得1回あたりの時間を計測する。
+# --exclusion を指定した場合は、エッジ数が--graph-edgesの合成グラフで、項目の確定時に除外条件に該当するノードを求める時間を、
+# 全エッジを走査する場合とエッジの追加時に記録した集合を参照する場合で比較する。
+# --memory を指定した場合は、ノード・エッジ1件あたりのメモリ使用量を、dictで保持する場合とレコード(compact_records.py)で保持する場合で比較する。
+# ノード・エッジのグローバルな状態を変更するため、パイプラインとは別のプロセスで実行する。
+#
+# 実行例:
+#   python -m source.document_parsing.store_benchmark --sizes 1000,10000,100000 --edges 2000
+#   python -m source.document_parsing.store_benchmark --exclusion --graph-edges 100000
+#   python -m source.document_parsing.store_benchmark --memory --records 100000
+
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+from source.document_parsing import logger, node_maker
+from source.document_parsing.node_maker import append_category_info, append_entity_info, append_predicate_structure
+from source.document_parsing.node_maker import get_nodes_by_indexes
+from source.document_parsing.edge_maker import append_edge_info, get_edge, has_edge, edges_touching, get_edges_by_indexes, is_excluded_target, EXCLUDE_RELATION_TARGETS
+from source.document_parsing.compact_records import to_node_record, to_edge_record
+
+MEMORY_VOCABULARY = 500  # メモリの計測で用いる合成テキストの種類の数(実データと同様にテキストは繰り返し現れる)
+
+def grow_graph(node_count: int, rng: random.Random):
+    '''
+    ノードの総数がnode_countになるまで、文書1件分程度のまとまりで合成したノードとエッジを追加する。
+    '''
+    while node_maker.index_number_node <= node_count:
+        category_index = append_category_info(key=f"項目{node_maker.index_number_node}", level=1)
+        predicate_indexes = append_predicate_structure([f"発生(述語) 配管{i}(ガ格) 急に(修飾)" for i in range(rng.randint(1, 4))])
+        for predicate_index in predicate_indexes:
+            entity_index = append_entity_info(f"配管{predicate_index}")
+            append_edge_info("sub", category_index, predicate_index)
+            append_edge_info("agent", predicate_index, entity_index)
+
+def measure_edge_creation(edge_count: int, rng: random.Random) -> float:
+    '''
+    既存のノードの間にエッジをedge_count件生成し、1件あたりの時間(マイクロ秒)を返す。
+    '''
+    last_index = node_maker.index_number_node - 1
+    pairs = [(rng.randint(1, last_index), rng.randint(1, last_index)) for _ in range(edge_count)]
+    started_at = time.perf_counter()
+    for from_index, to_index in pairs:
+        append_edge_info("benchmark", from_index, to_index)
+    return (time.perf_counter() - started_at) / edge_count * 1e6
+
+def measure_edge_queries(query_count: int, rng: random.Random, item_size: int = 8) -> float:
+    '''
+    連続したitem_size個のノード(1つの項目に相当)に対するエッジの検索をquery_count回行い、1回あたりの時間(マイクロ秒)を返す。
+    '''
+    last_index = node_maker.index_number_node - 1
+    starts = [rng.randint(1, max(1, last_index - item_size)) for _ in range(query_count)]
+    started_at = time.perf_counter()
+    for start in starts:
+        item_nodes = range(start, start + item_size)
+        has_edge("explain_cause", start, start + 1)
+        edges_touching(item_nodes)
+    return (time.perf_counter() - started_at) / query_count * 1e6
+
+def measure_document_views(query_count: int, rng: random.Random, document_size: int = 300) -> float:
+    '''
+    連続したdocument_size個のインデックス(1つの文書で生成したノード・エッジに相当)から、文書ごとのノード・エッジを
+    取得する処理をquery_count回行い、1回あたりの時間(マイクロ秒)を返す。
+    '''
+    last_index = node_maker.index_number_node - 1
+    starts = [rng.randint(1, max(1, last_index - document_size)) for _ in range(query_count)]
+    started_at = time.perf_counter()
+    for start in starts:
+        doc_created_indexes = set(range(start, start + document_size))
+        for node_type in node_maker.NODE_TYPES:
+            get_nodes_by_indexes(doc_created_indexes, node_type)
+        get_edges_by_indexes(doc_created_indexes)
+    return (time.perf_counter() - started_at) / query_count * 1e6
+
+def run_benchmark(sizes, edge_count: int, seed: int = 0) -> list:
+    '''
+    ノードの総数を小さい順に増やしながら、各規模でのエッジ生成の時間を計測する。
+    - sizes : ノードの総数のリスト
+    - return : [{"nodes", "edges", "edge_creation_us", "edge_query_us", "document_view_us"}, ...]
+    '''
+    # ログの書き込みは規模によらず一定の時間がかかるため、破棄する
+    logger.LOG_FILE_PATH = os.devnull
+    rng = random.Random(seed)
+    results = []
+    for size in sorted(sizes):
+        grow_graph(size, rng)
+        edge_creation_us = measure_edge_creation(edge_count, rng)
+        edge_query_us = measure_edge_queries(edge_count, rng)
+        document_view_us = measure_document_views(max(1, edge_count // 10), rng)
+        results.append({"nodes": node_maker.index_number_node - 1, "edges": len(get_edge()), "edge_creation_us": edge_creation_us,
+                        "edge_query_us": edge_query_us, "document_view_us": document_view_us})
+    return results
+
+def measure_exclusion(graph_edges: int, item_count: int, seed: int = 0, item_size: int = 8) -> dict:
+    '''
+    エッジ数がgraph_edgesになるまで合成グラフを作成し(一部のノードは除外条件に該当する関係の終端ノードとする)、
+    項目(連続したitem_size個のノード)ごとに除外するノードを求める時間を、全エッジを走査する場合と記録した集合を参照する場合で計測する。
+    - return : {"edges", "items", "scan_us", "incremental_us"} (時間は項目1件あたりのマイクロ秒)
+    '''
+    logger.LOG_FILE_PATH = os.devnull
+    rng = random.Random(seed)
+    exclude_types = sorted(EXCLUDE_RELATION_TARGETS)
+    while len(get_edge()) < graph_edges:
+        grow_graph(node_maker.index_number_node + 100, rng)
+        last_index = node_maker.index_number_node - 1
+        for _ in range(10):
+            append_edge_info(rng.choice(exclude_types), rng.randint(1, last_index), rng.randint(1, last_index))
+
+    last_index = node_maker.index_number_node - 1
+    items = [list(range(start, start + item_size)) for start in (rng.randint(1, last_index - item_size) for _ in range(item_count))]
+
+    # (1) 全エッジを走査して除外条件に該当する関係の終端ノードを求める(従来の方法)
+    started_at = time.perf_counter()
+    scanned = []
+    for item_indexes in items:
+        excluded_nodes = set()
+        for e in get_edge():
+            if e["type"] in EXCLUDE_RELATION_TARGETS:
+                excluded_nodes.add(e["to"])
+        scanned.append({idx for idx in item_indexes if idx in excluded_nodes})
+    scan_us = (time.perf_counter() - started_at) / item_count * 1e6
+
+    # (2) エッジの追加時に記録した集合を参照する
+    started_at = time.perf_counter()
+    incremental = [{idx for idx in item_indexes if is_excluded_target(idx)} for item_indexes in items]
+    incremental_us = (time.perf_counter() - started_at) / item_count * 1e6
+
+    if scanned != incremental:
+        raise RuntimeError("excluded nodes differ between the full scan and the maintained set")
+    return {"edges": len(get_edge()), "items": item_count, "scan_us": scan_us, "incremental_us": incremental_us}
+
+def _synthetic_record(kind: str, i: int, rng: random.Random) -> dict:
+    '''
+    メモリの計測用のノード・エッジのdictを作成する。テキストは解析結果と同様に毎回新しい文字列として作成する。
+    '''
+    word = f"配管{rng.randrange(MEMORY_VOCABULARY)}"
+    if kind == "category":
+        return {'index': i, 'hierarchical_level': 1, 'category_type': "".join(['項目', '名']), 'category_title': f"{word}の破損"}
+    if kind == "entity":
+        return {'index': i, 'hierarchical_level': 0, 'entity': f"{word}"}
+    if kind == "predicate":
+        return {'index': i, 'hierarchical_level': 0, 'agent_argument': f"{word}(ガ格)", 'predicate': "".join(['破損', '(述語)']),
+                'argument': [f"{word}(ヲ格)", f"工場{rng.randrange(MEMORY_VOCABULARY)}(デ格)"], 'modifier': ""}
+    return {'index': i, 'type': "".join(['explain_', 'details']), 'from': rng.randrange(1, 10 ** 6), 'to': rng.randrange(1, 10 ** 6)}
+
+def measure_record_memory(count: int, seed: int = 0) -> list:
+    '''
+    ノードの種類・エッジごとにcount件を保持した場合の1件あたりのメモリ使用量(バイト)を、dictとレコードで比較する。
+    - return : [{"kind", "dict_bytes", "record_bytes"}, ...]
+    '''
+    results = []
+    for kind in ("category", "entity", "predicate", "edge"):
+        result = {"kind": kind}
+        for mode in ("dict", "record"):
+            rng = random.Random(seed)
+            tracemalloc.start()
+            records = []
+            for i in range(count):
+                record = _synthetic_record(kind, i, rng)
+                if mode == "record":
+                    record = to_edge_record(record) if kind == "edge" else to_node_record(kind, record)
+                records.append(record)
+            result[f"{mode}_bytes"] = tracemalloc.get_traced_memory()[0] / count
+            tracemalloc.stop()
+            del records
+        results.append(result)
+    return results
+
+def format_memory_report(results) -> str:
+    '''
+    ノード・エッジ1件あたりのメモリ使用量の比較を表形式の文字列にする。
+    '''
+    lines = [f"{'kind':<10} {'dict_B':>8} {'record_B':>9} {'ratio':>6}"]
+    lines.append("-" * len(lines[0]))
+    for result in results:
+        ratio = result["record_bytes"] / result["dict_bytes"] if result["dict_bytes"] else 0.0
+        lines.append(f"{result['kind']:<10} {result['dict_bytes']:>8.1f} {result['record_bytes']:>9.1f} {ratio:>6.2f}")
+    return "\n".join(lines)
+
+def format_report(results) -> str:
+    '''
+    規模ごとの結果を表形式の文字列にする。最小の規模を基準とした比も付ける。
+    '''
+    lines = [f"{'nodes':>9} {'edges':>9} {'edge_us':>9} {'ratio':>7} {'query_us':>9} {'ratio':>7} {'doc_us':>9} {'ratio':>7}"]
+    lines.append("-" * len(lines[0]))
+    base = results[0] if results else None
+    for result in results:
+        ratio = result["edge_creation_us"] / base["edge_creation_us"] if base["edge_creation_us"] else 0.0
+        query_ratio = result["edge_query_us"] / base["edge_query_us"] if base["edge_query_us"] else 0.0
+        document_ratio = result["document_view_us"] / base["document_view_us"] if base["document_view_us"] else 0.0
+        lines.append(f"{result['nodes']:>9} {result['edges']:>9} {result['edge_creation_us']:>9.2f} {ratio:>7.2f} "
+                     f"{result['edge_query_us']:>9.2f} {query_ratio:>7.2f} {result['document_view_us']:>9.2f} {document_ratio:>7.2f}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="ノード・エッジの管理の処理時間のグラフの規模による変化")
+    parser.add_argument("--sizes", default="1000,10000,50000,100000", help="計測するノードの総数(カンマ区切り)")
+    parser.add_argument("--edges", type=int, default=2000, help="各規模で生成して計測するエッジの数(エッジの検索の回数も同じ)")
+    parser.add_argument("--seed", type=int, default=0, help="合成データの乱数のシード")
+    parser.add_argument("--exclusion", action="store_true", help="処理時間の代わりに、項目の確定時に除外するノードを求める時間を比較する")
+    parser.add_argument("--graph-edges", type=int, default=100000, help="除外するノードの計測に用いる合成グラフのエッジ数")
+    parser.add_argument("--items", type=int, default=200, help="除外するノードの計測で確定する項目の数")
+    parser.add_argument("--memory", action="store_true", help="処理時間の代わりに、ノード・エッジ1件あたりのメモリ使用量を比較する")
+    parser.add_argument("--records", type=int, default=100000, help="メモリの計測でノードの種類・エッジごとに作成する件数")
+    parser.add_argument("--output", default=None, help="結果をJSONで保存するファイル")
+    args = parser.parse_args()
+
+    if args.exclusion:
+        results = measure_exclusion(args.graph_edges, args.items, args.seed)
+        speedup = results["scan_us"] / results["incremental_us"] if results["incremental_us"] else 0.0
+        print(f"edges={results['edges']} items={results['items']} full_scan={results['scan_us']:.1f}us/item "
+              f"maintained_set={results['incremental_us']:.2f}us/item ({speedup:.0f}x)")
+    elif args.memory:
+        results = measure_record_memory(args.records, args.seed)
+        print(format_memory_report(results))
+    else:
+        results = run_benchmark([int(size) for size in args.sizes.split(",") if size.strip()], args.edges, args.seed)
+        print(format_report(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
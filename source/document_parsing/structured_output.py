@@ -0,0 +1,381 @@
+# structured_output.py
+# 抽出ステージの応答をJSONスキーマに従った構造化出力(短いキー名のJSON)として受け取るモジュール
+# 応答は1回のjson.loadsで解析し、スキーマに合わない場合はその呼び出しのみを再質問する。
+# 再質問しても不正な場合は、そのステージのみ従来のテキスト形式の抽出に切り替える。
+
+import json
+import threading
+from source.document_parsing.logger import log_to_file
+from source.document_parsing.llm_request import request_chat_completion, freeze_messages, extend_prefix
+from source.document_parsing.llm_client import get_client
+from source.document_parsing.text_utils import fix_predicate_structure_text
+from source.document_parsing.time_and_place_extraction import (
+    TIME_AND_PLACE_PREFIX, build_time_and_place_messages, parse_time_and_place, extract_time_and_place, expand_place_expression
+)
+from source.document_parsing.predicate_extraction import (
+    PREDICATE_PREFIX, STRUCTURE_PREFIX, build_predicate_messages, build_structure_messages,
+    parse_predicates, parse_structures, extract_predicates, extract_entity_and_predicate_structures
+)
+from source.document_parsing.causal_relationship_extraction import (
+    CAUSAL_PREFIX, build_causal_messages, parse_causal_relations, apply_causal_relations, extract_causal_relationship
+)
+from source.document_parsing.detailed_info_relationship_extraction import (
+    EXPLAIN_DETAILS_PREFIX, build_explain_details_messages, parse_explain_details_relations,
+    apply_explain_details_relations, extract_explain_details_relationship
+)
+
+client = get_client()
+
+STRUCTURED_REASK_ATTEMPTS = 1  # スキーマに合わない応答に対して再質問する最大回数
+REASK_PREFIX = "直前の出力は"   # 再質問のメッセージの書き出し(スタブサーバでの判定にも使用する)
+
+_string_list = {"type": "array", "items": {"type": "string"}}
+
+def _object_schema(properties: dict) -> dict:
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+# ステージごとのJSONスキーマ。出力トークン数を抑えるためキー名は1文字とする
+STRUCTURED_SCHEMAS = {
+    # t : 時間表現, p : 場所表現
+    "time_and_place_json": _object_schema({"t": _string_list, "p": _string_list}),
+    # e : 事象述語, c : 概念述語
+    "predicates_json": _object_schema({"e": _string_list, "c": _string_list}),
+    # s : 述語項構造, n : エンティティ
+    "predicate_structures_json": _object_schema({"s": _string_list, "n": _string_list}),
+    # r : 因果関係 (c : 原因ノード, e : 結果ノード, l : 種類, k : 手がかり表現)
+    "causal_relationship_json": _object_schema({"r": {"type": "array", "items": _object_schema({
+        "c": {"type": "integer"}, "e": {"type": "integer"},
+        "l": {"type": "string", "enum": ["cause", "reason"]}, "k": {"type": "string"}
+    })}}),
+    # r : 説明関係 (d : 被説明ノード, x : 説明ノード, t : 説明対象)
+    "explain_details_json": _object_schema({"r": {"type": "array", "items": _object_schema({
+        "d": {"type": "integer"}, "x": {"type": "integer"}, "t": {"type": "string"}
+    })}}),
+}
+
+# 従来の出力形式の代わりにJSONで出力させるための指示
+STRUCTURED_INSTRUCTIONS = {
+    "time_and_place_json": (
+        "出力は上記の形式の代わりに、次のキーを持つJSONオブジェクトのみとする。該当する表現が無い場合は空の配列とする。\n"
+        "t : 時間表現の配列\n"
+        "p : 場所表現の配列"
+    ),
+    "predicates_json": (
+        "出力は上記の形式の代わりに、次のキーを持つJSONオブジェクトのみとする。該当する述語が無い場合は空の配列とする。\n"
+        "e : 事象述語の配列\n"
+        "c : 概念述語の配列"
+    ),
+    "predicate_structures_json": (
+        "出力は上記の形式の代わりに、次のキーを持つJSONオブジェクトのみとする。該当するものが無い場合は空の配列とする。\n"
+        "s : 述語項構造の配列(各要素は「述語(述語), 項(格)」の形式の文字列)\n"
+        "n : エンティティの配列"
+    ),
+    "causal_relationship_json": (
+        "出力は上記の形式の代わりに、次のキーを持つJSONオブジェクトのみとする。因果関係が無い場合は空の配列とする。\n"
+        "r : 因果関係の配列。各要素は {\"c\": 原因ノードのindex, \"e\": 結果ノードのindex, \"l\": \"cause\" または \"reason\", \"k\": 手がかり表現}"
+    ),
+    "explain_details_json": (
+        "出力は上記の形式の代わりに、次のキーを持つJSONオブジェクトのみとする。説明関係が無い場合は空の配列とする。\n"
+        "r : 説明関係の配列。各要素は {\"d\": 被説明ノードのindex, \"x\": 説明ノードのindex, \"t\": 説明対象}"
+    ),
+}
+
+REASK_MESSAGE = REASK_PREFIX + "指定されたJSONスキーマに従っていない({error})。同じ入力に対して、スキーマに従ったJSONオブジェクトのみを出力し直してください。"
+
+_stats_lock = threading.Lock()
+_structured_stats = {}  # {stage: {"calls": n, "reasks": n, "fallbacks": n}}
+
+def _dump_compact(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def _time_and_place_to_json(content: str) -> str:
+    time_and_place = parse_time_and_place(content, "")
+    return _dump_compact({"t": time_and_place["time"], "p": time_and_place["place"]})
+
+def _predicates_to_json(content: str) -> str:
+    event_predicates, entity_predicates = parse_predicates(content)
+    return _dump_compact({"e": event_predicates, "c": entity_predicates})
+
+def _structures_to_json(content: str) -> str:
+    structures, entities = parse_structures(content)
+    return _dump_compact({"s": structures, "n": entities})
+
+def _causal_to_json(content: str) -> str:
+    relations = parse_causal_relations(content)
+    return _dump_compact({"r": [{"c": c, "e": e, "l": l, "k": k} for c, e, l, k in relations]})
+
+def _explain_details_to_json(content: str) -> str:
+    relations = parse_explain_details_relations(content)
+    return _dump_compact({"r": [{"d": d, "x": x, "t": t} for d, x, t in relations]})
+
+def _build_structured_prefix(stage: str, prefix, convert) -> tuple:
+    '''
+    従来の固定部分から構造化出力用の固定部分を生成する。
+    指示の直後に出力形式の指示を追加し、少数ショットの例の応答をJSONに変換する。
+    - stage : 構造化出力のステージ名
+    - prefix : 従来の固定部分(システムプロンプト、指示、少数ショットの例)
+    - convert : 例の応答テキストをJSON文字列に変換する関数
+    '''
+    messages = [dict(m) for m in prefix[:2]]
+    messages.append({"role": "user", "content": STRUCTURED_INSTRUCTIONS[stage]})
+    for m in prefix[2:]:
+        if m["role"] == "assistant":
+            messages.append({"role": "assistant", "content": convert(m["content"])})
+        else:
+            messages.append(dict(m))
+    return freeze_messages(messages)
+
+# 固定部分はモジュール読み込み時に一度だけ組み立てる
+STRUCTURED_PREFIXES = {
+    "time_and_place_json": _build_structured_prefix("time_and_place_json", TIME_AND_PLACE_PREFIX, _time_and_place_to_json),
+    "predicates_json": _build_structured_prefix("predicates_json", PREDICATE_PREFIX, _predicates_to_json),
+    "predicate_structures_json": _build_structured_prefix("predicate_structures_json", STRUCTURE_PREFIX, _structures_to_json),
+    "causal_relationship_json": _build_structured_prefix("causal_relationship_json", CAUSAL_PREFIX, _causal_to_json),
+    "explain_details_json": _build_structured_prefix("explain_details_json", EXPLAIN_DETAILS_PREFIX, _explain_details_to_json),
+}
+
+def build_response_format(stage: str) -> dict:
+    '''
+    chat.completionsに渡すresponse_format(strictなJSONスキーマ)を生成する。
+    '''
+    return {"type": "json_schema", "json_schema": {"name": stage, "strict": True, "schema": STRUCTURED_SCHEMAS[stage]}}
+
+def build_structured_messages(stage: str, text_messages: list) -> list:
+    '''
+    従来のメッセージの可変部分(末尾のメッセージ)を構造化出力用の固定部分の後ろに追加する。
+    '''
+    return extend_prefix(STRUCTURED_PREFIXES[stage], text_messages[-1])
+
+def validate_json(value, schema: dict, path: str = "$"):
+    '''
+    STRUCTURED_SCHEMASで用いる範囲(object, array, string, integer, enum)でJSONの値を検証する。
+    - return : スキーマに合わない場合はその箇所を示すメッセージ、合う場合はNone
+    '''
+    expected = schema.get("type")
+    if expected == "object":
+        if not isinstance(value, dict):
+            return f"{path} がオブジェクトではない"
+        for key in schema.get("required", []):
+            if key not in value:
+                return f"{path}.{key} が無い"
+        if schema.get("additionalProperties") is False:
+            extra = [key for key in value if key not in schema["properties"]]
+            if extra:
+                return f"{path} に不要なキー {extra} がある"
+        for key, sub_schema in schema["properties"].items():
+            if key in value:
+                error = validate_json(value[key], sub_schema, f"{path}.{key}")
+                if error:
+                    return error
+    elif expected == "array":
+        if not isinstance(value, list):
+            return f"{path} が配列ではない"
+        for i, item in enumerate(value):
+            error = validate_json(item, schema["items"], f"{path}[{i}]")
+            if error:
+                return error
+    elif expected == "string":
+        if not isinstance(value, str):
+            return f"{path} が文字列ではない"
+    elif expected == "integer":
+        if not isinstance(value, int) or isinstance(value, bool):
+            return f"{path} が整数ではない"
+    if "enum" in schema and value not in schema["enum"]:
+        return f"{path} の値 {value!r} が {schema['enum']} のいずれでもない"
+    return None
+
+def parse_structured_response(content: str, stage: str, check=None):
+    '''
+    応答をjson.loadsで読み込み、スキーマと追加の検証関数で検証する。
+    - check : 検証済みのJSONを受け取り、不正な場合はメッセージを返す関数(ノード番号の確認など)
+    - return : (JSONの値, エラーメッセージ) どちらか一方はNone
+    '''
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        return None, f"JSONとして解析できない: {e.msg}"
+    error = validate_json(data, STRUCTURED_SCHEMAS[stage])
+    if error is None and check is not None:
+        error = check(data)
+    return (None, error) if error else (data, None)
+
+def _count(stage: str, kind: str):
+    with _stats_lock:
+        stats = _structured_stats.setdefault(stage, {"calls": 0, "reasks": 0, "fallbacks": 0})
+        stats[kind] += 1
+
+def get_structured_output_stats():
+    '''
+    ステージごとの構造化出力の呼び出し数、再質問数、テキスト形式への切り替え数を返す。
+    '''
+    with _stats_lock:
+        return {stage: dict(stats) for stage, stats in _structured_stats.items()}
+
+def request_structured_output(stage: str, messages: list, check=None):
+    '''
+    構造化出力でchat.completionsを呼び出し、検証済みのJSONを返す。
+    スキーマに合わない場合は、直前の応答とエラーを示してその呼び出しのみを再質問する。
+    - stage : 構造化出力のステージ名 (STRUCTURED_SCHEMASのキー)
+    - messages : build_structured_messagesで生成したメッセージ
+    - check : parse_structured_responseを参照
+    - return : 検証済みのJSONの値。再質問しても不正な場合はNone
+    '''
+    _count(stage, "calls")
+    response_format = build_response_format(stage)
+
+    # (1) 構造化出力で呼び出す
+    content = request_chat_completion(client, stage, messages, response_format=response_format)
+    data, error = parse_structured_response(content, stage, check)
+
+    # (2) 不正な場合はエラーを示して再質問する
+    for _ in range(STRUCTURED_REASK_ATTEMPTS):
+        if error is None:
+            break
+        _count(stage, "reasks")
+        log_to_file(f"[Structured] {stage} : {error} (再質問)")
+        messages = messages + [
+            {"role": "assistant", "content": content},
+            {"role": "user", "content": REASK_MESSAGE.format(error=error)},
+        ]
+        content = request_chat_completion(client, stage, messages, response_format=response_format)
+        data, error = parse_structured_response(content, stage, check)
+
+    if error is not None:
+        _count(stage, "fallbacks")
+        log_to_file(f"[Structured] {stage} : {error} (テキスト形式の抽出に切り替え)")
+        return None
+    return data
+
+def _unique(values) -> list:
+    return list(dict.fromkeys(v for v in values if v))
+
+def _check_node_indexes(node_list: list, keys: tuple):
+    '''
+    関係の各要素が入力のノード番号のみを参照しているかを確認する検証関数を生成する。
+    '''
+    valid_indexes = {n["index"] for n in node_list}
+    def check(data):
+        for i, relation in enumerate(data["r"]):
+            for key in keys:
+                if relation[key] not in valid_indexes:
+                    return f"$.r[{i}].{key} のノード番号 {relation[key]} が入力のノードに無い"
+        return None
+    return check
+
+def time_and_place_from_json(sentence: str, data: dict) -> dict:
+    '''
+    時間・場所表現抽出の構造化出力(検証済みのJSON)をextract_time_and_placeの戻り値の形式に変換する。
+    '''
+    return {
+        "time": _unique(t.strip() for t in data["t"] if t.strip() != "無し"),
+        "place": _unique(expand_place_expression(sentence, p.strip()) for p in data["p"] if p.strip() and p.strip() != "無し")
+    }
+
+def predicates_from_json(data: dict) -> tuple:
+    '''
+    述語抽出の構造化出力(検証済みのJSON)を(事象述語のリスト, 概念述語のリスト)に変換する。
+    '''
+    return [p.strip() for p in data["e"] if p.strip()], [p.strip() for p in data["c"] if p.strip()]
+
+def extract_time_and_place_structured(sentence: str) -> dict:
+    '''
+    extract_time_and_placeの構造化出力版。
+    - return : {"time": [...], "place": [...]}
+    '''
+    try:
+        messages = build_structured_messages("time_and_place_json", build_time_and_place_messages(sentence))
+        data = request_structured_output("time_and_place_json", messages)
+    except Exception as e:
+        print(f"Error extracting time and place (structured): {e}")
+        data = None
+    if data is None:
+        return extract_time_and_place(sentence)
+
+    return time_and_place_from_json(sentence, data)
+
+def extract_predicates_structured(sentence: str) -> tuple:
+    '''
+    extract_predicatesの構造化出力版。
+    - return: (事象述語のリスト, 概念述語のリスト)
+    '''
+    try:
+        messages = build_structured_messages("predicates_json", build_predicate_messages(sentence))
+        data = request_structured_output("predicates_json", messages)
+    except Exception as e:
+        print(f"Error extracting predicates (structured): {e}")
+        data = None
+    if data is None:
+        return extract_predicates(sentence)
+
+    return predicates_from_json(data)
+
+def extract_entity_and_predicate_structures_structured(sentence: str, event_predicates: list, entity_predicates: list, time_list: list, place_list: list) -> tuple:
+    '''
+    extract_entity_and_predicate_structuresの構造化出力版。
+    - return : (述語項構造リスト, エンティティリスト)
+    '''
+    try:
+        messages = build_structured_messages(
+            "predicate_structures_json",
+            build_structure_messages(sentence, event_predicates, entity_predicates, time_list, place_list)
+        )
+        data = request_structured_output("predicate_structures_json", messages)
+    except Exception as e:
+        print(f"Error extracting entity and predicate structures (structured): {e}")
+        data = None
+    if data is None:
+        return extract_entity_and_predicate_structures(sentence, event_predicates, entity_predicates, time_list, place_list)
+
+    predicate_argument_structures = [fix_predicate_structure_text(s.strip()) for s in data["s"] if s.strip()]
+    entities = [n.strip() for n in data["n"] if n.strip()]
+    return predicate_argument_structures, entities
+
+def request_causal_relations_structured(sentence, node_list):
+    '''
+    因果関係を構造化出力で問い合わせ、apply_causal_relationsに渡せる形式で返す(エッジは生成しない)。
+    構造化出力が得られなかった場合はNoneを返す。
+    '''
+    try:
+        messages = build_structured_messages("causal_relationship_json", build_causal_messages(sentence, node_list))
+        data = request_structured_output("causal_relationship_json", messages, _check_node_indexes(node_list, ("c", "e")))
+    except Exception as e:
+        print(f"Error extracting causal relation (structured): {e}")
+        data = None
+    if data is None:
+        return None
+    return [(r["c"], r["e"], r["l"], r["k"]) for r in data["r"]]
+
+def request_explain_details_relations_structured(sentence, node_list):
+    '''
+    説明関係を構造化出力で問い合わせ、apply_explain_details_relationsに渡せる形式で返す(エッジは生成しない)。
+    構造化出力が得られなかった場合はNoneを返す。
+    '''
+    try:
+        messages = build_structured_messages("explain_details_json", build_explain_details_messages(sentence, node_list))
+        data = request_structured_output("explain_details_json", messages, _check_node_indexes(node_list, ("d", "x")))
+    except Exception as e:
+        print(f"Error extracting explanation relation (structured): {e}")
+        data = None
+    if data is None:
+        return None
+    return [(r["d"], r["x"], r["t"]) for r in data["r"]]
+
+def extract_causal_relationship_structured(sentence, node_list, doc_created_indexes):
+    '''
+    extract_causal_relationshipの構造化出力版。入力に無いノード番号を含む応答は再質問の対象とする。
+    '''
+    relations = request_causal_relations_structured(sentence, node_list)
+    if relations is None:
+        return extract_causal_relationship(sentence, node_list, doc_created_indexes)
+
+    apply_causal_relations(relations, doc_created_indexes)
+
+def extract_explain_details_relationship_structured(sentence, node_list, doc_created_indexes):
+    '''
+    extract_explain_details_relationshipの構造化出力版。入力に無いノード番号を含む応答は再質問の対象とする。
+    '''
+    relations = request_explain_details_relations_structured(sentence, node_list)
+    if relations is None:
+        return extract_explain_details_relationship(sentence, node_list, doc_created_indexes)
+
+    apply_explain_details_relations(relations, doc_created_indexes)
@@ -0,0 +1,437 @@
+# stub_server.py
+# chat.completionsと互換のAPIを持つローカルのスタブサーバ
+# 実際のAPIを使わずにパイプライン全体(CPU側の処理や並行実行)の負荷試験を行うために用いる。
+#
+# 起動例:
+#   python -m source.document_parsing.stub_server --port 8000 --latency lognormal:-0.7,0.5 --error-rate 0.02
+# パイプライン側:
+#   OPENAI_API_KEY=dummy python source/document_parsing/main.py --input test.json --base-url http://127.0.0.1:8000/v1
+
+import argparse
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from source.document_parsing.llm_cache import make_cache_key
+from source.document_parsing.text_utils import estimate_token_count
+
+DEFAULT_LATENCY = "fixed:0"
+DEFAULT_ERROR_STATUSES = (429, 500, 503)
+REPLAY_BASE_URL = "https://api.openai.com/v1"  # --replay-dbの応答を記録した接続先の既定値(OpenAI APIの既定の接続先)
+MULTI_SENTENCE_PREFIX = "以下の複数の文それぞれについて"
+REASK_PREFIX = "直前の出力は"  # structured_outputの再質問のメッセージの書き出し
+
+# システムプロンプトに含まれる文字列からステージを判定する(上から順に照合する)
+STAGE_MARKERS = [
+    ("time and place expressions, predicates", "fused_extraction"),
+    ("time and place expressions", "time_and_place"),
+    ("extracts predicates from", "predicates"),
+    ("predicate-argument structures", "predicate_structures"),
+    ("causal relationships", "causal_relationship"),
+    ("explain details relationships", "explain_details"),
+    ("単語トークンに分割", "tokenize"),
+    ("時間関係を点検", "gpt_inspection"),
+    ("ナレッジグラフ", "entity_relationship"),
+]
+
+_time_pattern = re.compile(r"\d+年\d+月\d+日|\d+年\d+月|\d+月\d+日|\d+年|\d+時\d*分?|午前|午後|深夜|早朝|事故当時|当日|翌日")
+_place_pattern = re.compile(r"[一-龥ァ-ヶーA-Za-z0-9]+(?:工場|駅|現場|倉庫|ビル|施設|会場|プラント|港|空港|トンネル|橋|付近|内)")
+_subject_pattern = re.compile(r"([一-龥ァ-ヶーA-Za-z0-9]+)(?:が|は)")
+_predicate_tail_pattern = re.compile(r"[一-龥ァ-ヶー]*[ぁ-ん]+$")
+_index_pattern = re.compile(r"index:(\d+)")
+_token_run_pattern = re.compile(r"[一-龥々]+|[ぁ-ん]+|[ァ-ヶー]+|[A-Za-z0-9.]+|[^\s]")
+
+def detect_stage(messages, response_format=None) -> str:
+    '''
+    メッセージからパイプラインのどのステージのリクエストかを判定する。
+    構造化出力のリクエストはJSONスキーマの名前(time_and_place_jsonなど)をステージとする。
+    '''
+    if response_format and response_format.get("type") == "json_schema":
+        return response_format.get("json_schema", {}).get("name", "unknown")
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    last = messages[-1].get("content", "") if messages else ""
+    for marker, stage in STAGE_MARKERS:
+        if marker in system:
+            if stage in ("time_and_place", "predicates") and last.startswith(MULTI_SENTENCE_PREFIX):
+                return stage + "_batch"
+            return stage
+    return "unknown"
+
+def _extract_field(text: str, label: str) -> str:
+    m = re.search(rf"^{label}[ \t]*:?[ \t]*(.*)$", text, re.M)
+    return m.group(1).strip() if m else ""
+
+def _original_sentence(text: str) -> str:
+    m = re.search(r"原文:\n(.*?)\n", text)
+    return m.group(1).strip() if m else text.strip()
+
+def synthesize_time_and_place(sentence: str) -> str:
+    times = list(dict.fromkeys(_time_pattern.findall(sentence))) or ["無し"]
+    places = list(dict.fromkeys(_place_pattern.findall(sentence))) or ["無し"]
+    return ", ".join([f"<time : {t}>" for t in times] + [f"<place : {p}>" for p in places])
+
+def _sentence_predicates(sentence: str) -> list:
+    predicates = []
+    for clause in re.split(r"[。！？.;,、]", sentence):
+        m = _predicate_tail_pattern.search(clause.strip())
+        if m and len(m.group(0)) >= 2:
+            predicates.append(m.group(0))
+    return predicates
+
+def synthesize_predicates(sentence: str) -> str:
+    predicates = _sentence_predicates(sentence)
+    event = " ".join(f"({i})<{p}>" for i, p in enumerate(predicates, 1)) or "無し"
+    return f"[事象述語] {event}\n[概念述語] 無し"
+
+def synthesize_structures(sentence: str, event_predicates: list) -> str:
+    subject = _subject_pattern.search(sentence)
+    subject_text = subject.group(1) if subject else "無し"
+    structures = [f"({i}) {p}(述語), {subject_text}(ガ格)" for i, p in enumerate(event_predicates, 1)]
+    entities = [f"({i}) {q}" for i, q in enumerate(re.findall(r"「(.+?)」", sentence), 1)]
+    return "[述語項構造]\n" + ("\n".join(structures) or "無し") + "\n[エンティティ]\n" + ("\n".join(entities) or "無し")
+
+def synthesize_fused(sentence: str) -> str:
+    time_and_place = synthesize_time_and_place(sentence)
+    times = ", ".join(re.findall(r"<time : .*?>", time_and_place))
+    places = ", ".join(re.findall(r"<place : .*?>", time_and_place))
+    predicates = _sentence_predicates(sentence)
+    return (
+        f"[時間表現] {times}\n[場所表現] {places}\n"
+        + synthesize_predicates(sentence) + "\n"
+        + synthesize_structures(sentence, predicates)
+    )
+
+def synthesize_relation(last: str, header: str, label: str) -> str:
+    indexes = _index_pattern.findall(last)
+    if len(indexes) < 2:
+        return f"[{header}]\n無し"
+    if label:
+        return f"[{header}]\n(1) ({indexes[-1]}, {indexes[0]}, '{label}', 'ため')"
+    return f"[{header}]\n(1) ({indexes[0]}, {indexes[-1]}, '詳細')"
+
+def synthesize_tokens(last: str) -> str:
+    lines = []
+    for line in last.splitlines():
+        m = re.match(r"^\((\d+)\)\s*(.*)$", line.strip())
+        if m:
+            tokens = _token_run_pattern.findall(m.group(2))
+            lines.append(f"({m.group(1)}) " + " | ".join(tokens))
+    return "\n".join(lines)
+
+def synthesize_entity_relationship(last: str) -> str:
+    indexes = re.findall(r"\((\d+)\) ", _extract_field(last, "ノード"))
+    if len(indexes) < 2:
+        return "無し"
+    return f"(自動生成エッジ辞書追加)\n(x)-[related_to]→(y) : (y)は(x)に関連する\n(自動生成エッジ)\n({indexes[0]}, {indexes[1]}, related_to)"
+
+def synthesize_multi(last: str, stage: str) -> str:
+    '''
+    複数の文をまとめたリクエスト(マイクロバッチ)に対して、文番号付きの応答を生成する。
+    '''
+    outputs = []
+    if stage == "time_and_place_batch":
+        for number, sentence in re.findall(r"^\[(\d+)\] 文: (.*)$", last, re.M):
+            outputs.append(f"[{number}] {synthesize_time_and_place(sentence)}")
+    else:
+        for number, sentence in re.findall(r"^\[(\d+)\]\n原文:\n(.*)$", last, re.M):
+            outputs.append(f"[{number}]\n{synthesize_predicates(sentence)}")
+    return "\n".join(outputs)
+
+def synthesize_response(stage: str, messages) -> str:
+    '''
+    ステージごとの出力形式に従った、整形式の応答テキストを生成する。
+    '''
+    last = messages[-1].get("content", "") if messages else ""
+    if stage == "time_and_place":
+        return synthesize_time_and_place(last.replace("文: ", "", 1))
+    if stage == "predicates":
+        return synthesize_predicates(_original_sentence(last))
+    if stage in ("time_and_place_batch", "predicates_batch"):
+        return synthesize_multi(last, stage)
+    if stage == "predicate_structures":
+        event_predicates = [p.strip() for p in _extract_field(last, "事象述語").split(",") if p.strip()]
+        return synthesize_structures(_extract_field(last, "文"), event_predicates)
+    if stage == "fused_extraction":
+        return synthesize_fused(_original_sentence(last))
+    if stage == "causal_relationship":
+        return synthesize_relation(last, "CAUSAL_RELATION", "cause")
+    if stage == "explain_details":
+        return synthesize_relation(last, "EXPLAIN_RELATION", "")
+    if stage == "tokenize":
+        return synthesize_tokens(last)
+    if stage == "entity_relationship":
+        return synthesize_entity_relationship(last)
+    return "無し"
+
+def synthesize_structured_response(stage: str, messages) -> str:
+    '''
+    構造化出力のステージに対して、短いキー名のJSONの応答を生成する。
+    再質問のリクエストには、その直前の入力に対する応答を返す。
+    '''
+    last = messages[-1].get("content", "") if messages else ""
+    if last.startswith(REASK_PREFIX) and len(messages) >= 3:
+        last = messages[-3].get("content", "")
+    if stage == "time_and_place_json":
+        sentence = last.replace("文: ", "", 1)
+        data = {"t": list(dict.fromkeys(_time_pattern.findall(sentence))), "p": list(dict.fromkeys(_place_pattern.findall(sentence)))}
+    elif stage == "predicates_json":
+        data = {"e": _sentence_predicates(_original_sentence(last)), "c": []}
+    elif stage == "predicate_structures_json":
+        sentence = _extract_field(last, "文")
+        subject = _subject_pattern.search(sentence)
+        subject_text = subject.group(1) if subject else "無し"
+        event_predicates = [p.strip() for p in _extract_field(last, "事象述語").split(",") if p.strip()]
+        data = {"s": [f"{p}(述語), {subject_text}(ガ格)" for p in event_predicates], "n": re.findall(r"「(.+?)」", sentence)}
+    elif stage in ("causal_relationship_json", "explain_details_json"):
+        indexes = [int(i) for i in _index_pattern.findall(last)]
+        if len(indexes) < 2:
+            data = {"r": []}
+        elif stage == "causal_relationship_json":
+            data = {"r": [{"c": indexes[-1], "e": indexes[0], "l": "cause", "k": "ため"}]}
+        else:
+            data = {"r": [{"d": indexes[0], "x": indexes[-1], "t": "詳細"}]}
+    else:
+        data = {}
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def parse_latency(spec: str):
+    '''
+    遅延の分布の指定を解析し、遅延(秒)を返す関数を生成する。
+    - spec : "fixed:秒", "uniform:最小,最大", "normal:平均,標準偏差", "lognormal:mu,sigma", "exp:平均"
+    '''
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    if kind == "fixed":
+        return lambda: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+class StubConfig:
+    '''
+    スタブサーバの動作設定。
+    - latency : 既定の遅延の分布
+    - stage_latency : ステージごとの遅延の分布 {stage: spec}
+    - model_latency : モデルごとの遅延の分布 {model: spec} (ステージごとの指定が優先される)
+    - token_latency : 応答の1トークンあたりに追加する遅延(秒)
+    - error_rate : エラーを返す確率
+    - error_statuses : 返すエラーのステータスコードの候補
+    - hang_rate : 応答を返さずにhang_seconds待機する確率(タイムアウトの再現)
+    - malformed_rate : 構造化出力のリクエストに途中で切れたJSONを返す確率(再質問の確認用)
+    - replay_db : 指定した場合、LLM応答キャッシュ(SQLite)に記録された応答を優先して返す
+    - replay_base_url : 再生する応答を記録したときの接続先(キャッシュキーに含まれるため)
+    - replay_only : Trueの場合、記録が無いリクエストには404を返す
+    '''
+    def __init__(self, latency=DEFAULT_LATENCY, stage_latency=None, model_latency=None, token_latency=0.0, error_rate=0.0,
+                 error_statuses=DEFAULT_ERROR_STATUSES, hang_rate=0.0, hang_seconds=600.0,
+                 replay_db=None, replay_only=False, seed=None, malformed_rate=0.0, replay_base_url=REPLAY_BASE_URL):
+        self.latency = parse_latency(latency)
+        self.stage_latency = {stage: parse_latency(spec) for stage, spec in (stage_latency or {}).items()}
+        self.model_latency = {model: parse_latency(spec) for model, spec in (model_latency or {}).items()}
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.malformed_rate = malformed_rate
+        self.replay_only = replay_only
+        self.replay_base_url = replay_base_url
+        self.replay_connection = sqlite3.connect(replay_db, check_same_thread=False) if replay_db else None
+        self.replay_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {}  # {stage: {"requests", "replayed", "synthesized", "errors"}}
+        if seed is not None:
+            random.seed(seed)
+
+    def sample_latency(self, stage: str, model: str) -> float:
+        if stage in self.stage_latency:
+            return self.stage_latency[stage]()
+        return self.model_latency.get(model, self.latency)()
+
+    def count(self, stage: str, kind: str):
+        with self.stats_lock:
+            stats = self.stats.setdefault(stage, {"requests": 0, "replayed": 0, "synthesized": 0, "errors": 0})
+            stats[kind] += 1
+
+    def replay(self, stage: str, body: dict):
+        '''
+        LLM応答キャッシュから記録済みの応答を探す。キーはパイプライン側と同じ方法で生成する。
+        '''
+        if self.replay_connection is None:
+            return None
+        params = {key: body[key] for key in ("max_tokens", "response_format") if key in body}
+        cache_key = make_cache_key(
+            stage, body.get("model", ""), body.get("messages", []), base_url=self.replay_base_url,
+            temperature=body.get("temperature", 0.0), **params
+        )
+        with self.replay_lock:
+            row = self.replay_connection.execute(
+                "SELECT content FROM completion_cache WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+def make_completion_body(model: str, content: str, messages) -> dict:
+    '''
+    chat.completionsの応答と同じ形式のJSONを生成する。
+    '''
+    prompt_tokens = sum(estimate_token_count(m.get("content", "")) for m in messages if isinstance(m.get("content"), str))
+    completion_tokens = estimate_token_count(content)
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0}
+        }
+    }
+
+def make_handler(config: StubConfig):
+    '''
+    設定を参照するリクエストハンドラのクラスを生成する。
+    '''
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict, headers=None):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+            elif self.path.rstrip("/").endswith("/stats"):
+                with config.stats_lock:
+                    self._send_json(200, {"stages": config.stats})
+            else:
+                self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                return
+
+            # (1) ステージの判定と遅延
+            messages = body.get("messages", [])
+            response_format = body.get("response_format")
+            stage = detect_stage(messages, response_format)
+            config.count(stage, "requests")
+            time.sleep(config.sample_latency(stage, body.get("model", "")))
+
+            # (2) エラーの注入
+            if config.hang_rate and random.random() < config.hang_rate:
+                time.sleep(config.hang_seconds)
+            if config.error_rate and random.random() < config.error_rate:
+                status = random.choice(config.error_statuses)
+                config.count(stage, "errors")
+                headers = {"Retry-After": "1"} if status == 429 else None
+                self._send_json(status, {"error": {"message": f"injected error ({status})", "type": "stub_error"}}, headers)
+                return
+
+            # (3) 記録済みの応答の再生、または応答の合成
+            content = config.replay(stage, body)
+            if content is not None:
+                config.count(stage, "replayed")
+            elif config.replay_only:
+                config.count(stage, "errors")
+                self._send_json(404, {"error": {"message": f"no recording for stage '{stage}'", "type": "stub_error"}})
+                return
+            elif response_format:
+                content = synthesize_structured_response(stage, messages)
+                if config.malformed_rate and random.random() < config.malformed_rate:
+                    content = content[:len(content) // 2]
+                config.count(stage, "synthesized")
+            else:
+                content = synthesize_response(stage, messages)
+                config.count(stage, "synthesized")
+            if config.token_latency:
+                time.sleep(config.token_latency * estimate_token_count(content))
+            self._send_json(200, make_completion_body(body.get("model", "stub"), content, messages))
+
+    return StubHandler
+
+def start_stub_server(config=None, host="127.0.0.1", port=0):
+    '''
+    スタブサーバを別スレッドで起動する。port=0の場合は空いているポートが割り当てられる。
+    - return : (サーバ, base_url)
+    '''
+    server = ThreadingHTTPServer((host, port), make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def main():
+    parser = argparse.ArgumentParser(description="chat.completions互換のローカルスタブサーバ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default=DEFAULT_LATENCY, help="遅延の分布 (fixed:s, uniform:a,b, normal:m,sd, lognormal:mu,sigma, exp:m)")
+    parser.add_argument("--stage-latency", action="append", default=[], help="ステージごとの遅延の分布 (例: tokenize=fixed:0.05)")
+    parser.add_argument("--model-latency", action="append", default=[], help="モデルごとの遅延の分布 (例: gpt-4o-mini=fixed:0.3)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="応答の1トークンあたりの追加遅延(秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="エラーを返す確率")
+    parser.add_argument("--error-status", default=",".join(str(s) for s in DEFAULT_ERROR_STATUSES), help="返すエラーのステータスコード(カンマ区切り)")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="応答を返さずに待機する確率")
+    parser.add_argument("--hang-seconds", type=float, default=600.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="構造化出力のリクエストに不正なJSONを返す確率")
+    parser.add_argument("--replay-db", default=None, help="記録済みの応答を再生するLLM応答キャッシュ(SQLite)")
+    parser.add_argument("--replay-base-url", default=REPLAY_BASE_URL, help="再生する応答を記録したときの接続先")
+    parser.add_argument("--replay-only", action="store_true", help="記録が無いリクエストには応答を合成せずに404を返す")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        stage_latency=dict(item.split("=", 1) for item in args.stage_latency),
+        model_latency=dict(item.split("=", 1) for item in args.model_latency),
+        token_latency=args.token_latency,
+        error_rate=args.error_rate,
+        error_statuses=[int(s) for s in args.error_status.split(",") if s.strip()],
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        replay_db=args.replay_db,
+        replay_only=args.replay_only,
+        replay_base_url=args.replay_base_url,
+        seed=args.seed,
+        malformed_rate=args.malformed_rate
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"stub server listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
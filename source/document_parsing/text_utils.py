@@ -193,4 +193,12 @@ def fix_predicate_structure_text(structure: str) -> str:
         else:
             fixed_segments.append(seg)
 
-    return ", ".join(fixed_segments)
\ No newline at end of file
+    return ", ".join(fixed_segments)
+
+def estimate_token_count(text: str) -> int:
+    '''
+    トークナイザーを使わずにテキストのトークン数を概算する関数。
+    日本語などの非ASCII文字は1文字を1トークン、ASCII文字は4文字を1トークンとして数える。
+    '''
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
@@ -0,0 +1,202 @@
+# time_and_place_rules.py
+# 正規表現と場所の接尾辞の辞書による規則ベースの時間・場所表現抽出モジュール
+# 明らかな表現(日付、〜時〜分、事故当時、〜工場など)のみを含む文、または表現を含まない文はLLMを呼び出さずに処理し、
+# 判断が難しい手がかり(季節、「〜付近」「〜において」など)を含む文のみをLLM(extract_time_and_place)に回す。
+#
+# LLMとの一致率の評価:
+#   python -m source.document_parsing.time_and_place_rules --input test.json --sample 200
+
+import argparse
+import json
+import random
+import re
+import threading
+from source.document_parsing.time_and_place_extraction import expand_place_expression, extract_time_and_place, normalize_text
+
+_digits = r"[0-9０-９]+"
+
+# 確実に時間表現とみなす表現
+# 年は元号が付く場合か月・日が続く場合のみ(「入社3年」「築30年」のような年数と区別できないため、単独の「N年」は手がかりとしてLLMに回す)
+TIME_WORDS = ("事故当時", "発生当時", "当時", "当日", "翌日", "前日", "同日", "翌朝", "未明", "深夜", "早朝", "夜間", "昼間", "夕方", "明け方")
+TIME_PATTERNS = [
+    re.compile(rf"(?:(?:昭和|平成|令和|大正){_digits}年(?:{_digits}月)?|{_digits}年{_digits}[月日])(?:{_digits}日)?(?![0-9０-９]|間|以上|以下|前|後|目|余|程度|ぶり|ほど|分)"),
+    re.compile(rf"{_digits}月(?:{_digits}日|上旬|中旬|下旬)?(?![0-9０-９]|間|以上|以下|前|後|目|余|程度|ぶり|ほど)"),
+    re.compile(rf"(?:午前|午後)?{_digits}時(?:{_digits}分)?(?:頃|ごろ)?(?![0-9０-９]|間|以上|以下|前|後|目|余|程度|ぶり|ほど)"),
+    re.compile(r"午前|午後"),
+    re.compile(r"[月火水木金土日]曜日?"),
+    re.compile("|".join(TIME_WORDS)),
+]
+# 時間表現の可能性があるが規則では判断しない手がかり(確実な表現を除いた残りの部分で照合する)
+AMBIGUOUS_TIME_CUES = re.compile(
+    rf"頃|ごろ|時期|時点|時刻|期間|最中|年度|週|[春夏秋冬]|[一二三四五六七八九十]+[年月日時]"
+    rf"|(?<![0-9０-９同一])時(?!間)|{_digits}(?:年|か月|ヶ月|カ月|月|日|時間|分)"
+)
+
+# 場所表現とみなす施設などの接尾辞(誤検出の少ないもののみ)
+PLACE_SUFFIXES = (
+    "工場", "製作所", "事業所", "研究所", "発電所", "変電所", "処理場", "浄水場", "作業場", "会場", "現場",
+    "構内", "駅", "空港", "倉庫", "ビル", "プラント", "トンネル", "鉱山", "病院"
+)
+PLACE_PATTERN = re.compile(
+    rf"[一-龥々ァ-ヶーA-Za-z0-9０-９]*(?:{'|'.join(PLACE_SUFFIXES)})(?:内|付近|周辺)?(?![一-龥々ァ-ヶー])"
+)
+# 場所表現の可能性を示す手がかり。直前が辞書で見つかった場所表現で終わっていない場合はLLMに回す
+LOCATIVE_CUES = re.compile(
+    r"において|にて|付近|周辺|近く|内で|内の|上で|下で|前で|横で|側で|階|地下|屋上|屋内|屋外|室|場内"
+    r"|(?<=[一-龥々ァ-ヶーA-Za-z0-9])で(?![はもきあい])"
+)
+
+_stats_lock = threading.Lock()
+_rule_stats = {"local": 0, "escalated": 0}
+
+def _merge_spans(spans, sentence: str) -> list:
+    '''
+    隣接する(間が空または「の」のみの)時間表現の範囲を1つにまとめる。
+    '''
+    merged = []
+    for start, end in sorted(spans):
+        if merged and sentence[merged[-1][1]:start].strip() in ("", "の") and start >= merged[-1][0]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def match_time_and_place(sentence: str, record_stats=False):
+    '''
+    規則のみで文の時間表現と場所表現を抽出する。判断が難しい手がかりを含む場合はNoneを返す。
+    - sentence : 処理対象の文(extract_time_and_placeに渡す形式)
+    - record_stats : Trueの場合、規則で処理できたかどうかをget_rule_based_statsの集計に加える
+    - return : {"time": [...], "place": [...]} またはNone
+    '''
+    result = _match_time_and_place(sentence)
+    if record_stats:
+        with _stats_lock:
+            _rule_stats["local" if result is not None else "escalated"] += 1
+    return result
+
+def _match_time_and_place(sentence: str):
+    # (1) 確実な時間表現を抽出
+    time_spans = [m.span() for pattern in TIME_PATTERNS for m in pattern.finditer(sentence)]
+    time_spans = _merge_spans(time_spans, sentence)
+    times = list(dict.fromkeys(sentence[start:end] for start, end in time_spans))
+
+    # (2) 確実な表現を除いた残りに時間の手がかりがあればLLMに回す
+    remainder = sentence
+    for start, end in reversed(time_spans):
+        remainder = remainder[:start] + "　" * (end - start) + remainder[end:]
+    if AMBIGUOUS_TIME_CUES.search(remainder):
+        return None
+
+    # (3) 辞書による場所表現の抽出
+    place_matches = [m for m in PLACE_PATTERN.finditer(remainder) if m.group(0)]
+    place_ends = {m.end() for m in place_matches}
+
+    # (4) 場所の手がかりが辞書の場所表現の直後以外にあればLLMに回す
+    for cue in LOCATIVE_CUES.finditer(remainder):
+        if cue.start() in place_ends:
+            continue
+        if any(m.start() <= cue.start() < m.end() for m in place_matches):
+            continue
+        return None
+
+    places = list(dict.fromkeys(expand_place_expression(sentence, m.group(0)) for m in place_matches))
+    return {"time": times, "place": places}
+
+def extract_time_and_place_rules(sentence: str, extract=extract_time_and_place) -> dict:
+    '''
+    規則で処理できる文はLLMを呼び出さずに、それ以外の文はextractで時間表現と場所表現を抽出する。
+    - sentence : 処理対象の文
+    - extract : 規則で処理できない場合に用いる抽出関数(構造化出力版など)
+    - return : {"time": [...], "place": [...]}
+    '''
+    result = match_time_and_place(sentence, record_stats=True)
+    if result is not None:
+        return result
+    return extract(sentence)
+
+def get_rule_based_stats() -> dict:
+    '''
+    規則で処理した文の数とLLMに回した文の数、規則で処理した割合を返す。
+    '''
+    with _stats_lock:
+        total = _rule_stats["local"] + _rule_stats["escalated"]
+        return dict(_rule_stats, local_ratio=_rule_stats["local"] / total if total else 0.0)
+
+def _normalized_set(expressions) -> set:
+    return {normalize_text(e) for e in expressions}
+
+def benchmark_agreement(sentences, sample_size=200, seed=0) -> dict:
+    '''
+    文の標本に対して、規則で処理できた文の結果とLLM(extract_time_and_place)の結果の一致率を求める。
+    LLMは規則で処理できた文に対してのみ呼び出す(応答はLLM応答キャッシュを利用する)。
+    - sentences : 文のリスト(process_sentenceに渡される形式)
+    - return : {"sample", "local", "local_ratio", "time_agreement", "place_agreement", "agreement", "mismatches"}
+    '''
+    unique_sentences = list(dict.fromkeys(sentences))
+    sample = random.Random(seed).sample(unique_sentences, min(sample_size, len(unique_sentences)))
+    local = 0
+    time_agree = 0
+    place_agree = 0
+    both_agree = 0
+    mismatches = []
+    for sentence in sample:
+        # analyze_sentenceと同じ形式で与える
+        target = sentence + "。"
+        rule_result = match_time_and_place(target)
+        if rule_result is None:
+            continue
+        local += 1
+        llm_result = extract_time_and_place(target)
+        time_ok = _normalized_set(rule_result["time"]) == _normalized_set(llm_result["time"])
+        place_ok = _normalized_set(rule_result["place"]) == _normalized_set(llm_result["place"])
+        time_agree += time_ok
+        place_agree += place_ok
+        both_agree += time_ok and place_ok
+        if not (time_ok and place_ok):
+            mismatches.append({"sentence": sentence, "rules": rule_result, "llm": llm_result})
+    return {
+        "sample": len(sample),
+        "local": local,
+        "local_ratio": local / len(sample) if sample else 0.0,
+        "time_agreement": time_agree / local if local else 0.0,
+        "place_agreement": place_agree / local if local else 0.0,
+        "agreement": both_agree / local if local else 0.0,
+        "mismatches": mismatches,
+    }
+
+def main():
+    from source.document_parsing.json_processor import collect_sentences
+    from source.document_parsing.llm_client import set_base_url
+    from source.document_parsing.logger import initialize_logger
+
+    parser = argparse.ArgumentParser(description="規則ベースの時間・場所表現抽出とLLMの一致率の評価")
+    parser.add_argument("--input", default="test.json", help="入力されるJSON形式ファイル")
+    parser.add_argument("--sample", type=int, default=200, help="評価に用いる文の数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--base-url", default=None, help="OpenAI互換APIの接続先")
+    parser.add_argument("--output", default=None, help="結果(不一致の文を含む)をJSONで保存するファイル")
+    args = parser.parse_args()
+    initialize_logger()
+    if args.base_url:
+        set_base_url(args.base_url)
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    sentences = []
+    for doc_value in data.values():
+        sentences.extend(collect_sentences(doc_value))
+
+    result = benchmark_agreement(sentences, args.sample, args.seed)
+    print(
+        f"sample={result['sample']}, local={result['local']} ({result['local_ratio']:.1%}), "
+        f"time_agreement={result['time_agreement']:.1%}, place_agreement={result['place_agreement']:.1%}, "
+        f"agreement={result['agreement']:.1%}"
+    )
+    for mismatch in result["mismatches"][:20]:
+        print(f"- {mismatch['sentence']}\n    rules={mismatch['rules']}\n    llm  ={mismatch['llm']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,23 @@
 import re
 import math
 from collections import defaultdict, Counter
-from openai import OpenAI
-from source.document_parsing.logger import log_to_file, log_token_usage
+from source.document_parsing.logger import log_to_file
+from source.document_parsing.llm_request import request_chat_completion
 from source.document_parsing.edge_maker import append_edge_info
 from source.document_parsing.text_utils import convert_predicate_to_text, STOP_WORDS
+from source.document_parsing.llm_client import get_client
+from source.document_parsing import local_tokenizer
 
-client = OpenAI()
+client = get_client()
 
 TIME_EVOLUTION_RELATIONSHIP_THRESHOLDING = 0.60
 
-def tokenize_sentence(lines_for_tokenize, node_type_dict):
+def build_tokenize_messages(lines_for_tokenize) -> list:
     '''
-    与えられたテキスト行それぞれに対してトークナイズと動詞の基本形変換を行う関数。
+    トークナイズのためにGPTに与えるメッセージを生成する関数。
     - lines_for_tokenize : "(index) text" 形式の複数行
-    - node_type_dict : ノード種別を追跡する辞書 {index: "predicate"/"entity"...}
-    - return : (result, vocab_dict)
-       result : [(node_idx, [tokens...]), ...]
-       vocab_dict : 全トークンの登場回数などを管理する辞書
+    - return : chat.completionsに渡すメッセージのリスト
     '''
-
     # (1) GPTに与えるプロンプト
     system_prompt = (
         "[指示]\n"
@@ -87,30 +85,47 @@ def tokenize_sentence(lines_for_tokenize, node_type_dict):
 
     user_prompt = ("上記の例を参考に、以下の各行をトークンに分割し、""動詞は基本形に変換して出力してください。\n\n"+"\n".join(lines_for_tokenize))
     messages.append({"role": "user", "content": user_prompt})
+    return messages
 
-    # (2) OpenAI APIを呼び出す
-    client_api = client.chat.completions
+def tokenize_sentence(lines_for_tokenize, node_type_dict):
+    '''
+    与えられたテキスト行それぞれに対してトークナイズと動詞の基本形変換を行う関数。
+    バックエンド(GPTまたはローカルの形態素解析)はlocal_tokenizerの設定に従う。
+    - lines_for_tokenize : "(index) text" 形式の複数行
+    - node_type_dict : ノード種別を追跡する辞書 {index: "predicate"/"entity"...}
+    - return : (result, vocab_dict)
+       result : [(node_idx, [tokens...]), ...]
+       vocab_dict : 全トークンの登場回数などを管理する辞書
+    '''
+    backend = local_tokenizer.resolve_tokenizer_backend()
+
+    # (1) ローカルのバックエンドで分割する場合はAPIを呼び出さない
+    if backend != "gpt":
+        return filter_tokens(local_tokenizer.tokenize_lines_locally(lines_for_tokenize, backend), node_type_dict)
+
+    # (2) GPTに与えるプロンプト
+    messages = build_tokenize_messages(lines_for_tokenize)
+
+    # (3) OpenAI APIを呼び出す(自動選択の場合、失敗したときは簡易な分割で処理する)
     try:
-        response = client_api.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.0
-        )
-        content = response.choices[0].message.content.strip()
-        if hasattr(response, "usage") and hasattr(response.usage, "total_tokens"):
-            log_token_usage(response.usage.total_tokens)
+        content = request_chat_completion(client, "tokenize", messages)
     except Exception as e:
         log_to_file(f"[ERROR] OpenAI API call failed: {e}")
+        if local_tokenizer.TOKENIZER_BACKEND == "auto":
+            log_to_file("[DEBUG] falling back to the simple local tokenizer.")
+            return filter_tokens(local_tokenizer.tokenize_lines_locally(lines_for_tokenize, "simple"), node_type_dict)
         return [], {}
 
-    # (3) 結果からトークンを抽出
-    output_lines = content.split("\n")
-    result = [] 
-    vocab_dict = {} 
+    # (4) 結果からトークンを抽出
+    return filter_tokens(parse_tokenize_output(content), node_type_dict)
 
+def parse_tokenize_output(content: str) -> list:
+    '''
+    GPTの応答 "(index) トークン | トークン" の各行を [(node_idx, [tokens...]), ...] に変換する。
+    '''
     index_pattern = re.compile(r'^\(\s*(\d+)\s*\)\s*(.*)$')
-
-    for line_str in output_lines:
+    token_lines = []
+    for line_str in content.split("\n"):
         line_str = line_str.strip()
         if not line_str:
             continue
@@ -123,8 +138,18 @@ def tokenize_sentence(lines_for_tokenize, node_type_dict):
             node_idx = 0
             tokens_str = line_str
 
-        tokens_in_line = [t.strip() for t in tokens_str.split("|") if t.strip()]
+        token_lines.append((node_idx, [t.strip() for t in tokens_str.split("|") if t.strip()]))
+    return token_lines
 
+def filter_tokens(token_lines, node_type_dict) -> tuple:
+    '''
+    STOP_WORDSを除外して語彙を数え、述語ノードは末尾のトークン(述語)を取り除く。
+    - token_lines : [(node_idx, [tokens...]), ...]
+    - return : (result, vocab_dict)
+    '''
+    result = []
+    vocab_dict = {}
+    for node_idx, tokens_in_line in token_lines:
         filtered = []
         for tk in tokens_in_line:
             if tk in STOP_WORDS:
@@ -328,16 +353,14 @@ def calculate_node_distributional_proximity(node_a_idx, node_b_idx, N, beta=0.5)
     dp = math.exp(-beta * (m / N))
     return dp
 
-def GPT_inspection(original_sentences, predicate_nodes, time_evolution_edges):
+def build_gpt_inspection_messages(original_sentences, predicate_nodes, time_evolution_edges) -> list:
     '''
-    GPTに対して、与えられた原文とノード、および既存の時間関係を入力し、
-    見落としている時間関係が無いかチェックさせる関数。
+    時間関係の点検のためにGPTに与えるメッセージを生成する関数。
     - original_sentences : 項目全体の原文文字列
     - predicate_nodes : 述語ノードのリスト [{'index':..., 'predicate':...}, ...]
     - time_evolution_edges : すでに検出済みの時間関係 (from_idx, to_idx) のリスト
-    戻り値 : 新たに発見された(かもしれない)時間関係のリスト
+    - return : chat.completionsに渡すメッセージのリスト
     '''
-
     # (1) GPTに与えるプロンプト
     system_prompt = (
         "[指示]\n"
@@ -389,20 +412,28 @@ def GPT_inspection(original_sentences, predicate_nodes, time_evolution_edges):
         user_prompt += "無し"
     user_prompt += "\n"
 
-    # (2) OpenAI APIを呼び出す
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
+    return messages
 
-    client_api = client.chat.completions
+def GPT_inspection(original_sentences, predicate_nodes, time_evolution_edges):
+    '''
+    GPTに対して、与えられた原文とノード、および既存の時間関係を入力し、
+    見落としている時間関係が無いかチェックさせる関数。
+    - original_sentences : 項目全体の原文文字列
+    - predicate_nodes : 述語ノードのリスト [{'index':..., 'predicate':...}, ...]
+    - time_evolution_edges : すでに検出済みの時間関係 (from_idx, to_idx) のリスト
+    戻り値 : 新たに発見された(かもしれない)時間関係のリスト
+    '''
+
+    # (1) GPTに与えるプロンプト
+    messages = build_gpt_inspection_messages(original_sentences, predicate_nodes, time_evolution_edges)
+
+    # (2) OpenAI APIを呼び出す
     try:
-        response = response = client_api.create(
-            model="gpt-4o",  
-            messages=messages,
-            temperature=0.0
-        )
-        content = response.choices[0].message.content.strip()
+        content = request_chat_completion(client, "gpt_inspection", messages)
     except Exception as e:
         log_to_file(f"[ERROR] GPT_inspection API call failed: {e}")
         return []
@@ -432,6 +463,7 @@ def calculate_event_evolution_relationship(entity_nodes, predicate_nodes, origin
     - predicate_nodes : その項目に含まれる述語ノード
     - original_sentences : 項目全体の元文など
     - doc_created_edge_indexes : 生成したエッジのインデックスを追跡するセット
+    - return : 付与したnext_TimeStamp関係 (from_idx, to_idx) のリスト
     '''
 
     log_to_file("Starting time evolution relationship calculation...")
@@ -460,21 +492,20 @@ def calculate_event_evolution_relationship(entity_nodes, predicate_nodes, origin
 
     if not lines_for_tokenize:
         log_to_file("[DEBUG] No nodes to tokenize.")
-        return
+        return []
 
     result, vocab_dict = tokenize_sentence(lines_for_tokenize, node_type_dict)
     if not result:
         log_to_file("[DEBUG] tokenization failed or empty result.")
-        return
+        return []
 
     # (2) TFベースのベクトル化 & コサイン類似度取得
     ONLY_TF_TERM_WEIGHT = True 
     cos_sim_dict, sorted_nodes = node_vector_space_model(result, vocab_dict, only_tf=ONLY_TF_TERM_WEIGHT)
 
     # (3) タイムスタンプ情報の構築
-    from source.document_parsing.edge_maker import get_edge
-    all_edges = get_edge()
-    item_edges = [e for e in all_edges if (e["from"] in sorted_nodes or e["to"] in sorted_nodes)]
+    from source.document_parsing.edge_maker import edges_touching
+    item_edges = edges_touching(sorted_nodes)
     group_map = build_timestamp_info(sorted_nodes, item_edges)
     time_evolution_relationship = []
 
@@ -509,22 +540,5 @@ def calculate_event_evolution_relationship(entity_nodes, predicate_nodes, origin
                 f"time_evolution_score={time_evolution_score:.3f}"
             )
         
-    # (9) GPTモデルを使って見落とされたnext_TimeStamp関係を点検
-    new_relations = GPT_inspection(original_sentences, predicate_nodes, time_evolution_relationship)
-
-    # (10) 見落とし可能性のある(Next_TimeStamp)関係があればログ出力
-    if new_relations:
-        log_to_file("[Time Evolution] GPT found new Next_TimeStamp relationship candidates:")
-        node_text_dict = {}
-        for nd in predicate_nodes:
-            idx = nd["index"]
-            txt = nd.get("predicate", nd.get("entity",""))
-            node_text_dict[idx] = txt
-
-        for (a_idx, b_idx) in new_relations:
-            txtA = node_text_dict.get(a_idx, "N/A")
-            txtB = node_text_dict.get(b_idx, "N/A")
-            log_to_file(f"  Node#{a_idx}({txtA}) => Node#{b_idx}({txtB})")
-    else:
-        log_to_file("[Time Evolution] No missing Next_TimeStamp relationships were detected")
-        
\ No newline at end of file
+    # (9) 見落とされたnext_TimeStamp関係の点検(GPT_inspection)はinspection_auditで後処理として行う
+    return time_evolution_relationship